@@ -1,108 +1,546 @@
+import io
 import os
-import torch
-import pandas as pd
+import json
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
 import numpy as np
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import pickle
-from model.lstm_model import ModelTrainer
+from model.registry import ModelRegistry
+from model.batching import BatchScheduler, SchedulerStopped
+from model.model_pool import ModelPool, ServedModel, UnknownModel
+from model.streaming import StreamSessionManager
+from model.cache import PredictionCache
+from model.inference import optimized_path, prediction_confidence
+from model.network import NUM_JOINTS
+from model.csi_store import JOINT_COLUMNS, has_joint_columns
+from csi_io import BINARY_CONTENT_TYPES, PayloadError, PayloadTooLarge, decode_binary, read_body
+from ingest import ParsePool, Saturated, csv_chunks, parse_csv
+from encoding import choose_encoder
+from metrics import Counter, Gauge, Histogram, MetricsRegistry, process_rss_bytes
 
 app = Flask(__name__)
 CORS(app)
 
 # Load the trained model
-MODEL_PATH = os.path.join('backend', 'model', 'saved_models', 'best_model.pth')
+# Single-file artifact (see model/artifact.py); older .pth checkpoints also load
+MODEL_PATH = os.environ.get('MODEL_PATH', os.path.join('backend', 'model', 'saved_models', 'best_model.safetensors'))
 ALLOWED_EXTENSIONS = {'csv'}
 
+# 'float' serves the model at MODEL_PATH; 'int8' serves the quantized TorchScript
+# artifact written next to it by `python -m model.export`
+MODEL_VARIANT = os.environ.get('MODEL_VARIANT', 'float')
+if MODEL_VARIANT == 'int8':
+    MODEL_PATH = optimized_path(MODEL_PATH)
+
+# Seconds between checks of the weights file for a new version (0 disables hot-swap)
+MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', 5.0))
+
 # Initialize the model
 input_size = 256  # Number of CSI subcarriers
-trainer = ModelTrainer(input_size)
 
-# Load model at startup
+# Further models served next to the default one (e.g. one per building or radio
+# configuration), as comma-separated id=path pairs; /api/models/<id>/predict
+# routes to them. Each is loaded on its first request
+DEFAULT_MODEL_ID = os.environ.get('DEFAULT_MODEL_ID', 'default')
+MODELS = dict(pair.split('=', 1) for pair in os.environ.get('MODELS', '').split(',') if pair.strip())
+if MODEL_VARIANT == 'int8':
+    MODELS = {model_id: optimized_path(path) for model_id, path in MODELS.items()}
+# While loaded models' weights exceed MODEL_MEMORY_BUDGET_MB, the least
+# recently used are unloaded (0 is unlimited). The default model always stays
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+
+# Concurrent requests are coalesced into one forward pass of up to
+# BATCH_MAX_SIZE rows, waiting at most BATCH_MAX_WAIT_MS for the batch to fill
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 64))
+BATCH_MAX_WAIT_MS = float(os.environ.get('BATCH_MAX_WAIT_MS', 2.0))
+# Requests beyond BATCH_MAX_QUEUE waiting for inference (0 is unbounded), or
+# not scored within PREDICT_TIMEOUT seconds, get a 503 with Retry-After
+BATCH_MAX_QUEUE = int(os.environ.get('BATCH_MAX_QUEUE', 256))
+PREDICT_TIMEOUT = float(os.environ.get('PREDICT_TIMEOUT', 10.0))
+RETRY_AFTER_SECONDS = int(os.environ.get('RETRY_AFTER_SECONDS', 1))
+
+
+# /api/predict rejects bodies over MAX_UPLOAD_BYTES or MAX_UPLOAD_ROWS frames
+# with 413. /api/predict/batch streams CSV input, so it only has a byte cap
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 16 * 1024 * 1024))
+MAX_UPLOAD_ROWS = int(os.environ.get('MAX_UPLOAD_ROWS', 10000))
+BATCH_MAX_UPLOAD_BYTES = int(os.environ.get('BATCH_MAX_UPLOAD_BYTES', 1024 * 1024 * 1024))
+
+# CSV uploads are parsed on PARSE_WORKERS threads with at most
+# PARSE_MAX_PENDING more waiting; further uploads get a 429 with Retry-After
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 2))
+PARSE_MAX_PENDING = int(os.environ.get('PARSE_MAX_PENDING', 8))
+parse_pool = ParsePool(max_workers=PARSE_WORKERS, max_pending=PARSE_MAX_PENDING, retry_after=RETRY_AFTER_SECONDS)
+
+# Streaming sensors keep their LSTM state between frames; idle sessions are
+# dropped after STREAM_SESSION_TTL seconds
+STREAM_SESSION_TTL = float(os.environ.get('STREAM_SESSION_TTL', 60.0))
+STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', 1024))
+
+# /api/predict results are cached by feature content for PREDICT_CACHE_TTL
+# seconds, up to PREDICT_CACHE_SIZE entries (0 disables). PREDICT_CACHE_QUANTUM
+# rounds features to that step before hashing so near-duplicate frames hit too
+PREDICT_CACHE_SIZE = int(os.environ.get('PREDICT_CACHE_SIZE', 4096))
+PREDICT_CACHE_TTL = float(os.environ.get('PREDICT_CACHE_TTL', 300.0))
+PREDICT_CACHE_QUANTUM = float(os.environ.get('PREDICT_CACHE_QUANTUM', 0.0))
+
+def build_served_model(model_id, path):
+    """A model with its own registry, batching queue, stream sessions and result cache."""
+    model_registry = ModelRegistry(path, input_size, poll_interval=MODEL_POLL_INTERVAL)
+    return ServedModel(
+        model_id,
+        model_registry,
+        BatchScheduler(model_registry, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                       max_queue_size=BATCH_MAX_QUEUE),
+        StreamSessionManager(model_registry, ttl=STREAM_SESSION_TTL, max_sessions=STREAM_MAX_SESSIONS),
+        PredictionCache(max_entries=PREDICT_CACHE_SIZE, ttl=PREDICT_CACHE_TTL, quantum=PREDICT_CACHE_QUANTUM),
+    )
+
+# Load the default model once at startup; registries swap in new weights in the background
+pool = ModelPool({**MODELS, DEFAULT_MODEL_ID: MODEL_PATH}, build_served_model,
+                 memory_budget_bytes=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024), pinned=[DEFAULT_MODEL_ID]).start()
+# The default model is pinned, so these always refer to live objects
+default_model = pool.get(DEFAULT_MODEL_ID)
+registry = default_model.registry
+scheduler = default_model.scheduler
+streams = default_model.streams
+cache = default_model.cache
+
+# Rows per forward pass (and per CSV chunk) for /api/predict/batch
+PREDICT_BATCH_SIZE = int(os.environ.get('PREDICT_BATCH_SIZE', 1024))
+
+# Metrics served at /metrics
+metrics = MetricsRegistry()
+REQUESTS = Counter(metrics, 'http_requests_total', 'HTTP requests by endpoint, method and status',
+                   ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram(metrics, 'http_request_duration_seconds',
+                            'Time to produce a response (streamed bodies excluded)', ('endpoint',))
+STAGE_SECONDS = Histogram(metrics, 'predict_stage_seconds', 'Time spent in each stage of /api/predict', ('stage',))
+MODEL_SECONDS = Histogram(metrics, 'model_predict_seconds', '/api/predict latency by model', ('model',))
+Gauge(metrics, 'model_loads_total', 'Model (re)loads since startup', lambda: registry.load_count, type='counter')
+Gauge(metrics, 'model_load_seconds', 'Time taken to load the current model',
+      lambda: registry.get().load_seconds if registry.get() is not None else 0)
+Gauge(metrics, 'process_resident_memory_bytes', 'Resident set size of this process', process_rss_bytes)
+Gauge(metrics, 'batch_queue_depth', 'Requests waiting for the batching scheduler', lambda: scheduler.queue_depth())
+Gauge(metrics, 'batch_batches_total', 'Forward passes run by the batching scheduler',
+      lambda: scheduler.stats.batches, type='counter')
+Gauge(metrics, 'parse_rejected_total', 'CSV uploads rejected because the parse pool was full',
+      lambda: parse_pool.rejected, type='counter')
+Gauge(metrics, 'batch_rows_total', 'Rows scored by the batching scheduler', lambda: scheduler.stats.rows, type='counter')
+Gauge(metrics, 'stream_sessions', 'Open streaming sessions', lambda: len(streams))
+Gauge(metrics, 'predict_cache_lookups_total', '/api/predict cache lookups by result',
+      lambda: {('hit',): cache.hits, ('miss',): cache.misses}, labelnames=('result',), type='counter')
+Gauge(metrics, 'predict_cache_evictions_total', 'Cache entries dropped for size or age',
+      lambda: cache.evicted, type='counter')
+Gauge(metrics, 'predict_cache_entries', 'Results held in the /api/predict cache', lambda: len(cache))
+Gauge(metrics, 'model_memory_bytes', 'Weights held in memory by each loaded model',
+      lambda: {(model_id,): served.memory_bytes() for model_id, served in pool.loaded().items()}, labelnames=('model',))
+Gauge(metrics, 'model_evictions_total', 'Models unloaded to stay within the memory budget',
+      lambda: pool.evictions, type='counter')
+
+# Names under which the scheduler's batch timings are reported as stages
+MODEL_STAGES = {
+    'queue_wait': 'queue_wait',
+    'tensor': 'tensor_conversion',
+    'forward': 'model_forward',
+    'decode': 'label_decode',
+}
+
+# Fraction of requests whose per-stage timing spans are dumped as JSON lines,
+# to PROFILE_LOG if set or stdout otherwise
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+PROFILE_LOG = os.environ.get('PROFILE_LOG')
+profile_lock = threading.Lock()
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    spans = g.get('spans')
+    if spans is not None:
+        spans.append({'stage': name, 'ms': round(seconds * 1000, 3)})
+
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
 @app.before_request
-def load_model():
-    if os.path.exists(MODEL_PATH):
-        trainer.load_model(MODEL_PATH)
-        print("Model loaded successfully!")
-    else:
-        print(f"Warning: Model not found at {MODEL_PATH}. Please train the model first.")
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.spans = [] if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE else None
+
+@app.after_request
+def record_request(response):
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    elapsed = time.perf_counter() - g.request_started
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+
+    if g.spans is not None:
+        line = json.dumps({
+            'time': time.time(),
+            'pid': os.getpid(),
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'totalMs': round(elapsed * 1000, 3),
+            'spans': g.spans,
+        })
+        with profile_lock:
+            if PROFILE_LOG:
+                with open(PROFILE_LOG, 'a') as f:
+                    f.write(line + '\n')
+            else:
+                print(line)
+    return response
+
+def before_fork():
+    """Stop background threads in the parent before it forks workers, keeping the models loaded (see serve.py)."""
+    pool.before_fork()
+    parse_pool.stop()
+
+def after_fork(worker=None):
+    """
+    Restart background threads in a pre-forked worker process (see serve.py).
+
+    worker identifies the process among its siblings; /metrics labels every
+    sample with it, since each worker counts only its own requests.
+    """
+    pool.after_fork()
+    parse_pool.after_fork()
+    if worker is not None:
+        metrics.const_labels['worker'] = str(worker)
+
+def overloaded(message, status, retry_after=RETRY_AFTER_SECONDS):
+    """Error response asking the client to back off and retry."""
+    return jsonify({'error': message}), status, {'Retry-After': str(retry_after)}
+
+@app.errorhandler(413)
+def payload_too_large(e):
+    return jsonify({'error': 'Upload exceeds the maximum allowed size'}), 413
+
+def encoded_response(encoder, result, headers=None):
+    """Response with result serialized in the format the client asked for (see encoding.py)."""
+    return Response(encoder.encode(result), mimetype=encoder.content_type, headers=headers)
+
+def get_served_model(model_id):
+    """Return (ServedModel, None) for a route's model id (None is the default model), or (None, error_response)."""
+    try:
+        served = pool.get(model_id or DEFAULT_MODEL_ID)
+    except UnknownModel:
+        return None, (jsonify({'error': f'Unknown model {model_id}'}), 404)
+    if not served.loaded:
+        return None, (jsonify({'error': 'Model not loaded'}), 503)
+    return served, None
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/api/predict', methods=['POST'])
-def predict():
+def joint_list(joints):
+    """[joints, 2] array to the jointCoordinates format, with one bulk tolist()."""
+    return [{'x': x, 'y': y} for x, y in joints.tolist()]
+
+def record_model_latency(served):
+    """Count an answered /api/predict request against its model."""
+    elapsed = time.perf_counter() - g.request_started
+    served.record(elapsed)
+    MODEL_SECONDS.observe(elapsed, model=served.model_id)
+
+def get_csv_upload():
+    """Return (file, None) for a valid CSV upload, or (None, error_response)."""
     # Check if file is present in request
     if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
+        return None, (jsonify({'error': 'No file part'}), 400)
     
     file = request.files['file']
     
     # Check if filename is empty
     if file.filename == '':
-        return jsonify({'error': 'No selected file'}), 400
+        return None, (jsonify({'error': 'No selected file'}), 400)
     
     # Check if file extension is allowed
     if not allowed_file(file.filename):
-        return jsonify({'error': 'Invalid file format. Only CSV files are allowed.'}), 400
+        return None, (jsonify({'error': 'Invalid file format. Only CSV files are allowed.'}), 400)
     
+    return file, None
+
+@app.route('/api/predict', methods=['POST'])
+@app.route('/api/models/<model_id>/predict', methods=['POST'])
+def predict(model_id=None):
+    df = None
+    file = None
+    encoder = choose_encoder(request.accept_mimetypes)
+    # The model decides how many subcarriers an upload must have
+    served, error = get_served_model(model_id)
+    if error is not None:
+        return error
+    cache = served.cache
+    input_size = served.registry.get().trainer.input_size
+    # Enforced by werkzeug while the body or form is read (413); settable per request since Flask 3.1
+    request.max_content_length = MAX_UPLOAD_BYTES
+    if request.mimetype in BINARY_CONTENT_TYPES:
+        # Binary frames are viewed in place, no CSV parsing
+        try:
+            with stage('upload_read'):
+                body = read_body(request.stream, request.content_length)
+            with stage('feature_extraction'):
+                features = decode_binary(request.mimetype, body, input_size)
+            if len(features) > MAX_UPLOAD_ROWS:
+                raise PayloadTooLarge(f'Upload has more than {MAX_UPLOAD_ROWS} rows')
+        except PayloadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except PayloadError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        with stage('upload_read'):
+            file, error = get_csv_upload()
+        if error is not None:
+            return error
+
     try:
-        # Read CSV data
-        df = pd.read_csv(file)
-        
-        # Extract CSI features
-        csi_columns = [col for col in df.columns if col.startswith('csi_')]
-        features = df[csi_columns].values
+        if file is not None:
+            with stage('feature_extraction'):
+                # Read CSV data and extract CSI features on the bounded parse pool
+                df, features = parse_pool.run(parse_csv, file, MAX_UPLOAD_ROWS, input_size)
         
-        # If features is a single sample, it will be 1D
-        if features.ndim == 1:
-            # Single sample, already handled by updated ModelTrainer.predict
-            pass
+        # Resent frames are answered from the cache without a forward pass
+        cache_key = None
+        if cache.enabled:
+            with stage('cache_lookup'):
+                cache_key = cache.key(features)
+                cached = cache.get(cache_key, served.registry.get().version)
+            if cached is not None:
+                record_model_latency(served)
+                return encoded_response(encoder, cached, {'X-Cache': 'hit'})
         
         # Make predictions
-        presence_pred, pose_class = trainer.predict(features)
-        presence_pred = np.atleast_1d(presence_pred).flatten()
-        human_presence = bool(presence_pred[0] > 0.5)
-        
-        # Ensure presence_pred is properly handled whether it's a list, numpy array, or scalar
-        #if hasattr(presence_pred, "__iter__"):
-            #human_presence = bool(presence_pred[0] > 0.5)
-        #else:
-            #human_presence = bool(presence_pred > 0.5)
+        try:
+            prediction = served.scheduler.predict(features, timeout=PREDICT_TIMEOUT)
+        except queue.Full:
+            return overloaded('Inference queue is full', 503)
+        except SchedulerStopped:
+            # The model was evicted while this request waited; retrying reloads it
+            return overloaded('Model was unloaded', 503)
+        except ValueError as e:
+            # Rows of the wrong width are the client's error, not the batch's
+            return jsonify({'error': str(e)}), 400
+        except TimeoutError:
+            return overloaded('Timed out waiting for inference', 503)
+        for key, name in MODEL_STAGES.items():
+            if key in prediction.timings:
+                observe_stage(name, prediction.timings[key])
+        serialization_started = time.perf_counter()
+        loaded = prediction.loaded
+        # The reported row: a windowed model's first row is scored from frame 0
+        # padded out to a window, so its last row, whose window is all real
+        # frames, is the informative one
+        row = len(features) - 1 if loaded.trainer.window_size > 1 else 0
+        # numpy scalars and arrays are serialized as they are
+        human_presence = prediction.presence_pred[row] > 0
         
         # Ensure pose_class is properly handled
-        pose = pose_class[0] if human_presence else 'None'
+        pose = prediction.pose_class[row] if human_presence else 'None'
+        confidence = prediction_confidence(prediction.presence_prob[row:row + 1], prediction.pose_probs[row:row + 1],
+                                           prediction.presence_pred[row:row + 1])[0]
         
-        # Extract joint coordinates if available
-        joint_coordinates = []
-        if all(f'joint_{i}_x' in df.columns for i in range(17)) and all(f'joint_{i}_y' in df.columns for i in range(17)):
-            for i in range(17):
-                x = float(df[f'joint_{i}_x'].values[0])
-                y = float(df[f'joint_{i}_y'].values[0])
-                joint_coordinates.append({'x': x, 'y': y})
+        # Joint coordinates come from the keypoint head, in the same forward pass
+        cacheable = cache_key is not None
+        if prediction.joints is not None:
+            joint_coordinates = joint_list(prediction.joints[row])
+        elif df is not None and has_joint_columns(df.columns):
+            # Model without a trained keypoint head: echo the upload's joints,
+            # which are not part of the cache key
+            cacheable = False
+            joint_coordinates = joint_list(df[JOINT_COLUMNS].to_numpy()[row].reshape(NUM_JOINTS, 2))
         else:
-            # Generate default coordinates based on pose
-            # This is simplified and would need to be replaced with your actual logic
-            joint_coordinates = [{'x': 0, 'y': 0} for _ in range(17)]
+            joint_coordinates = [{'x': 0, 'y': 0} for _ in range(NUM_JOINTS)]
         
         result = {
             'humanPresence': human_presence,
             'pose': pose,
-            'confidence': float(np.random.uniform(0.7, 0.99)),  # Just a placeholder
-            'jointCoordinates': joint_coordinates
+            'confidence': confidence,
+            'presenceProbability': prediction.presence_prob[row],
+            'poseProbabilities': dict(zip(loaded.trainer.classes,
+                                          prediction.pose_probs[row].tolist())),
+            'jointCoordinates': joint_coordinates,
+            'modelVersion': loaded.version
         }
         
-        return jsonify(result)
+        if cacheable:
+            cache.put(cache_key, loaded.version, result)
+        
+        response = encoded_response(encoder, result)
+        if cache_key is not None:
+            response.headers['X-Cache'] = 'miss'
+        observe_stage('serialization', time.perf_counter() - serialization_started)
+        record_model_latency(served)
+        return response
     
+    except Saturated as e:
+        return overloaded(str(e), 429, e.retry_after)
+    except PayloadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except PayloadError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         import traceback
         print(f"Error processing request: {str(e)}")
         print(traceback.format_exc())
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/predict/batch', methods=['POST'])
+@app.route('/api/models/<model_id>/predict/batch', methods=['POST'])
+def predict_batch(model_id=None):
+    """
+    Score every row of an upload and stream the results back as NDJSON.
+
+    Accepts the same payloads as /api/predict. CSV uploads are read in chunks
+    and inference runs in batches of PREDICT_BATCH_SIZE rows, so memory stays
+    flat however large the upload is. All rows are scored by the model version
+    that was loaded when the request started.
+    """
+    upload = None
+    served, error = get_served_model(model_id)
+    if error is not None:
+        return error
+    loaded = served.registry.get()
+
+    request.max_content_length = BATCH_MAX_UPLOAD_BYTES
+    if request.mimetype in BINARY_CONTENT_TYPES:
+        try:
+            body = read_body(request.stream, request.content_length)
+            chunks = [decode_binary(request.mimetype, body, loaded.trainer.input_size)]
+        except PayloadError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        file, error = get_csv_upload()
+        if error is not None:
+            return error
+        # Flask closes request.files when the view returns, before the streamed
+        # body is generated, so take ownership of the upload's stream
+        upload, file.stream = file.stream, io.BytesIO()
+        try:
+            # The header and first chunk are checked here, so a malformed
+            # upload gets a 400 rather than an error line in a 200 stream
+            chunks = csv_chunks(upload, PREDICT_BATCH_SIZE, loaded.trainer.input_size)
+        except PayloadError as e:
+            upload.close()
+            return jsonify({'error': str(e)}), 400
+
+    encoder = choose_encoder(request.accept_mimetypes)
+
+    def generate():
+        row = 0
+        try:
+            for presence_pred, pose_class, joints in loaded.trainer.predict_batches(chunks, PREDICT_BATCH_SIZE):
+                # Columns are converted once per batch; joints are written
+                # straight from the array, one row view each
+                human_presence = presence_pred > 0.5
+                presence = human_presence.tolist()
+                poses = np.where(human_presence, pose_class, 'None').tolist()
+                if joints is None:
+                    rows = ({'row': row + i, 'humanPresence': presence[i], 'pose': poses[i]}
+                            for i in range(len(presence)))
+                else:
+                    rows = ({'row': row + i, 'humanPresence': presence[i], 'pose': poses[i], 'joints': joints[i]}
+                            for i in range(len(presence)))
+                yield encoder.encode_rows(rows)
+                row += len(presence)
+        except Exception as e:
+            print(f"Error processing batch request at row {row}: {str(e)}")
+            yield encoder.encode_rows([{'error': str(e), 'row': row}])
+        finally:
+            if upload is not None:
+                upload.close()
+
+    headers = {'X-Model-Version': loaded.version}
+    return Response(stream_with_context(generate()), mimetype=encoder.stream_content_type, headers=headers)
+
+@app.route('/api/stream/<sensor_id>', methods=['POST'])
+@app.route('/api/models/<model_id>/stream/<sensor_id>', methods=['POST'])
+def stream(sensor_id, model_id=None):
+    """
+    Score a continuous stream of CSI frames from one sensor.
+
+    The body is raw little-endian float32 frames of ``input_size`` values each,
+    which may be sent with chunked transfer encoding. One NDJSON line is pushed
+    back per frame as soon as it has been read.
+    """
+    served, error = get_served_model(model_id)
+    if error is not None:
+        return error
+    streams = served.streams
+
+    # Models for other radio configurations may expect a different number of subcarriers
+    frame_bytes = served.registry.get().trainer.input_size * 4
+    body = request.stream
+    encoder = choose_encoder(request.accept_mimetypes)
+
+    def generate():
+        frame_index = 0
+        try:
+            while True:
+                chunk = body.read(frame_bytes)
+                while chunk and len(chunk) < frame_bytes:
+                    more = body.read(frame_bytes - len(chunk))
+                    if not more:
+                        break
+                    chunk += more
+                if len(chunk) < frame_bytes:
+                    if chunk:
+                        yield encoder.encode_rows([{'error': f'Trailing {len(chunk)} bytes do not form a full frame'}])
+                    return
+
+                frame = np.frombuffer(bytearray(chunk), dtype='<f4')
+                presence_prob, pose_probs, presence_pred, pose_class, joints = streams.advance(sensor_id, frame)
+                human_presence = presence_pred[0] > 0
+                line = {
+                    'frame': frame_index,
+                    'humanPresence': human_presence,
+                    'pose': pose_class[0] if human_presence else 'None',
+                    'confidence': prediction_confidence(presence_prob, pose_probs, presence_pred)[0],
+                }
+                if joints is not None:
+                    line['joints'] = joints[0]
+                yield encoder.encode_rows([line])
+                frame_index += 1
+        except Exception as e:
+            print(f"Error processing stream {sensor_id} at frame {frame_index}: {str(e)}")
+            yield encoder.encode_rows([{'error': str(e), 'frame': frame_index}])
+            # The session's state may have advanced past the last frame reported,
+            # so the sensor starts over rather than resume from it
+            streams.close(sensor_id)
+
+    return Response(stream_with_context(generate()), mimetype=encoder.stream_content_type)
+
+@app.route('/api/stream/<sensor_id>', methods=['DELETE'])
+@app.route('/api/models/<model_id>/stream/<sensor_id>', methods=['DELETE'])
+def close_stream(sensor_id, model_id=None):
+    # A model that isn't loaded has no sessions, and isn't loaded just to say so
+    served = pool.loaded().get(model_id or DEFAULT_MODEL_ID)
+    if served is None or not served.streams.close(sensor_id):
+        return jsonify({'error': 'Unknown sensor'}), 404
+    return jsonify({'closed': sensor_id}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({'status': 'healthy'}), 200
+    batching = scheduler.stats.snapshot()
+    batching['queueDepth'] = scheduler.queue_depth()
+    return jsonify({'status': 'healthy', **registry.status(), 'batching': batching, 'streaming': streams.status(),
+                    'cache': cache.status(), 'parsing': parse_pool.status(), 'models': pool.status()}), 200
+
+@app.route('/api/models', methods=['GET'])
+def list_models():
+    return jsonify(pool.status()), 200
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,71 @@
+"""
+Throughput and latency of direct vs micro-batched prediction.
+
+Each client thread sends single-frame requests back to back. Run from the
+backend directory:
+
+    python -m benchmarks.bench_batching --concurrency 1 4 16 64
+"""
+import argparse
+import threading
+import time
+
+import torch
+
+from benchmarks.common import DEFAULT_MODEL_PATH, StaticRegistry, latency_summary, load_trainer, make_csi
+from model.batching import BatchScheduler
+
+
+def run_clients(call, frames, concurrency, requests_per_client):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(worker_id):
+        local = []
+        for i in range(requests_per_client):
+            row = frames[(worker_id * requests_per_client + i) % len(frames)]
+            started = time.perf_counter()
+            call(row)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    summary = latency_summary(latencies)
+    summary['throughput_rps'] = len(latencies) / elapsed
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-path', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200, help='requests per client thread')
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    trainer = load_trainer(args.model_path)
+    frames = make_csi(1024)
+    scheduler = BatchScheduler(StaticRegistry(trainer), args.max_batch_size, args.max_wait_ms).start()
+
+    print(f"torch threads: {torch.get_num_threads()}")
+    print(f"{'mode':<8} {'conc':>5} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in args.concurrency:
+        for mode, call in (('direct', trainer.predict), ('batched', scheduler.predict)):
+            r = run_clients(call, frames, concurrency, args.requests)
+            print(f"{mode:<8} {concurrency:>5} {r['throughput_rps']:>10.1f} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+    scheduler.stop()
+    print(scheduler.stats.snapshot())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Serialization cost of /api/predict/batch rows per response format.
+
+Encodes the rows of one PREDICT_BATCH_SIZE batch (presence, pose and 17
+joints each) the way the batch endpoint does, comparing per-row json.dumps
+of Python lists with the encoders in encoding.py. Run from the backend directory:
+
+    python -m benchmarks.bench_encoding --rows 1024
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import POSE_CLASSES
+from encoding import JSON_ENCODER, MSGPACK_ENCODER, orjson
+from model.network import NUM_JOINTS
+
+
+def json_lines(presence_pred, pose_class, joints):
+    """The per-row json.dumps encoding the batch endpoint used before encoding.py."""
+    lines = []
+    joint_rows = joints.tolist()
+    for i, (presence, pose) in enumerate(zip(presence_pred, pose_class)):
+        human_presence = bool(presence > 0.5)
+        line = {'row': i, 'humanPresence': human_presence, 'pose': pose if human_presence else 'None',
+                'joints': joint_rows[i]}
+        lines.append(json.dumps(line))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def encoder_lines(encoder):
+    def encode(presence_pred, pose_class, joints):
+        human_presence = presence_pred > 0.5
+        presence = human_presence.tolist()
+        poses = np.where(human_presence, pose_class, 'None').tolist()
+        return encoder.encode_rows({'row': i, 'humanPresence': presence[i], 'pose': poses[i], 'joints': joints[i]}
+                                   for i in range(len(presence)))
+    return encode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1024)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    presence_pred = (rng.random(args.rows) > 0.5).astype(np.float32)
+    pose_class = np.array(POSE_CLASSES, dtype=object)[rng.integers(len(POSE_CLASSES), size=args.rows)]
+    joints = rng.random((args.rows, NUM_JOINTS, 2), dtype=np.float32)
+
+    formats = [('json.dumps', json_lines), ('json' + (' (orjson)' if orjson else ''), encoder_lines(JSON_ENCODER))]
+    if MSGPACK_ENCODER is not None:
+        formats.append(('msgpack', encoder_lines(MSGPACK_ENCODER)))
+    else:
+        print('msgpack is not installed, skipping it')
+
+    print(f"{'format':<16} {'bytes':>10} {'ms/batch':>9} {'us/row':>7}")
+    for name, encode in formats:
+        body = encode(presence_pred, pose_class, joints)
+        times = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            encode(presence_pred, pose_class, joints)
+            times.append(time.perf_counter() - started)
+        best = min(times)
+        print(f"{name:<16} {len(body):>10} {best * 1000:>9.2f} {best * 1e6 / args.rows:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Parse cost and wire size of CSV vs binary CSI payloads.
+
+Measures the work /api/predict does to turn a request body into a float32
+feature array, for each payload format. Run from the backend directory:
+
+    python -m benchmarks.bench_payload --frames 1 100 10000
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import make_csi, make_csv_bytes
+from csi_io import decode_csi, decode_npy, encode_csi
+
+
+def parse_csv(body):
+    df = pd.read_csv(io.BytesIO(body))
+    csi_columns = [col for col in df.columns if col.startswith('csi_')]
+    return df[csi_columns].values.astype(np.float32)
+
+
+def encode_npy(features):
+    buf = io.BytesIO()
+    np.save(buf, features)
+    return buf.getvalue()
+
+
+def best_time(fn, arg, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'frames':>7} {'format':<6} {'bytes':>12} {'parse ms':>10} {'speedup':>8}")
+    for num_frames in args.frames:
+        features = make_csi(num_frames)
+        payloads = (
+            ('csv', make_csv_bytes(num_frames), parse_csv),
+            ('csi', bytearray(encode_csi(features)), decode_csi),
+            ('npy', bytearray(encode_npy(features)), decode_npy),
+        )
+        csv_time = None
+        for name, body, parse in payloads:
+            elapsed = best_time(parse, body, args.repeat)
+            csv_time = csv_time or elapsed
+            print(f"{num_frames:>7} {name:<6} {len(body):>12} {elapsed * 1000:>10.3f} {csv_time / elapsed:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Convergence and per-request cost of in-model CSI preprocessing.
+
+Trains the same model on raw frames and with preprocessing (standardization
+and clipping, optionally decimating subcarriers; see model.preprocessing),
+reporting the epoch at which the validation loss first reaches
+--target-loss, the best validation loss and accuracy, and the cost of
+scoring one request of a single frame and of --rows frames. The time of the
+preprocessing op alone is listed separately. Training and validation data
+can be CSVs or stores built by model.csi_store.
+
+Run from the backend directory:
+    python -m benchmarks.bench_preprocessing --train ../data/train_data/wifi_csi_train.csv \
+        --valid ../data/test_data/wifi_csi_test.csv --decimation 1 2 4 --target-loss 0.5
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.bench_windows import evaluate
+from model.lstm_model import ModelTrainer, open_dataset
+
+
+def _best_us(fn, repeat):
+    fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1e6 * min(times)
+
+
+def bench_variant(name, preprocessing, decimation, args, valid):
+    features, presence_labels, pose_labels = valid
+    torch.manual_seed(args.seed)
+    trainer = ModelTrainer(features.shape[1], hidden_size=args.hidden_size, preprocessing=preprocessing,
+                           decimation=decimation)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, 'model.safetensors')
+        started = time.perf_counter()
+        trainer.train(args.train, args.valid, num_epochs=args.epochs, batch_size=args.batch_size,
+                      model_path=model_path)
+        train_seconds = time.perf_counter() - started
+        trainer.load_model(model_path)
+
+    losses = [epoch['valid_loss'] for epoch in trainer.history]
+    reached = [epoch['epoch'] for epoch in trainer.history if epoch['valid_loss'] <= args.target_loss]
+    result = {
+        'variant': name,
+        'lstm_inputs': trainer.model.lstm.input_size,
+        'epochs_to_target': reached[0] if reached else None,
+        'best_valid_loss': min(losses),
+        'train_seconds_per_epoch': train_seconds / len(trainer.history),
+    }
+    result.update(evaluate(trainer, features, presence_labels, pose_labels))
+
+    one = features[:1]
+    rows = np.resize(features, (args.rows, features.shape[1]))
+    result['us_per_request_1'] = _best_us(lambda: trainer.predict_proba(one), args.repeat)
+    result[f'us_per_request_{args.rows}'] = _best_us(lambda: trainer.predict_proba(rows), args.repeat)
+    preprocess = trainer.model.preprocess
+    if preprocess is not None:
+        x = torch.from_numpy(rows)
+        with torch.no_grad():
+            result[f'preprocess_us_{args.rows}'] = _best_us(lambda: preprocess(x), args.repeat)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', required=True, help='training CSV or store')
+    parser.add_argument('--valid', required=True, help='validation CSV or store')
+    parser.add_argument('--decimation', type=int, nargs='+', default=[1, 2, 4],
+                        help='decimation factors to train with preprocessing')
+    parser.add_argument('--target-loss', type=float, default=0.5, help='validation loss counted as converged')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--hidden-size', type=int, default=128)
+    parser.add_argument('--rows', type=int, default=256, help='frames in the larger timed request')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--threads', type=int, help='torch threads (defaults to torch\'s choice)')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    dataset = open_dataset(args.valid)
+    valid = (
+        np.asarray(dataset.features, dtype=np.float32),
+        np.asarray(dataset.presence_labels, dtype=np.float32),
+        np.array(dataset.classes, dtype=object)[np.asarray(dataset.pose_labels)],
+    )
+
+    variants = [('raw', False, 1)] + [(f'preprocessed/{d}', True, d) for d in args.decimation]
+    results = [bench_variant(name, preprocessing, decimation, args, valid)
+               for name, preprocessing, decimation in variants]
+
+    print(f"{'variant':<16} {'inputs':>6} {'epochs to target':>16} {'best loss':>9} {'presence acc':>12} "
+          f"{'pose acc':>9} {'us/req 1':>9} {f'us/req {args.rows}':>11} {'preprocess us':>13}")
+    for r in results:
+        epochs = r['epochs_to_target'] if r['epochs_to_target'] is not None else f">{args.epochs}"
+        preprocess_us = r.get(f'preprocess_us_{args.rows}')
+        preprocess_us = f'{preprocess_us:.1f}' if preprocess_us is not None else '-'
+        print(f"{r['variant']:<16} {r['lstm_inputs']:>6} {epochs:>16} {r['best_valid_loss']:>9.4f} "
+              f"{r['presence_accuracy']:>12.4f} {r['pose_accuracy']:>9.4f} {r['us_per_request_1']:>9.1f} "
+              f"{r[f'us_per_request_{args.rows}']:>11.1f} "
+              f"{preprocess_us:>13}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'target_loss': args.target_loss, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Accuracy and per-frame cost of windowed models against single-frame scoring.
+
+For each window size, a model is trained on the same data (window 1 is the
+original single-frame model) and then scored on every frame of the
+validation set, reporting presence/pose accuracy, training time per epoch,
+and the cost per frame of batch scoring (Predictor.predict_batches) and of
+streaming one frame at a time (StreamSessionManager). Training and
+validation data can be CSVs or stores built by model.csi_store; add a
+capture_id column to keep windows within recordings.
+
+Run from the backend directory:
+    python -m benchmarks.bench_windows --train ../data/train_data/wifi_csi_train.csv \
+        --valid ../data/test_data/wifi_csi_test.csv --windows 1 4 8 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.common import StaticRegistry
+from model.lstm_model import ModelTrainer, open_dataset
+from model.streaming import StreamSessionManager
+
+
+def _frames_per_sec(fn, num_frames, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return num_frames / min(times)
+
+
+def evaluate(trainer, features, presence_labels, pose_labels, batch_size=1024):
+    """Accuracy over every frame, scoring the validation set as one capture."""
+    presence_pred, pose_class = [], []
+    for presence, pose, _ in trainer.predict_batches(features, batch_size):
+        presence_pred.append(presence)
+        pose_class.append(pose)
+    return {
+        'presence_accuracy': float(np.mean(np.concatenate(presence_pred) == presence_labels)),
+        'pose_accuracy': float(np.mean(np.concatenate(pose_class) == pose_labels)),
+    }
+
+
+def bench_window(window_size, args, valid):
+    features, presence_labels, pose_labels = valid
+    trainer = ModelTrainer(features.shape[1], hidden_size=args.hidden_size, window_size=window_size)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, 'model.safetensors')
+        started = time.perf_counter()
+        trainer.train(args.train, args.valid, num_epochs=args.epochs, batch_size=args.batch_size,
+                      model_path=model_path, window_stride=args.stride)
+        train_seconds = time.perf_counter() - started
+        # Score the best epoch's weights, as the server would
+        trainer.load_model(model_path)
+
+    result = {'window_size': window_size, 'train_seconds_per_epoch': train_seconds / len(trainer.history)}
+    result.update(evaluate(trainer, features, presence_labels, pose_labels))
+
+    batch_frames = features[:args.frames]
+    batch_fps = _frames_per_sec(lambda: list(trainer.predict_batches(batch_frames)), len(batch_frames), args.repeat)
+
+    streams = StreamSessionManager(StaticRegistry(trainer))
+    stream_frames = features[:min(args.frames, 512)]
+
+    def stream():
+        for frame in stream_frames:
+            streams.advance('bench', frame)
+        streams.close('bench')
+
+    stream_fps = _frames_per_sec(stream, len(stream_frames), args.repeat)
+    result['batch_us_per_frame'] = 1e6 / batch_fps
+    result['stream_us_per_frame'] = 1e6 / stream_fps
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', required=True, help='training CSV or store')
+    parser.add_argument('--valid', required=True, help='validation CSV or store')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--stride', type=int, default=1, help='frames between training windows')
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--hidden-size', type=int, default=128)
+    parser.add_argument('--frames', type=int, default=4096, help='validation frames to time scoring on')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threads', type=int, help='torch threads (defaults to torch\'s choice)')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    dataset = open_dataset(args.valid)
+    valid = (
+        np.asarray(dataset.features, dtype=np.float32),
+        np.asarray(dataset.presence_labels, dtype=np.float32),
+        np.array(dataset.classes, dtype=object)[np.asarray(dataset.pose_labels)],
+    )
+
+    results = [bench_window(window_size, args, valid) for window_size in args.windows]
+
+    print(f"{'window':>6} {'presence acc':>12} {'pose acc':>9} {'train s/epoch':>13} "
+          f"{'batch us/frame':>14} {'stream us/frame':>15}")
+    for r in results:
+        print(f"{r['window_size']:>6} {r['presence_accuracy']:>12.4f} {r['pose_accuracy']:>9.4f} "
+              f"{r['train_seconds_per_epoch']:>13.2f} {r['batch_us_per_frame']:>14.1f} {r['stream_us_per_frame']:>15.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'valid_frames': len(valid[0]), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import io
+import os
+import time
+
+import numpy as np
+
+from model.inference import Predictor
+from model.registry import LoadedModel
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'model', 'saved_models', 'best_model.safetensors')
+POSE_CLASSES = ['kneel', 'no_human', 'sit', 'sleep', 'stand']
+
+
+def make_csi(num_frames, input_size=256, seed=0):
+    """Synthetic CSI amplitudes, shaped like the real [frames, subcarriers] input."""
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(num_frames, input_size)).astype(np.float32)
+
+
+def make_csv_bytes(num_frames, input_size=256, seed=0):
+    """Synthetic CSI in the CSV layout accepted by /api/predict."""
+    features = make_csi(num_frames, input_size, seed)
+    header = ','.join(f'csi_{i}' for i in range(input_size))
+    buf = io.StringIO()
+    np.savetxt(buf, features, delimiter=',', header=header, comments='', fmt='%.6f')
+    return buf.getvalue().encode()
+
+
+def load_trainer(model_path=DEFAULT_MODEL_PATH, input_size=256):
+    """Load the trained model if present, otherwise fall back to random weights."""
+    trainer = Predictor(input_size)
+    if os.path.exists(model_path):
+        trainer.load_model(model_path)
+    else:
+        print(f"Model not found at {model_path}, benchmarking random weights")
+        trainer.set_classes(POSE_CLASSES)
+        trainer.model.eval()
+    return trainer
+
+
+class StaticRegistry:
+    """Registry stand-in that always serves the same trainer."""
+
+    def __init__(self, trainer):
+        self._loaded = LoadedModel(trainer, 'benchmark', None, time.time(), 0.0)
+
+    def get(self):
+        return self._loaded
+
+
+def latency_summary(latencies):
+    """p50/p99/mean of a list of latencies in seconds, reported in milliseconds."""
+    ms = np.asarray(latencies) * 1000
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'mean_ms': float(ms.mean()),
+    }
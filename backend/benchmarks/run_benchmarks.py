@@ -0,0 +1,185 @@
+"""
+Backend performance suite with regression checks.
+
+Measures, on synthetic 256-subcarrier CSI:
+  * end-to-end /api/predict latency through the Flask test client (CSV and binary bodies)
+  * Predictor.predict throughput at batch sizes 1 to 4096
+  * CSV parse cost
+  * model load time
+  * cold start of a fresh serving process (see bench_startup)
+
+Results are written as JSON. With --compare, each metric is checked against a
+stored baseline and the run fails if any got worse by more than --threshold.
+Run from the backend directory:
+
+    python -m benchmarks.run_benchmarks --output benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare benchmarks/baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import torch
+
+from benchmarks.bench_payload import parse_csv
+from benchmarks.bench_startup import measure_startup
+from benchmarks.common import DEFAULT_MODEL_PATH, load_trainer, make_csi, make_csv_bytes
+from csi_io import encode_csi
+
+BATCH_SIZES = (1, 4, 16, 64, 256, 1024, 4096)
+
+
+def timed(fn, repeat, warmup=2):
+    """Median wall time of fn() in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return 1000 * float(np.median(times))
+
+
+def lower_is_better(value, unit='ms'):
+    return {'value': value, 'unit': unit, 'better': 'lower'}
+
+
+def higher_is_better(value, unit):
+    return {'value': value, 'unit': unit, 'better': 'higher'}
+
+
+def bench_predict_throughput(trainer, repeat):
+    results = {}
+    for batch_size in BATCH_SIZES:
+        features = make_csi(batch_size)
+        ms = timed(lambda: trainer.predict(features), repeat)
+        results[f'predict.batch_{batch_size}.latency'] = lower_is_better(ms)
+        results[f'predict.batch_{batch_size}.throughput'] = higher_is_better(batch_size / (ms / 1000), 'rows/s')
+    return results
+
+
+def bench_csv_parse(repeat):
+    results = {}
+    for num_frames in (1, 100, 1000):
+        body = make_csv_bytes(num_frames)
+        results[f'csv_parse.frames_{num_frames}'] = lower_is_better(timed(lambda: parse_csv(body), repeat))
+    return results
+
+
+def bench_model_load(model_path, repeat):
+    return {'model_load': lower_is_better(timed(lambda: load_trainer(model_path), repeat, warmup=1))}
+
+
+def bench_startup(model_path, repeat):
+    runs = [measure_startup(model_path) for _ in range(repeat)]
+    results = {}
+    for key in ('import_inference', 'load_model', 'import_app'):
+        results[f'startup.{key}'] = lower_is_better(1000 * min(run[key] for run in runs))
+    return results
+
+
+def bench_endpoint(model_path, repeat):
+    # The app loads its model at import time, so configure it first
+    os.environ['MODEL_PATH'] = model_path
+    os.environ['MODEL_POLL_INTERVAL'] = '0'
+    # Every request repeats the same body; with the result cache on, all but
+    # the first would be cache hits rather than parse + inference
+    os.environ['PREDICT_CACHE_SIZE'] = '0'
+    import app as server
+
+    client = server.app.test_client()
+    if server.registry.get() is None:
+        print(f"Skipping endpoint benchmarks: no model at {model_path}")
+        return {}
+
+    results = {}
+    for num_frames in (1, 100):
+        csv_body = make_csv_bytes(num_frames)
+        binary_body = encode_csi(make_csi(num_frames))
+
+        def post_csv():
+            response = client.post('/api/predict', data={'file': (io.BytesIO(csv_body), 'sample.csv')})
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        def post_binary():
+            response = client.post('/api/predict', data=binary_body, content_type='application/x-csi')
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        results[f'endpoint.csv.frames_{num_frames}'] = lower_is_better(timed(post_csv, repeat))
+        results[f'endpoint.binary.frames_{num_frames}'] = lower_is_better(timed(post_binary, repeat))
+    server.pool.stop()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return (name, baseline, current, change) for every metric that regressed past threshold."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous['value']:
+            continue
+        change = (current['value'] - previous['value']) / previous['value']
+        if current['better'] == 'higher':
+            change = -change
+        if change > threshold:
+            regressions.append((name, previous['value'], current['value'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-path', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help='write results JSON here')
+    parser.add_argument('--compare', help='baseline results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed relative slowdown (default 20%%)')
+    args = parser.parse_args()
+    model_path = os.path.abspath(args.model_path)
+
+    trainer = load_trainer(model_path)
+    results = {}
+    results.update(bench_predict_throughput(trainer, args.repeat))
+    results.update(bench_csv_parse(args.repeat))
+    results.update(bench_model_load(model_path, max(3, args.repeat // 4)))
+    results.update(bench_startup(model_path, 3))
+    results.update(bench_endpoint(model_path, args.repeat))
+
+    report = {
+        'meta': {
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'torch_threads': torch.get_num_threads(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+
+    for name, result in results.items():
+        print(f"{name:<40} {result['value']:>12.3f} {result['unit']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, current, change in regressions:
+            print(f"REGRESSION {name}: {previous:.3f} -> {current:.3f} ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Request payload formats for CSI frames.
+
+Besides CSV uploads, ``/api/predict`` accepts two binary bodies that are read
+with ``np.frombuffer`` straight over the request buffer, without any text
+parsing or intermediate DataFrame:
+
+* ``application/x-csi``: a 12 byte header (``b'CSI1'``, uint32 frame count,
+  uint32 subcarrier count, all little-endian) followed by the frames as
+  little-endian float32, row-major.
+* ``application/x-npy``: a standard ``.npy`` file holding a 1D or 2D array.
+"""
+import io
+import struct
+
+import numpy as np
+
+CSI_MAGIC = b'CSI1'
+CSI_HEADER = struct.Struct('<4sII')
+CSI_CONTENT_TYPE = 'application/x-csi'
+NPY_CONTENT_TYPE = 'application/x-npy'
+NPY_MAX_HEADER_BYTES = 16384
+BINARY_CONTENT_TYPES = {CSI_CONTENT_TYPE, NPY_CONTENT_TYPE, 'application/octet-stream'}
+
+
+class PayloadError(ValueError):
+    """Raised when a request body is not a valid CSI payload."""
+
+
+class PayloadTooLarge(PayloadError):
+    """Raised when a payload is valid but exceeds a configured size limit."""
+
+
+def encode_csi(features):
+    """Encode a [frames, subcarriers] array in the ``application/x-csi`` format."""
+    features = np.ascontiguousarray(features, dtype='<f4')
+    if features.ndim == 1:
+        features = features.reshape(1, -1)
+    return CSI_HEADER.pack(CSI_MAGIC, *features.shape) + features.tobytes()
+
+
+def decode_csi(buf):
+    """Return a [frames, subcarriers] float32 view over an ``application/x-csi`` buffer."""
+    if len(buf) < CSI_HEADER.size:
+        raise PayloadError('Payload is shorter than the CSI header')
+    magic, num_frames, num_subcarriers = CSI_HEADER.unpack_from(buf)
+    if magic != CSI_MAGIC:
+        raise PayloadError('Payload does not start with the CSI1 header')
+    expected = CSI_HEADER.size + 4 * num_frames * num_subcarriers
+    if len(buf) != expected:
+        raise PayloadError(f'Expected {expected} bytes for {num_frames}x{num_subcarriers} frames, got {len(buf)}')
+    features = np.frombuffer(buf, dtype='<f4', count=num_frames * num_subcarriers, offset=CSI_HEADER.size)
+    return features.reshape(num_frames, num_subcarriers)
+
+
+def decode_npy(buf):
+    """Return a float32 view over a ``.npy`` buffer, copying only if the stored dtype differs."""
+    # Only the header is parsed from a copy; the data is viewed in place
+    stream = io.BytesIO(bytes(memoryview(buf)[:NPY_MAX_HEADER_BYTES]))
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as e:
+        raise PayloadError(f'Invalid npy payload: {e}')
+    if dtype.hasobject:
+        raise PayloadError('Object arrays are not accepted')
+    if len(shape) not in (1, 2):
+        raise PayloadError(f'Expected a 1D or 2D array, got shape {shape}')
+
+    count = int(np.prod(shape))
+    offset = stream.tell()
+    if len(buf) - offset != count * dtype.itemsize:
+        raise PayloadError('npy payload size does not match its header')
+    features = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+    features = features.reshape(shape, order='F' if fortran_order else 'C')
+    if features.dtype != np.float32:
+        features = features.astype(np.float32)
+    return features
+
+
+def check_frames(features, input_size=None):
+    """
+    Return features as [frames, subcarriers], raising PayloadError if it has
+    no frames or (when input_size is given) the wrong number of subcarriers.
+    """
+    if features.ndim == 1:
+        features = features.reshape(1, -1)
+    if len(features) == 0 or features.shape[1] == 0:
+        raise PayloadError('Payload has no CSI frames')
+    if input_size is not None and features.shape[1] != input_size:
+        raise PayloadError(f'Expected {input_size} subcarriers per frame, got {features.shape[1]}')
+    return features
+
+
+def read_body(stream, content_length):
+    """
+    Read a request body into one writable buffer.
+
+    Reading into a preallocated bytearray lets the decoded arrays, and the
+    tensors built from them, share this memory instead of copying it again.
+    """
+    if content_length is None:
+        return bytearray(stream.read())
+    buf = bytearray(content_length)
+    view = memoryview(buf)
+    pos = 0
+    while pos < content_length:
+        n = stream.readinto(view[pos:])
+        if not n:
+            break
+        pos += n
+    if pos != content_length:
+        raise PayloadError(f'Body ended after {pos} of {content_length} bytes')
+    return buf
+
+
+def decode_binary(content_type, buf, input_size=None):
+    """Decode a binary body into [frames, subcarriers]; see check_frames for input_size."""
+    if content_type == NPY_CONTENT_TYPE:
+        return check_frames(decode_npy(buf), input_size)
+    return check_frames(decode_csi(buf), input_size)
@@ -0,0 +1,86 @@
+"""
+Response formats for prediction results.
+
+Results are serialized from the numpy arrays the model returns. numpy arrays
+and scalars are written as they are, so building a response takes no
+bool()/float() conversions or per-joint Python lists. The format follows the
+request's Accept header:
+
+* JSON, the default (NDJSON on the streaming endpoints). It is written with
+  orjson and its native numpy support when orjson is installed, and with the
+  json module otherwise.
+* MessagePack (``application/msgpack``), if the msgpack package is
+  installed. The objects are the same, but floats are packed as float32, so
+  a row with joints is about half the size. Streaming endpoints send one
+  MessagePack object per row back to back, which ``msgpack.Unpacker`` reads
+  incrementally.
+"""
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_CONTENT_TYPE = 'application/json'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+
+def _builtin(obj):
+    """Python equivalent of numpy values the serializer can't write itself."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+class JSONEncoder:
+    content_type = JSON_CONTENT_TYPE
+    stream_content_type = NDJSON_CONTENT_TYPE
+
+    def encode(self, obj):
+        if orjson is not None:
+            return orjson.dumps(obj, default=_builtin, option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(obj, default=_builtin).encode()
+
+    def encode_rows(self, rows):
+        """An iterable of rows as newline-terminated JSON lines, in one bytes block."""
+        if orjson is not None:
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+            return b''.join([orjson.dumps(row, default=_builtin, option=option) for row in rows])
+        return ''.join([json.dumps(row, default=_builtin) + '\n' for row in rows]).encode()
+
+
+class MsgpackEncoder:
+    content_type = MSGPACK_CONTENT_TYPES[0]
+    stream_content_type = MSGPACK_CONTENT_TYPES[0]
+
+    def encode(self, obj):
+        return msgpack.packb(obj, default=_builtin, use_single_float=True)
+
+    def encode_rows(self, rows):
+        """An iterable of rows as consecutive MessagePack objects, in one bytes block."""
+        packer = msgpack.Packer(default=_builtin, use_single_float=True)
+        return b''.join([packer.pack(row) for row in rows])
+
+
+JSON_ENCODER = JSONEncoder()
+MSGPACK_ENCODER = MsgpackEncoder() if msgpack is not None else None
+
+
+def choose_encoder(accept):
+    """Encoder for a request's Accept header (werkzeug's MIMEAccept); JSON unless MessagePack is preferred."""
+    if MSGPACK_ENCODER is not None:
+        best = accept.best_match((JSON_CONTENT_TYPE, NDJSON_CONTENT_TYPE) + MSGPACK_CONTENT_TYPES)
+        if best in MSGPACK_CONTENT_TYPES:
+            return MSGPACK_ENCODER
+    return JSON_ENCODER
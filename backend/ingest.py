@@ -0,0 +1,136 @@
+"""
+Bounded parsing of uploads.
+
+CSV uploads are parsed by a small thread pool, so however many requests
+arrive at once only ``max_workers`` DataFrames are being built and at most
+``max_pending`` more wait for a worker. This is not asynchronous parsing:
+the request thread blocks in ``ParsePool.run`` until its upload is parsed.
+Past the limit, ``ParsePool.run`` raises ``Saturated`` straight away and the
+caller answers with a Retry-After instead of queueing more memory and CPU
+behind the backlog, which keeps request threads from piling up behind the
+parser and free for /api/health and small binary requests.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from csi_io import PayloadError, PayloadTooLarge, check_frames
+
+
+class Saturated(Exception):
+    """Raised when a bounded stage has no room for another request."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ParsePool:
+    def __init__(self, max_workers=2, max_pending=8, retry_after=1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self.rejected = 0
+
+    def stop(self):
+        """Shut the executor's threads down; the next run starts new ones."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def after_fork(self):
+        """Executor threads don't survive fork; a child creates its own on first use."""
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self.rejected = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='upload-parse')
+        return self._executor
+
+    def run(self, fn, *args):
+        """Run fn(*args) on the pool and wait for it; raises Saturated if the pool is full."""
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise Saturated('Too many uploads are being parsed', self.retry_after)
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def status(self):
+        return {'workers': self.max_workers, 'maxPending': self.max_pending, 'rejected': self.rejected}
+
+
+def csv_features(df, input_size=None):
+    """
+    The csi_ columns of a parsed CSV as a [rows, subcarriers] float32 array.
+
+    Raises PayloadError if there are no csi_ columns, a value isn't numeric,
+    there are no rows or (when input_size is given) the number of csi_
+    columns differs from it.
+    """
+    csi_columns = [col for col in df.columns if col.startswith('csi_')]
+    if not csi_columns:
+        raise PayloadError('Upload has no csi_ columns')
+    try:
+        features = df[csi_columns].to_numpy(dtype=np.float32)
+    except ValueError:
+        raise PayloadError('Upload has non-numeric csi_ values')
+    return check_frames(features, input_size)
+
+
+def parse_csv(file, max_rows=None, input_size=None):
+    """
+    Parse a CSV upload into (df, features) with the csi_ columns as features.
+
+    At most max_rows + 1 rows are read, so an oversized upload is rejected
+    with PayloadTooLarge without parsing the rest of it. Uploads that are
+    empty, unparseable or fail csv_features raise PayloadError.
+    """
+    # Imported on first use so workers that only see binary bodies never load pandas
+    import pandas as pd
+
+    try:
+        df = pd.read_csv(file, nrows=max_rows + 1 if max_rows else None)
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as e:
+        raise PayloadError(f'Could not parse CSV upload: {e}')
+    if max_rows and len(df) > max_rows:
+        raise PayloadTooLarge(f'Upload has more than {max_rows} rows')
+    return df, csv_features(df, input_size)
+
+
+def csv_chunks(file, chunk_rows, input_size=None):
+    """
+    Read a CSV upload chunk_rows rows at a time, returning an iterator of feature arrays.
+
+    The header and first chunk are read and checked (see csv_features) before
+    this returns, so a malformed upload raises PayloadError up front. Later
+    chunks are checked as they are read and raise PayloadError from the
+    iterator.
+    """
+    import pandas as pd
+
+    parse_errors = (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError)
+    try:
+        reader = pd.read_csv(file, chunksize=chunk_rows)
+        first = next(reader, None)
+    except parse_errors as e:
+        raise PayloadError(f'Could not parse CSV upload: {e}')
+    if first is None:
+        raise PayloadError('Payload has no CSI frames')
+    first = csv_features(first, input_size)
+
+    def chunks():
+        yield first
+        try:
+            for chunk in reader:
+                yield csv_features(chunk, input_size)
+        except parse_errors as e:
+            raise PayloadError(f'Could not parse CSV upload: {e}')
+
+    return chunks()
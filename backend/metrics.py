@@ -0,0 +1,144 @@
+"""
+Minimal Prometheus-style metrics, rendered in the text exposition format.
+
+Only counters, histograms and callback gauges are needed here, so this avoids
+a prometheus_client dependency. Metrics register themselves with a
+MetricsRegistry, whose ``render()`` output is served at ``/metrics``.
+
+Values are per process and are not aggregated across processes. Under a
+pre-fork server each worker keeps its own, so the registry's ``const_labels``
+(e.g. ``{'worker': '0'}``) are added to every sample to tell the workers'
+series apart; sum over the label to aggregate.
+"""
+import bisect
+import os
+import resource
+import threading
+
+# Seconds; covers sub-millisecond model stages up to multi-second uploads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class MetricsRegistry:
+    def __init__(self, const_labels=None):
+        self._metrics = []
+        # Labels added to every sample, e.g. which worker process served the scrape
+        self.const_labels = dict(const_labels or {})
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        const = list(self.const_labels.items())
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples(const))
+        return '\n'.join(lines) + '\n'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, const=()):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key, const)} {value}' for key, value in items]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self, const=()):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, list(const) + [('le', le)])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key, const)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key, const)} {count}')
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is read from a callback at scrape time.
+
+    The callback returns a number, or a dict mapping label value tuples to
+    numbers when the gauge has labels.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, registry, name, help, fn, labelnames=(), type=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        if type is not None:
+            self.type = type
+        registry.register(self)
+
+    def samples(self, const=()):
+        value = self.fn()
+        if not self.labelnames:
+            return [f'{self.name}{_format_labels((), (), const)} {value}']
+        return [f'{self.name}{_format_labels(self.labelnames, key, const)} {v}' for key, v in value.items()]
+
+
+def process_rss_bytes():
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
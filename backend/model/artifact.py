@@ -0,0 +1,166 @@
+"""
+Single-file model artifacts in the safetensors layout.
+
+An artifact is one file holding everything needed to serve a model:
+
+    8 bytes          little-endian uint64 N, the length of the JSON header
+    N bytes          JSON header: {name: {"dtype", "shape", "data_offsets"}, ...}
+                     plus "__metadata__" with string values (format version,
+                     class names, model config)
+    rest             the raw little-endian tensor data, back to back
+
+This is the safetensors format, written and read here with numpy alone so the
+safetensors package is not a dependency. Nothing is unpickled on load, so an
+artifact taken from shared storage can't execute code. Loading memory-maps
+the file copy-on-write, and the model's parameters are assigned views of that
+mapping instead of copies, so worker processes serving the same file share
+its pages through the page cache. Writers must replace the file (write a
+temporary file and rename it) rather than rewrite it in place, which keeps
+existing mappings valid during a hot deploy.
+
+Converting an existing best_model.pth (+ label_encoder.pkl):
+    python -m model.artifact backend/model/saved_models/best_model.pth
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+import torch
+
+ARTIFACT_SUFFIX = '.safetensors'
+ARTIFACT_FORMAT = 'wifi-pose'
+# Bump when the metadata or tensor names change incompatibly
+ARTIFACT_VERSION = 1
+
+DTYPES = {
+    'F64': np.float64,
+    'F32': np.float32,
+    'F16': np.float16,
+    'I64': np.int64,
+    'I32': np.int32,
+    'I16': np.int16,
+    'I8': np.int8,
+    'U8': np.uint8,
+    'BOOL': np.bool_,
+}
+DTYPE_NAMES = {np.dtype(v): k for k, v in DTYPES.items()}
+
+
+def write_safetensors(path, tensors, metadata=None):
+    """
+    Write a dict of name -> tensor/array to path, atomically.
+
+    Tensors are laid out by decreasing item size so every one starts at an
+    offset aligned to its dtype (the format allows no padding between them).
+    """
+    arrays = {}
+    for name, value in tensors.items():
+        if isinstance(value, torch.Tensor):
+            value = value.detach().cpu().numpy()
+        array = np.ascontiguousarray(value)
+        arrays[name] = array.astype(array.dtype.newbyteorder('<'), copy=False)
+
+    header = {}
+    offset = 0
+    order = sorted(arrays, key=lambda name: -arrays[name].dtype.itemsize)
+    for name in order:
+        array = arrays[name]
+        header[name] = {
+            'dtype': DTYPE_NAMES[np.dtype(array.dtype.type)],
+            'shape': list(array.shape),
+            'data_offsets': [offset, offset + array.nbytes],
+        }
+        offset += array.nbytes
+    if metadata:
+        header['__metadata__'] = {key: str(value) for key, value in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    # Pad the header so the data section starts 8-byte aligned
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for name in order:
+            f.write(arrays[name].tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_safetensors(path, mmap=True):
+    """
+    Return (tensors, metadata) from a safetensors file.
+
+    With mmap, the tensors are views of a copy-on-write mapping of the file,
+    so nothing is read until it is touched and untouched pages stay shared.
+    """
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+    metadata = header.pop('__metadata__', {})
+    data_start = 8 + header_len
+
+    if mmap:
+        data = np.memmap(path, dtype=np.uint8, mode='c', offset=data_start)
+    else:
+        with open(path, 'rb') as f:
+            f.seek(data_start)
+            data = np.frombuffer(bytearray(f.read()), dtype=np.uint8)
+
+    tensors = {}
+    for name, info in header.items():
+        begin, end = info['data_offsets']
+        array = data[begin:end].view(np.dtype(DTYPES[info['dtype']]).newbyteorder('<'))
+        tensors[name] = torch.from_numpy(array.reshape(info['shape']))
+    return tensors, metadata
+
+
+def save_artifact(predictor, path):
+    """Write a Predictor's weights, class names and model config as one artifact."""
+    metadata = {
+        'format': ARTIFACT_FORMAT,
+        'format_version': ARTIFACT_VERSION,
+        'classes': json.dumps(predictor.classes),
+        'config': json.dumps(predictor.config()),
+    }
+    write_safetensors(path, predictor.model.state_dict(), metadata)
+
+
+def read_artifact(path, mmap=True):
+    """Return (state_dict, classes, config) from an artifact written by save_artifact."""
+    state_dict, metadata = read_safetensors(path, mmap=mmap)
+    if metadata.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f'{path} is not a {ARTIFACT_FORMAT} model artifact')
+    version = int(metadata['format_version'])
+    if version > ARTIFACT_VERSION:
+        raise ValueError(f'{path} has artifact format version {version}; '
+                         f'this code reads up to version {ARTIFACT_VERSION}')
+    return state_dict, json.loads(metadata['classes']), json.loads(metadata['config'])
+
+
+def artifact_path(model_path):
+    """The artifact path that corresponds to a .pth weights file."""
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a .pth (+ label_encoder.pkl) model to a single artifact')
+    parser.add_argument('model_path', help='existing .pth weights file')
+    parser.add_argument('--out-path', help='defaults to the model path with a .safetensors suffix')
+    parser.add_argument('--input-size', type=int, default=256)
+    args = parser.parse_args()
+
+    # Loading handles every older layout, including a bare state dict with
+    # its classes in a pickled LabelEncoder next to it
+    from model.inference import Predictor
+    predictor = Predictor(args.input_size)
+    predictor.load_model(args.model_path)
+    out_path = args.out_path or artifact_path(args.model_path)
+    save_artifact(predictor, out_path)
+    print(f"Wrote {out_path} ({os.path.getsize(out_path)} bytes, classes {predictor.classes})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class SchedulerStopped(RuntimeError):
+    """Raised for requests submitted to, or still queued in, a stopped scheduler."""
+
+
+class BatchResult:
+    """Predictions for one request, sliced out of a shared batch."""
+
+    def __init__(self, presence_prob, pose_probs, presence_pred, pose_class, joints, loaded, timings, batch_rows):
+        self.presence_prob = presence_prob
+        self.pose_probs = pose_probs
+        self.presence_pred = presence_pred
+        self.pose_class = pose_class
+        # [rows, joints, 2], or None if the model has no trained keypoint head
+        self.joints = joints
+        self.loaded = loaded
+        # Stage timings of the whole batch this request was part of
+        self.timings = timings
+        self.batch_rows = batch_rows
+
+
+class _Request:
+    __slots__ = ('features', 'future', 'enqueued_at')
+
+    def __init__(self, features):
+        self.features = features
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchStats:
+    """Counters describing how well requests are being coalesced."""
+
+    # Upper bounds (in rows) of the batch size histogram buckets
+    BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.queue_wait_seconds = 0.0
+        self.batch_size_counts = [0] * (len(self.BUCKETS) + 1)
+
+    def record_batch(self, num_requests, num_rows, wait_seconds):
+        with self._lock:
+            self.requests += num_requests
+            self.rows += num_rows
+            self.batches += 1
+            self.queue_wait_seconds += wait_seconds
+            for i, bound in enumerate(self.BUCKETS):
+                if num_rows <= bound:
+                    self.batch_size_counts[i] += 1
+                    break
+            else:
+                self.batch_size_counts[-1] += 1
+
+    def record_depth(self, depth):
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.BUCKETS] + ['+Inf']
+            return {
+                'requests': self.requests,
+                'rows': self.rows,
+                'batches': self.batches,
+                'meanBatchRows': self.rows / self.batches if self.batches else 0.0,
+                'meanQueueWaitMs': 1000 * self.queue_wait_seconds / self.requests if self.requests else 0.0,
+                'maxQueueDepth': self.max_queue_depth,
+                'batchRowsHistogram': dict(zip(labels, self.batch_size_counts)),
+            }
+
+
+class BatchScheduler:
+    """
+    Coalesces concurrent prediction requests into a single forward pass.
+
+    Callers submit a [rows, features] array and block on the returned future.
+    A worker thread takes the first queued request, keeps collecting until it
+    has ``max_batch_size`` rows or ``max_wait_ms`` has passed, runs one
+    ``trainer.predict`` on the concatenated batch and scatters the rows back.
+    Requests whose future was cancelled while queued (e.g. ``predict`` timed
+    out) are dropped when the batch is collected, never scored.
+    The model snapshot is taken once per batch from ``registry.get()``, so a
+    hot-swap only affects batches that start after it.
+    """
+
+    def __init__(self, registry, max_batch_size=64, max_wait_ms=2.0, max_queue_size=0):
+        self.registry = registry
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = BatchStats()
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop = threading.Event()
+        self._worker = None
+
+    def start(self):
+        if self._worker is None:
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name='batch-scheduler', daemon=True)
+            self._worker.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        # Nothing will run what is still queued (e.g. the model was unloaded)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request.future.set_running_or_notify_cancel():
+                request.future.set_exception(SchedulerStopped('Scheduler stopped'))
+
+    def after_fork(self):
+        """Give a forked child its own queue and worker; threads don't survive fork."""
+        was_running = self._worker is not None
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._stop = threading.Event()
+        self._worker = None
+        self.stats = BatchStats()
+        if was_running:
+            self.start()
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def submit(self, features):
+        """
+        Queue a [rows, features] array; returns a Future resolving to a BatchResult.
+
+        Raises queue.Full if max_queue_size requests are already waiting,
+        SchedulerStopped once the scheduler has been stopped, and ValueError
+        for an array without rows or whose width isn't the model's input_size,
+        so a malformed request never joins (and fails) a shared batch.
+        """
+        if self._stop.is_set():
+            raise SchedulerStopped('Scheduler stopped')
+        features = np.asarray(features, dtype=np.float32)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if features.ndim != 2 or len(features) == 0:
+            raise ValueError(f'Expected a non-empty [rows, features] array, got shape {features.shape}')
+        loaded = self.registry.get()
+        if loaded is not None and features.shape[1] != loaded.trainer.input_size:
+            raise ValueError(f'Expected {loaded.trainer.input_size} features per row, got {features.shape[1]}')
+        request = _Request(features)
+        self._queue.put_nowait(request)
+        self.stats.record_depth(self._queue.qsize())
+        return request.future
+
+    def predict(self, features, timeout=None):
+        """
+        Submit and wait for this request's BatchResult.
+
+        Its timings hold the batch's stage timings (see Predictor.predict)
+        plus this request's 'queue_wait'. On TimeoutError the request is
+        cancelled, so it is skipped if it is still queued.
+        """
+        future = self.submit(features)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _collect(self, first):
+        batch = [first]
+        rows = len(first.features)
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            # Marks it running, so it can no longer be cancelled
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            batch.append(request)
+            rows += len(request.features)
+        return batch, rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if not first.future.set_running_or_notify_cancel():
+                # Its caller stopped waiting for it
+                continue
+
+            batch, rows = self._collect(first)
+            started = time.perf_counter()
+            wait_seconds = sum(started - r.enqueued_at for r in batch)
+
+            loaded = self.registry.get()
+            if loaded is None:
+                error = RuntimeError('Model not loaded')
+                for request in batch:
+                    request.future.set_exception(error)
+                continue
+
+            # A hot-swap between submit and now can change the input size;
+            # only the requests that no longer fit fail
+            input_size = loaded.trainer.input_size
+            mismatched = [r for r in batch if r.features.shape[1] != input_size]
+            if mismatched:
+                for request in mismatched:
+                    request.future.set_exception(ValueError(
+                        f'Expected {input_size} features per row, got {request.features.shape[1]}'))
+                batch = [r for r in batch if r.features.shape[1] == input_size]
+                rows = sum(len(r.features) for r in batch)
+                if not batch:
+                    continue
+
+            timings = {}
+            try:
+                if loaded.trainer.window_size > 1:
+                    # Each request is its own capture, so windows must not run across requests
+                    parts = [loaded.trainer.frame_windows(r.features)[0] for r in batch]
+                else:
+                    parts = [r.features for r in batch]
+                features = parts[0] if len(parts) == 1 else np.concatenate(parts)
+                presence_prob, pose_probs, joints = loaded.trainer.predict_proba(features, timings=timings)
+                presence_pred, pose_class = loaded.trainer.decode(presence_prob, pose_probs, timings=timings)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            self.stats.record_batch(len(batch), rows, wait_seconds)
+
+            offset = 0
+            for request in batch:
+                end = offset + len(request.features)
+                request_timings = dict(timings, queue_wait=started - request.enqueued_at)
+                request.future.set_result(BatchResult(
+                    presence_prob[offset:end], pose_probs[offset:end], presence_pred[offset:end],
+                    pose_class[offset:end], joints[offset:end] if joints is not None else None,
+                    loaded, request_timings, rows
+                ))
+                offset = end
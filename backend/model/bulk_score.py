@@ -0,0 +1,284 @@
+"""
+Offline scoring of capture directories on a pool of worker processes.
+
+Capture files (.csv with csi_ columns, .npy, or .csi as in csi_io) are
+grouped into tasks of --files-per-task files and spread over --workers
+processes. Each worker loads the model once. It concatenates the frames of a
+task's files and scores them in batches of --batch-size rows, so small files
+still give large forward passes. Windowed models (see model.windows) get
+their windows per file, so no window spans two files.
+
+Every task's results go into one new part file in the output directory,
+written atomically:
+
+    part-<run>-<task>.npz  files and file_offsets (frames of files[i] are rows
+                           file_offsets[i]:file_offsets[i + 1]), classes, and per
+                           frame presence_prob, presence, pose (index into
+                           classes), pose_probs, confidence and, if the keypoint
+                           head is trained, joints
+    manifest.jsonl         one line per scored file, appended once its part is on disk
+    meta.json              the model path and version the scores came from
+
+Parts are only ever added, and a rerun skips files already in the manifest,
+so an interrupted job resumes where it stopped. Files that cannot be read or
+whose frames don't have the model's input_size subcarriers are reported and
+left out of the manifest, as are the files of a task that fails; the rest of
+the job carries on, and a rerun tries those files again. load_scores reads the parts
+back as one set of columns.
+
+Usage:
+    python -m model.bulk_score ../data/captures --out-dir ../data/scores --workers 8
+"""
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import torch
+
+from csi_io import decode_csi, decode_npy
+from model.inference import Predictor, prediction_confidence
+from model.network import NUM_JOINTS
+from model.registry import file_version
+
+CAPTURE_SUFFIXES = ('.csv', '.npy', '.csi')
+MANIFEST_FILE = 'manifest.jsonl'
+META_FILE = 'meta.json'
+
+# Set in each worker process by _init_worker
+_predictor = None
+
+
+def find_captures(paths):
+    """Capture files under the given files and directories, sorted, as absolute paths."""
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.update(os.path.join(root, name) for name in files if name.endswith(CAPTURE_SUFFIXES))
+        else:
+            found.add(path)
+    return sorted(os.path.abspath(path) for path in found)
+
+
+def read_frames(path, input_size=None):
+    """
+    [frames, subcarriers] float32 array from one capture file.
+
+    Raises ValueError if the frames don't have input_size subcarriers.
+    """
+    if path.endswith('.csv'):
+        # Imported here so scoring binary captures never loads pandas
+        import pandas as pd
+        df = pd.read_csv(path)
+        frames = df[[col for col in df.columns if col.startswith('csi_')]].to_numpy(dtype=np.float32)
+    else:
+        with open(path, 'rb') as f:
+            body = bytearray(f.read())
+        frames = decode_csi(body) if path.endswith('.csi') else decode_npy(body)
+    if frames.ndim == 1:
+        frames = frames.reshape(1, -1)
+    if input_size is not None and frames.shape[1] != input_size:
+        raise ValueError(f'Expected {input_size} subcarriers per frame, got {frames.shape[1]}')
+    return frames
+
+
+def read_manifest(out_dir):
+    """Return {file: manifest entry} for every file already scored into out_dir."""
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    scored = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                scored[entry['file']] = entry
+    return scored
+
+
+def _init_worker(model_path, input_size, threads):
+    global _predictor
+    torch.set_num_threads(threads)
+    _predictor = Predictor(input_size)
+    _predictor.load_model(model_path)
+
+
+def _score_task(part_path, paths, batch_size):
+    """Score a group of files in one worker and write their results to part_path."""
+    started = time.perf_counter()
+    predictor = _predictor
+    frames, files, errors = [], [], []
+    for path in paths:
+        # A file that can't be scored is reported instead of failing the task
+        try:
+            frames.append(read_frames(path, predictor.input_size))
+            files.append(path)
+        except Exception as e:
+            errors.append((path, str(e)))
+
+    file_offsets = np.cumsum([0] + [len(f) for f in frames])
+    if predictor.window_size > 1:
+        # Windows stay within their own file
+        inputs = [predictor.frame_windows(f)[0] for f in frames if len(f)]
+    else:
+        inputs = frames
+    inputs = np.concatenate(inputs) if inputs else np.zeros((0, predictor.input_size), dtype=np.float32)
+
+    presence_prob, pose_probs, joints = [], [], []
+    for start in range(0, len(inputs), batch_size):
+        batch = predictor.predict_proba(inputs[start:start + batch_size])
+        presence_prob.append(batch[0])
+        pose_probs.append(batch[1])
+        if batch[2] is not None:
+            joints.append(batch[2])
+
+    num_classes = len(predictor.classes)
+    presence_prob = np.concatenate(presence_prob) if presence_prob else np.zeros(0, dtype=np.float32)
+    pose_probs = np.concatenate(pose_probs) if pose_probs else np.zeros((0, num_classes), dtype=np.float32)
+    presence = presence_prob > predictor.calibration['presence_threshold']
+    columns = {
+        'files': np.array(files, dtype=str),
+        'file_offsets': file_offsets.astype(np.int64),
+        'classes': np.array(predictor.classes, dtype=str),
+        'presence_prob': presence_prob,
+        'presence': presence,
+        'pose': pose_probs.argmax(axis=1).astype(np.int16),
+        'pose_probs': pose_probs,
+        'confidence': prediction_confidence(presence_prob, pose_probs, presence).astype(np.float32),
+    }
+    if predictor.has_joints:
+        columns['joints'] = np.concatenate(joints) if joints else np.zeros((0, NUM_JOINTS, 2), dtype=np.float32)
+
+    # Written under a temporary name, so a part is either complete or absent
+    with open(part_path + '.tmp', 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(part_path + '.tmp', part_path)
+    return {
+        'part': os.path.basename(part_path),
+        'files': [(path, int(end - begin)) for path, begin, end in zip(files, file_offsets[:-1], file_offsets[1:])],
+        'errors': errors,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def load_scores(out_dir):
+    """
+    All scores in out_dir as one dict of per-frame columns.
+
+    Adds 'file' (path per frame) and 'frame' (index within its file) to the
+    part columns; 'classes' maps the pose indices to names. The manifest is
+    authoritative: a file is read from the part it lists, so a file that
+    was scored again after an interrupted run appears once.
+    """
+    scored = read_manifest(out_dir)
+    columns = {}
+    for part_name in sorted({entry['part'] for entry in scored.values()}):
+        part = np.load(os.path.join(out_dir, part_name))
+        counts = np.diff(part['file_offsets'])
+        files = np.repeat(part['files'], counts)
+        keep = np.array([scored.get(path, {}).get('part') == part_name for path in part['files']], dtype=bool)
+        keep = np.repeat(keep, counts)
+        columns.setdefault('file', []).append(files[keep])
+        frames = np.arange(len(files)) - np.repeat(part['file_offsets'][:-1], counts)
+        columns.setdefault('frame', []).append(frames[keep])
+        columns['classes'] = part['classes']
+        for name in ('presence_prob', 'presence', 'pose', 'pose_probs', 'confidence', 'joints'):
+            if name in part:
+                columns.setdefault(name, []).append(part[name][keep])
+    return {name: value if name == 'classes' else np.concatenate(value) for name, value in columns.items()}
+
+
+def bulk_score(inputs, out_dir, model_path, workers=None, threads=None, files_per_task=16, batch_size=4096,
+               input_size=256):
+    """Score every capture under inputs into out_dir, skipping files scored there before."""
+    os.makedirs(out_dir, exist_ok=True)
+    version = file_version(model_path)
+    meta_path = os.path.join(out_dir, META_FILE)
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['model_version'] != version:
+            raise SystemExit(f"{out_dir} holds scores from model version {meta['model_version']}, "
+                             f"not {version}; pick a new --out-dir")
+    else:
+        with open(meta_path, 'w') as f:
+            json.dump({'model_path': os.path.abspath(model_path), 'model_version': version}, f, indent=2)
+
+    scored = read_manifest(out_dir)
+    # Parts not in the manifest are left over from an interrupted run; their
+    # files are scored again
+    listed = {entry['part'] for entry in scored.values()}
+    for path in glob.glob(os.path.join(out_dir, 'part-*.npz*')):
+        if os.path.basename(path) not in listed:
+            os.remove(path)
+
+    captures = find_captures(inputs)
+    todo = [path for path in captures if path not in scored]
+    print(f"{len(captures)} capture files, {len(captures) - len(todo)} already scored, {len(todo)} to score")
+    if not todo:
+        return
+
+    workers = workers or os.cpu_count()
+    # Keep workers * threads within the machine's cores
+    threads = threads or max(1, os.cpu_count() // workers)
+    run_id = time.strftime('%Y%m%d%H%M%S')
+    tasks = [todo[i:i + files_per_task] for i in range(0, len(todo), files_per_task)]
+
+    started = time.perf_counter()
+    files_done = frames_done = files_failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, input_size, threads)) as pool, \
+            open(os.path.join(out_dir, MANIFEST_FILE), 'a') as manifest:
+        futures = {
+            pool.submit(_score_task, os.path.join(out_dir, f'part-{run_id}-{i:05d}.npz'), paths, batch_size): paths
+            for i, paths in enumerate(tasks)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # Its files stay out of the manifest, so a rerun tries them again
+                paths = futures[future]
+                files_failed += len(paths)
+                print(f"Error scoring {len(paths)} files ({paths[0]} ...): {e}")
+                continue
+            files_failed += len(result['errors'])
+            for path, num_frames in result['files']:
+                manifest.write(json.dumps({'file': path, 'part': result['part'], 'frames': num_frames}) + '\n')
+                frames_done += num_frames
+            manifest.flush()
+            files_done += len(result['files'])
+            for path, error in result['errors']:
+                print(f"Error reading {path}: {error}")
+
+            elapsed = time.perf_counter() - started
+            print(f"{files_done}/{len(todo)} files, {frames_done} frames: "
+                  f"{files_done / elapsed:.1f} files/s, {frames_done / elapsed:.0f} frames/s")
+
+    print(f"Scored {files_done} files ({frames_done} frames) in {time.perf_counter() - started:.1f}s")
+    if files_failed:
+        print(f"{files_failed} files could not be scored; rerun to retry them")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score capture files in parallel into columnar npz parts')
+    parser.add_argument('inputs', nargs='+', help='capture files or directories (searched recursively)')
+    parser.add_argument('--out-dir', required=True)
+    parser.add_argument('--model-path', default='backend/model/saved_models/best_model.safetensors')
+    parser.add_argument('--workers', type=int, help='worker processes (default: one per CPU)')
+    parser.add_argument('--threads', type=int, help='torch threads per worker (default: CPUs / workers)')
+    parser.add_argument('--files-per-task', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=4096)
+    parser.add_argument('--input-size', type=int, default=256)
+    args = parser.parse_args()
+
+    bulk_score(args.inputs, args.out_dir, args.model_path, workers=args.workers, threads=args.threads,
+               files_per_task=args.files_per_task, batch_size=args.batch_size, input_size=args.input_size)
+
+
+if __name__ == '__main__':
+    main()
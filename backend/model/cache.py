@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """
+    LRU/TTL cache of prediction results keyed on CSI feature content.
+
+    The key is a hash of the float32 feature bytes, so a resent frame hits
+    whether it arrived as CSV or binary. With ``quantum`` set, features are
+    rounded to multiples of it before hashing, so near-identical frames (e.g.
+    an empty room) share an entry. At most ``max_entries`` results are kept,
+    each for at most ``ttl`` seconds. Entries belong to one model version;
+    the first lookup under a new version drops them all.
+    """
+
+    def __init__(self, max_entries=4096, ttl=300.0, quantum=0.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantum = quantum
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.invalidations = 0
+
+    def after_fork(self):
+        """Entries are per process, so a forked child starts empty."""
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evicted = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, features):
+        """Content hash of a [rows, features] array."""
+        features = np.ascontiguousarray(features, dtype=np.float32)
+        if self.quantum:
+            features = np.ascontiguousarray(np.round(features / self.quantum), dtype=np.int32)
+        digest = hashlib.blake2b(features.data, digest_size=16)
+        digest.update(repr(features.shape).encode())
+        return digest.digest()
+
+    def _check_version(self, version):
+        # Caller holds the lock
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        """Return the cached result for key under this model version, or None."""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl:
+                del self._entries[key]
+                self.evicted += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, result):
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (now, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def status(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl,
+            'quantum': self.quantum,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': self.hits / lookups if lookups else 0.0,
+            'evicted': self.evicted,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,164 @@
+"""
+Fit temperature scaling and a presence threshold on a validation CSV.
+
+The fitted values are written next to the weights, named after them (e.g.
+best_model.safetensors.calibration.json), where Predictor.load_model picks
+them up, so predict_proba returns calibrated probabilities from the same
+single forward pass. The calibration is part of the model version, so a
+running server reloads when it changes. Re-run this after training; saving
+new weights removes their stale calibration.
+
+Usage:
+    python -m model.calibration --model-path backend/model/saved_models/best_model.safetensors \
+        --valid-csv data/test_data/wifi_csi_test.csv
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn.functional as F
+
+from model.inference import DEFAULT_CALIBRATION, Predictor, calibration_path
+
+
+def _raw_outputs(trainer, features, batch_size=1024):
+    """Presence logits and pose logits for every row, without any calibration applied."""
+    trainer.model.eval()
+    presence_logits, pose_logits = [], []
+    context = None
+    with torch.no_grad():
+        for start in range(0, len(features), batch_size):
+            batch = features[start:start + batch_size]
+            if trainer.window_size > 1:
+                batch, context = trainer.frame_windows(batch, context)
+                # Gather the overlapping window views into one array
+                batch = np.array(batch)
+            batch = torch.as_tensor(batch).to(trainer.device)
+            presence_out, pose_out = trainer.model(batch)[:2]
+            presence_logits.append(torch.logit(presence_out.reshape(-1), eps=1e-6).cpu())
+            pose_logits.append(pose_out.cpu())
+    return torch.cat(presence_logits), torch.cat(pose_logits)
+
+
+def _fit_temperature(loss_fn, max_iter=100):
+    """Minimize loss_fn(temperature) over log(temperature), so it stays positive."""
+    log_t = torch.zeros(1, requires_grad=True)
+    optimizer = torch.optim.LBFGS([log_t], lr=0.1, max_iter=max_iter, line_search_fn='strong_wolfe')
+
+    def closure():
+        optimizer.zero_grad()
+        loss = loss_fn(log_t.exp())
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    return float(log_t.exp().item())
+
+
+def expected_calibration_error(confidence, correct, bins=15):
+    """Weighted mean gap between confidence and accuracy over equal-width bins."""
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    ece = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            ece += in_bin.mean() * abs(confidence[in_bin].mean() - correct[in_bin].mean())
+    return float(ece)
+
+
+def _best_threshold(presence_prob, presence_labels):
+    """Presence threshold with the highest accuracy, searched over the observed probabilities."""
+    candidates = np.unique(np.concatenate([[0.5], np.quantile(presence_prob, np.linspace(0.01, 0.99, 99))]))
+    accuracies = [np.mean((presence_prob > t) == presence_labels) for t in candidates]
+    return float(candidates[int(np.argmax(accuracies))])
+
+
+def _report(presence_prob, pose_probs, threshold, presence_labels, pose_labels):
+    presence_pred = presence_prob > threshold
+    presence_confidence = np.where(presence_pred, presence_prob, 1.0 - presence_prob)
+    pose_pred = pose_probs.argmax(axis=1)
+    return {
+        'presence_accuracy': float(np.mean(presence_pred == presence_labels)),
+        'presence_ece': expected_calibration_error(presence_confidence, presence_pred == presence_labels),
+        'pose_accuracy': float(np.mean(pose_pred == pose_labels)),
+        'pose_ece': expected_calibration_error(pose_probs.max(axis=1), pose_pred == pose_labels),
+    }
+
+
+def fit_calibration(trainer, valid_csv):
+    """
+    Fit presence/pose temperatures and the presence threshold on a validation CSV.
+
+    Returns (calibration, report) where report holds accuracy and expected
+    calibration error before and after.
+    """
+    df = pd.read_csv(valid_csv)
+    csi_columns = [col for col in df.columns if col.startswith('csi_')]
+    features = df[csi_columns].to_numpy(dtype=np.float32)
+    presence_labels = df['human_presence'].to_numpy(dtype=np.float32)
+    class_index = {name: i for i, name in enumerate(trainer.classes)}
+    pose_labels = df['pose_class'].astype(str).map(class_index).to_numpy()
+
+    presence_logits, pose_logits = _raw_outputs(trainer, features)
+    presence_target = torch.as_tensor(presence_labels)
+    pose_target = torch.as_tensor(pose_labels, dtype=torch.long)
+
+    presence_temperature = _fit_temperature(
+        lambda t: F.binary_cross_entropy_with_logits(presence_logits / t, presence_target))
+    pose_temperature = _fit_temperature(lambda t: F.cross_entropy(pose_logits / t, pose_target))
+
+    before_presence = torch.sigmoid(presence_logits).numpy()
+    before_pose = torch.softmax(pose_logits, dim=1).numpy()
+    after_presence = torch.sigmoid(presence_logits / presence_temperature).numpy()
+    after_pose = torch.softmax(pose_logits / pose_temperature, dim=1).numpy()
+    presence_threshold = _best_threshold(after_presence, presence_labels)
+
+    calibration = {
+        'presence_temperature': presence_temperature,
+        'pose_temperature': pose_temperature,
+        'presence_threshold': presence_threshold,
+        'rows': len(df),
+    }
+    report = {
+        'before': _report(before_presence, before_pose, DEFAULT_CALIBRATION['presence_threshold'],
+                          presence_labels, pose_labels),
+        'after': _report(after_presence, after_pose, presence_threshold, presence_labels, pose_labels),
+    }
+    return calibration, report
+
+
+def save_calibration(calibration, model_path):
+    """Write the calibration for the weights at model_path next to them; returns its path."""
+    path = calibration_path(model_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(calibration, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit confidence calibration for a trained model')
+    parser.add_argument('--model-path', default='backend/model/saved_models/best_model.safetensors')
+    parser.add_argument('--valid-csv', required=True)
+    parser.add_argument('--input-size', type=int, default=256)
+    args = parser.parse_args()
+
+    trainer = Predictor(args.input_size)
+    trainer.load_model(args.model_path)
+    calibration, report = fit_calibration(trainer, args.valid_csv)
+    path = save_calibration(calibration, args.model_path)
+
+    print(f"Presence temperature {calibration['presence_temperature']:.4f}, "
+          f"threshold {calibration['presence_threshold']:.4f}")
+    print(f"Pose temperature {calibration['pose_temperature']:.4f}")
+    for name in ('presence_accuracy', 'presence_ece', 'pose_accuracy', 'pose_ece'):
+        print(f"{name}: before {report['before'][name]:.4f}, after {report['after'][name]:.4f}")
+    print(f"Saved calibration to {path}")
+
+
+if __name__ == '__main__':
+    main()
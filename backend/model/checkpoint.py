@@ -0,0 +1,177 @@
+import glob
+import json
+import os
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+
+INDEX_FILE = 'checkpoints.json'
+
+
+def _snapshot(obj):
+    """Detached CPU copy of a (nested) state dict, safe to write from another thread."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot(v) for v in obj)
+    return obj
+
+
+def get_rng_state():
+    np_state = np.random.get_state()
+    state = {
+        'torch': torch.get_rng_state(),
+        'numpy': (np_state[0], torch.from_numpy(np_state[1].astype(np.int64)), *np_state[2:]),
+        'python': random.getstate(),
+    }
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    torch.set_rng_state(state['torch'])
+    name, keys, *rest = state['numpy']
+    np.random.set_state((name, keys.numpy().astype(np.uint32), *rest))
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def check_resumable(checkpoint, path, **expected):
+    """Raise ValueError unless checkpoint was saved with the expected values (e.g. config=..., run=...)."""
+    for key, value in expected.items():
+        saved = checkpoint.get(key)
+        if saved != value:
+            raise ValueError(f'Cannot resume from {path}: it was saved with {key} {saved}, not {value}. '
+                             f'Train without resume to start a fresh run in that directory.')
+
+
+class CheckpointManager:
+    """
+    Saves resumable training checkpoints off the training thread.
+
+    ``save`` snapshots the model, optimizer and RNG state on the caller's
+    thread (a fast in-memory copy) and hands the write to a background thread.
+    Only the ``keep_top_k`` checkpoints with the lowest validation loss are
+    kept on disk, plus the most recent one so training can always resume.
+    """
+
+    def __init__(self, directory, keep_top_k=3, interval=1):
+        self.directory = directory
+        self.keep_top_k = keep_top_k
+        self.interval = interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._entries = self._read_index()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='checkpoint-writer', daemon=True)
+        self._writer.start()
+        self.error = None
+
+    def should_save(self, epoch):
+        return self.interval > 0 and epoch % self.interval == 0
+
+    def save(self, epoch, model, optimizer, valid_loss, **extra):
+        checkpoint = {
+            'epoch': epoch,
+            'valid_loss': valid_loss,
+            'model_state_dict': _snapshot(model.state_dict()),
+            'optimizer_state_dict': _snapshot(optimizer.state_dict()),
+            'rng_state': get_rng_state(),
+        }
+        checkpoint.update(extra)
+        self._queue.put(checkpoint)
+
+    def latest(self):
+        """Path of the most recent checkpoint on disk, or None."""
+        self.wait()
+        if not self._entries:
+            return None
+        entry = max(self._entries, key=lambda e: e['epoch'])
+        return os.path.join(self.directory, entry['file'])
+
+    def best(self):
+        """Path of the checkpoint with the lowest validation loss, or None."""
+        self.wait()
+        if not self._entries:
+            return None
+        entry = min(self._entries, key=lambda e: e['valid_loss'])
+        return os.path.join(self.directory, entry['file'])
+
+    def clear(self):
+        """Delete every checkpoint in the directory, so a fresh run's top-k isn't mixed with an earlier run's."""
+        self.wait()
+        for path in glob.glob(os.path.join(self.directory, 'epoch_*.pt*')):
+            os.remove(path)
+        self._entries = []
+        self._write_index()
+
+    def load(self, path, map_location='cpu'):
+        return torch.load(path, map_location=map_location)
+
+    def wait(self):
+        """Block until every queued checkpoint has been written."""
+        self._queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.wait()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _read_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return []
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._entries, f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def _write_loop(self):
+        while True:
+            checkpoint = self._queue.get()
+            if checkpoint is None:
+                self._queue.task_done()
+                return
+            try:
+                self._write(checkpoint)
+            except Exception as e:
+                print(f"Error writing checkpoint for epoch {checkpoint['epoch']}: {str(e)}")
+                self.error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, checkpoint):
+        filename = f"epoch_{checkpoint['epoch']:04d}.pt"
+        path = os.path.join(self.directory, filename)
+        torch.save(checkpoint, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+        self._entries = [e for e in self._entries if e['file'] != filename]
+        self._entries.append({'epoch': checkpoint['epoch'], 'valid_loss': checkpoint['valid_loss'], 'file': filename})
+
+        # Keep the top-k by validation loss and the latest epoch
+        ranked = sorted(self._entries, key=lambda e: e['valid_loss'])
+        latest = max(self._entries, key=lambda e: e['epoch'])
+        keep = ranked[:self.keep_top_k]
+        if latest not in keep:
+            keep.append(latest)
+        for entry in self._entries:
+            if entry not in keep:
+                stale = os.path.join(self.directory, entry['file'])
+                if os.path.exists(stale):
+                    os.remove(stale)
+        self._entries = sorted(keep, key=lambda e: e['epoch'])
+        self._write_index()
@@ -0,0 +1,207 @@
+"""
+Memory-mapped, columnar storage for CSI training data.
+
+A CSV capture is converted once into a directory of raw little-endian arrays:
+
+    features.f32       float32 [rows, subcarriers]
+    presence.f32       float32 [rows]
+    pose.i64           int64   [rows], indices into meta.json's classes
+    joints.f32         float32 [rows, 17, 2], only if the CSV has joint_* columns
+    meta.json          row/feature counts, column names, pose classes and,
+                       if the CSV has a capture_id column, where each capture starts
+    label_encoder.pkl  LabelEncoder fitted on the classes
+
+MmapCSIDataset maps these files instead of loading them, so opening a store
+costs the same whatever its size and only the rows a batch touches are read.
+
+Usage:
+    python -m model.csi_store data/train_data/wifi_csi_train.csv data/train_store
+    python -m model.csi_store data/test_data/wifi_csi_test.csv data/test_store --classes-from data/train_store
+"""
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+from model.network import NUM_JOINTS
+from model.windows import capture_starts
+
+FEATURES_FILE = 'features.f32'
+PRESENCE_FILE = 'presence.f32'
+POSE_FILE = 'pose.i64'
+JOINTS_FILE = 'joints.f32'
+META_FILE = 'meta.json'
+ENCODER_FILE = 'label_encoder.pkl'
+
+# Keypoint targets: x and y of each joint, in joint order
+JOINT_COLUMNS = [f'joint_{i}_{axis}' for i in range(NUM_JOINTS) for axis in ('x', 'y')]
+
+# Optional column naming the recording each row belongs to; consecutive rows
+# with the same id are consecutive frames of one capture
+CAPTURE_COLUMN = 'capture_id'
+
+
+def has_joint_columns(columns):
+    return set(JOINT_COLUMNS).issubset(columns)
+
+
+def is_store(path):
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, META_FILE))
+
+
+def read_meta(store_dir):
+    with open(os.path.join(store_dir, META_FILE)) as f:
+        return json.load(f)
+
+
+def convert_csv(csv_path, out_dir, classes=None, chunksize=50000):
+    """
+    Convert a training CSV into a memory-mapped store in a single streaming pass.
+
+    If classes is given (e.g. the training store's classes when converting a
+    validation set), pose labels are encoded against it so both stores agree;
+    otherwise the classes are the sorted set of labels seen, as LabelEncoder does.
+    """
+    # Only needed for conversion; reading a store stays free of pandas and sklearn
+    import pandas as pd
+    from sklearn.preprocessing import LabelEncoder
+
+    os.makedirs(out_dir, exist_ok=True)
+    class_index = {c: i for i, c in enumerate(classes)} if classes is not None else {}
+    csi_columns = None
+    has_joints = False
+    num_rows = 0
+    starts = None
+    last_capture = None
+    pose_chunks = []
+    joints_path = os.path.join(out_dir, JOINTS_FILE)
+
+    with open(os.path.join(out_dir, FEATURES_FILE), 'wb') as features_out, \
+            open(os.path.join(out_dir, PRESENCE_FILE), 'wb') as presence_out, \
+            open(joints_path, 'wb') as joints_out:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            if csi_columns is None:
+                csi_columns = [col for col in chunk.columns if col.startswith('csi_')]
+                has_joints = has_joint_columns(chunk.columns)
+
+            features_out.write(chunk[csi_columns].to_numpy(dtype='<f4').tobytes())
+            presence_out.write(chunk['human_presence'].to_numpy(dtype='<f4').tobytes())
+            if has_joints:
+                joints_out.write(chunk[JOINT_COLUMNS].to_numpy(dtype='<f4').tobytes())
+            if CAPTURE_COLUMN in chunk.columns and len(chunk):
+                captures = chunk[CAPTURE_COLUMN].to_numpy()
+                chunk_starts = capture_starts(captures)
+                if starts is None:
+                    starts = []
+                if last_capture is not None and captures[0] == last_capture:
+                    # The first capture continues from the previous chunk
+                    chunk_starts = chunk_starts[1:]
+                starts.extend(num_rows + start for start in chunk_starts)
+                last_capture = captures[-1]
+
+            labels = chunk['pose_class'].astype(str)
+            if classes is None:
+                for label in labels.unique():
+                    class_index.setdefault(label, len(class_index))
+            unknown = set(labels.unique()) - set(class_index)
+            if unknown:
+                raise ValueError(f'Pose classes {sorted(unknown)} are not in the given classes')
+            pose_chunks.append(labels.map(class_index).to_numpy(dtype=np.int64))
+            num_rows += len(chunk)
+
+    if not has_joints:
+        os.remove(joints_path)
+
+    pose = np.concatenate(pose_chunks) if pose_chunks else np.zeros(0, dtype=np.int64)
+    if classes is None:
+        # Renumber first-seen codes into sorted order to match LabelEncoder
+        classes = sorted(class_index)
+        remap = np.empty(len(classes), dtype=np.int64)
+        for label, code in class_index.items():
+            remap[code] = classes.index(label)
+        pose = remap[pose]
+    pose.astype('<i8').tofile(os.path.join(out_dir, POSE_FILE))
+
+    label_encoder = LabelEncoder().fit(classes)
+    with open(os.path.join(out_dir, ENCODER_FILE), 'wb') as f:
+        pickle.dump(label_encoder, f)
+
+    meta = {
+        'num_rows': num_rows,
+        'num_features': len(csi_columns or []),
+        'csi_columns': csi_columns or [],
+        'classes': list(classes),
+        'has_joints': has_joints,
+        'capture_starts': starts,
+        'source': os.path.abspath(csv_path),
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class MmapCSIDataset(Dataset):
+    """Dataset over a converted store; arrays are memory-mapped, never loaded whole."""
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.meta = read_meta(store_dir)
+        self.classes = self.meta['classes']
+        # Row offsets where each capture begins; None if the CSV had no capture ids
+        self.capture_starts = self.meta.get('capture_starts')
+        num_rows, num_features = self.meta['num_rows'], self.meta['num_features']
+
+        self.features = self._map(FEATURES_FILE, '<f4', (num_rows, num_features))
+        self.presence_labels = self._map(PRESENCE_FILE, '<f4', (num_rows,))
+        self.pose_labels = self._map(POSE_FILE, '<i8', (num_rows,))
+        # Stores converted before joints were stored have no has_joints key
+        self.joints = None
+        if self.meta.get('has_joints'):
+            self.joints = self._map(JOINTS_FILE, '<f4', (num_rows, NUM_JOINTS, 2))
+
+    def _map(self, name, dtype, shape):
+        path = os.path.join(self.store_dir, name)
+        if shape[0] == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    def __len__(self):
+        return self.meta['num_rows']
+
+    def __getitem__(self, idx):
+        if isinstance(idx, list):
+            # Batch of indices: sorting turns random row reads into one
+            # forward sweep over the mapping; order within a batch is irrelevant
+            idx = np.sort(np.asarray(idx))
+        # np.array copies the touched rows out of the read-only mapping
+        return (
+            torch.from_numpy(np.array(self.features[idx])),
+            torch.from_numpy(np.array(self.presence_labels[idx])),
+            torch.from_numpy(np.array(self.pose_labels[idx])),
+            torch.from_numpy(np.array(self.joints[idx])) if self.joints is not None else None
+        )
+
+    def get_label_encoder(self):
+        with open(os.path.join(self.store_dir, ENCODER_FILE), 'rb') as f:
+            return pickle.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a CSI training CSV into a memory-mapped store')
+    parser.add_argument('csv_path')
+    parser.add_argument('out_dir')
+    parser.add_argument('--classes-from', help='existing store whose pose classes should be reused')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    classes = read_meta(args.classes_from)['classes'] if args.classes_from else None
+    meta = convert_csv(args.csv_path, args.out_dir, classes=classes, chunksize=args.chunksize)
+    print(f"Converted {meta['num_rows']} rows x {meta['num_features']} features to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
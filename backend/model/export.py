@@ -0,0 +1,139 @@
+"""
+Export a CPU-optimized inference artifact next to best_model.safetensors.
+
+The float model's LSTM and Linear layers are dynamically quantized to int8
+and the result is traced to TorchScript, giving a self-contained module that
+Predictor.load_model (and the server, with MODEL_VARIANT=int8) can load in
+place of the state dict. Both ``forward`` and the streaming ``step`` are traced.
+
+Usage:
+    python -m model.export --model-path backend/model/saved_models/best_model.safetensors \
+        --valid-csv data/test_data/wifi_csi_test.csv
+"""
+import argparse
+import json
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+from model.calibration import save_calibration
+from model.inference import (CLASSES_FILE, CONFIG_FILE, DEFAULT_CALIBRATION, Predictor, calibration_path,
+                             optimized_path)
+
+
+def export_optimized(trainer, out_path, example_rows=64):
+    """Quantize trainer's model to int8, trace it and save it to out_path."""
+    model = trainer.model.cpu().eval()
+    with warnings.catch_warnings():
+        # quantize_dynamic is deprecated in favour of torchao, which is not a dependency here
+        warnings.simplefilter('ignore')
+        quantized = torch.ao.quantization.quantize_dynamic(model, {nn.LSTM, nn.Linear}, dtype=torch.qint8)
+
+    # Raw frames: preprocessing, if any, is traced into the module
+    input_size = trainer.input_size
+    # Tracing fixes the input rank: windowed models are always fed windows
+    if trainer.window_size > 1:
+        example = torch.randn(example_rows, trainer.window_size, input_size)
+    else:
+        example = torch.randn(example_rows, input_size)
+    example_step = torch.randn(1, 4, input_size)
+    state = (torch.zeros(model.num_layers, 1, model.hidden_size), torch.zeros(model.num_layers, 1, model.hidden_size))
+    with torch.no_grad():
+        scripted = torch.jit.trace_module(
+            quantized, {'forward': (example,), 'step': (example_step, state)}, check_trace=False
+        )
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    # The class names and config travel inside the artifact, like in the float checkpoint
+    extra_files = {CLASSES_FILE: json.dumps(trainer.classes), CONFIG_FILE: json.dumps(trainer.config())}
+    torch.jit.save(scripted, out_path + '.tmp', _extra_files=extra_files)
+    os.replace(out_path + '.tmp', out_path)
+    # The export keeps the calibration fitted for the float weights
+    if trainer.calibration != DEFAULT_CALIBRATION:
+        save_calibration(trainer.calibration, out_path)
+    elif os.path.exists(calibration_path(out_path)):
+        os.remove(calibration_path(out_path))
+    trainer.model.to(trainer.device)
+    return out_path
+
+
+def _latency_ms(trainer, features, repeat):
+    trainer.predict(features)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        trainer.predict(features)
+        times.append(time.perf_counter() - started)
+    return 1000 * float(np.median(times))
+
+
+def _metrics(trainer, features, presence_labels, pose_labels):
+    presence_pred, pose_class = trainer.predict(features)
+    presence_pred = np.atleast_1d(np.asarray(presence_pred))
+    return {
+        'presence_accuracy': float(np.mean(presence_pred == presence_labels)),
+        'pose_accuracy': float(np.mean(pose_class == pose_labels)),
+    }, presence_pred, pose_class
+
+
+def parity_report(float_trainer, optimized_trainer, valid_csv, batch_sizes=(1, 256), repeat=50):
+    """Compare accuracy and latency of the float and optimized models on a validation CSV."""
+    df = pd.read_csv(valid_csv)
+    csi_columns = [col for col in df.columns if col.startswith('csi_')]
+    features = df[csi_columns].to_numpy(dtype=np.float32)
+    presence_labels = df['human_presence'].to_numpy(dtype=np.float32)
+    pose_labels = df['pose_class'].astype(str).to_numpy()
+
+    float_metrics, float_presence, float_pose = _metrics(float_trainer, features, presence_labels, pose_labels)
+    opt_metrics, opt_presence, opt_pose = _metrics(optimized_trainer, features, presence_labels, pose_labels)
+
+    report = {
+        'rows': len(df),
+        'float': float_metrics,
+        'int8': opt_metrics,
+        'presence_agreement': float(np.mean(float_presence == opt_presence)),
+        'pose_agreement': float(np.mean(float_pose == opt_pose)),
+        'latency_ms': {},
+    }
+    for batch_size in batch_sizes:
+        batch = features[:batch_size] if len(features) >= batch_size else np.resize(features, (batch_size, features.shape[1]))
+        float_ms = _latency_ms(float_trainer, batch, repeat)
+        opt_ms = _latency_ms(optimized_trainer, batch, repeat)
+        report['latency_ms'][batch_size] = {'float': float_ms, 'int8': opt_ms, 'speedup': float_ms / opt_ms}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export an int8 TorchScript model and check its parity')
+    parser.add_argument('--model-path', default='backend/model/saved_models/best_model.safetensors')
+    parser.add_argument('--out-path', help='defaults to the model path with a .int8.pt suffix')
+    parser.add_argument('--valid-csv', help='validation CSV for the accuracy/latency parity check')
+    parser.add_argument('--input-size', type=int, default=256)
+    args = parser.parse_args()
+
+    float_trainer = Predictor(args.input_size)
+    float_trainer.load_model(args.model_path)
+    out_path = export_optimized(float_trainer, args.out_path or optimized_path(args.model_path))
+    print(f"Exported optimized model to {out_path}")
+
+    if args.valid_csv:
+        optimized_trainer = Predictor(args.input_size)
+        optimized_trainer.load_model(out_path)
+        report = parity_report(float_trainer, optimized_trainer, args.valid_csv)
+        print(f"Rows: {report['rows']}")
+        for name in ('presence_accuracy', 'pose_accuracy'):
+            delta = report['int8'][name] - report['float'][name]
+            print(f"{name}: float {report['float'][name]:.4f}, int8 {report['int8'][name]:.4f} ({delta:+.4f})")
+        print(f"Agreement with float: presence {report['presence_agreement']:.4f}, pose {report['pose_agreement']:.4f}")
+        for batch_size, latency in report['latency_ms'].items():
+            print(f"Batch {batch_size}: float {latency['float']:.3f} ms, int8 {latency['int8']:.3f} ms "
+                  f"({latency['speedup']:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""
+Incremental fine-tuning of the current model on newly labelled captures.
+
+Instead of retraining from random weights on every capture collected so far,
+fine-tuning starts from the saved model and trains for a few epochs on the
+new capture files only (CSVs or stores built by model.csi_store), read one
+file at a time. So that poses missing from the new captures aren't
+forgotten, every batch of new samples is trained together with samples drawn
+from a replay buffer: a fixed-size uniform sample (reservoir sampling) of
+all samples trained on before, kept next to the model as replay.npz. Once
+the new model is saved, the new samples join the buffer for the next round.
+
+The first run builds the buffer in one streaming pass over the original
+training data (--seed-data). Each run appends one JSON line to
+finetune_log.jsonl next to the model with the wall-clock time and the
+validation loss/accuracy before and after; --full-retrain also trains a
+model from scratch on the given data for comparison.
+
+Usage:
+    python -m model.finetune ../data/new_captures --model-path model/saved_models/best_model.safetensors \
+        --valid ../data/test_data/wifi_csi_test.csv --seed-data ../data/train_store
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import torch
+import torch.optim as optim
+
+from model.csi_store import is_store
+from model.lstm_model import ModelTrainer, make_loader, open_dataset
+from model.network import NUM_JOINTS
+from model.registry import file_version
+from model.windows import WindowedCSIDataset
+
+REPLAY_FILE = 'replay.npz'
+LOG_FILE = 'finetune_log.jsonl'
+
+
+def find_training_data(paths):
+    """Labelled CSV files and store directories under the given paths, sorted."""
+    found = set()
+    for path in paths:
+        if not os.path.isdir(path) or is_store(path):
+            found.add(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            stores = [name for name in dirs if is_store(os.path.join(root, name))]
+            found.update(os.path.join(root, name) for name in stores)
+            # A store's own files are not searched again
+            dirs[:] = [name for name in dirs if name not in stores]
+            found.update(os.path.join(root, name) for name in files if name.endswith('.csv'))
+    return sorted(found)
+
+
+def labelled_batches(path, trainer, batch_size, shuffle=False):
+    """
+    Yield (features, presence, pose, joints) batches from one CSV or store.
+
+    Samples are shaped for trainer's model (windows for a windowed model,
+    never crossing captures) and pose labels are indices into
+    trainer.classes. joints is None if the data has no joint columns.
+    """
+    dataset = open_dataset(path)
+    unknown = sorted(set(dataset.classes) - set(trainer.classes))
+    if unknown:
+        raise ValueError(f'{path} has pose classes {unknown} that the model was not trained on')
+    # The file's own label encoding, mapped onto the model's
+    remap = torch.tensor([trainer.classes.index(c) for c in dataset.classes], dtype=torch.long)
+    if trainer.window_size > 1:
+        dataset = WindowedCSIDataset(dataset, trainer.window_size)
+    for features, presence, pose, joints in make_loader(dataset, batch_size, shuffle=shuffle):
+        yield features, presence, remap[pose], joints
+
+
+class ReplayBuffer:
+    """
+    Uniform sample of at most capacity training samples out of all added so far.
+
+    add() does reservoir sampling over every sample passed to it, so the
+    buffer stays an unbiased sample of all training data however many rounds
+    of captures it has seen. Joints are stored when with_joints is set; samples
+    added without them get NaN, which batch_loss leaves out.
+    """
+
+    def __init__(self, capacity, with_joints=False, seed=None):
+        self.capacity = capacity
+        self.with_joints = with_joints
+        self.seen = 0
+        self.features = None
+        self.presence = np.zeros(capacity, dtype=np.float32)
+        self.pose = np.zeros(capacity, dtype=np.int64)
+        self.joints = None
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return min(self.seen, self.capacity)
+
+    def add(self, features, presence, pose, joints=None):
+        features = np.asarray(features, dtype=np.float32)
+        if self.features is None:
+            self.features = np.zeros((self.capacity,) + features.shape[1:], dtype=np.float32)
+            if self.with_joints:
+                self.joints = np.full((self.capacity, NUM_JOINTS, 2), np.nan, dtype=np.float32)
+        # Sample n (0-based) replaces a random slot with probability capacity / (n + 1)
+        index = self.seen + np.arange(len(features))
+        slots = np.where(index < self.capacity, index, self._rng.integers(0, index + 1))
+        rows = np.flatnonzero(slots < self.capacity)
+        slots = slots[rows]
+        self.features[slots] = features[rows]
+        self.presence[slots] = np.asarray(presence)[rows]
+        self.pose[slots] = np.asarray(pose)[rows]
+        if self.joints is not None:
+            self.joints[slots] = np.asarray(joints)[rows] if joints is not None else np.nan
+        self.seen += len(features)
+
+    def sample(self, n):
+        """n random samples as (features, presence, pose, joints) tensors; joints is None without with_joints."""
+        idx = self._rng.integers(0, len(self), n)
+        return (
+            torch.from_numpy(self.features[idx]),
+            torch.from_numpy(self.presence[idx]),
+            torch.from_numpy(self.pose[idx]),
+            torch.from_numpy(self.joints[idx]) if self.joints is not None else None,
+        )
+
+    def save(self, path):
+        n = len(self)
+        arrays = {'seen': np.array(self.seen), 'capacity': np.array(self.capacity),
+                  'presence': self.presence[:n], 'pose': self.pose[:n]}
+        if self.features is not None:
+            arrays['features'] = self.features[:n]
+        if self.joints is not None:
+            arrays['joints'] = self.joints[:n]
+        # Written under a temporary name, so a crash never leaves a partial buffer
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path, capacity=None, seed=None):
+        """Read a saved buffer; a smaller capacity keeps a random subset of it."""
+        data = np.load(path)
+        buffer = cls(capacity or int(data['capacity']), with_joints='joints' in data, seed=seed)
+        if 'features' in data:
+            n = len(data['features'])
+            keep = np.sort(buffer._rng.permutation(n)[:buffer.capacity])
+            buffer.features = np.zeros((buffer.capacity,) + data['features'].shape[1:], dtype=np.float32)
+            buffer.features[:len(keep)] = data['features'][keep]
+            buffer.presence[:len(keep)] = data['presence'][keep]
+            buffer.pose[:len(keep)] = data['pose'][keep]
+            if buffer.with_joints:
+                buffer.joints = np.full((buffer.capacity,) + data['joints'].shape[1:], np.nan, dtype=np.float32)
+                buffer.joints[:len(keep)] = data['joints'][keep]
+            # A buffer loaded into a larger capacity is not full, and counts only what it holds
+            buffer.seen = int(data['seen']) if len(keep) == buffer.capacity else len(keep)
+        return buffer
+
+
+def batch_loss(trainer, features, presence, pose, joints):
+    """(loss, model outputs) for a batch, counting the joint term only for rows that have joints."""
+    outputs = trainer.model(features)
+    presence_out, pose_out, joints_out = outputs
+    loss = trainer.criterion_presence(presence_out.reshape(-1), presence) + trainer.criterion_pose(pose_out, pose)
+    if joints is not None and trainer.has_joints:
+        labelled = ~torch.isnan(joints).flatten(1).any(dim=1)
+        if labelled.any():
+            loss = loss + trainer.criterion_joints(joints_out[labelled], joints[labelled])
+    return loss, outputs
+
+
+def evaluate(trainer, path, batch_size=1024):
+    """Mean loss and presence/pose accuracy over every sample of a CSV or store."""
+    trainer.model.eval()
+    total_loss = presence_correct = pose_correct = rows = 0
+    with torch.no_grad():
+        for features, presence, pose, joints in labelled_batches(path, trainer, batch_size):
+            features = features.to(trainer.device)
+            presence, pose = presence.to(trainer.device), pose.to(trainer.device)
+            joints = joints.to(trainer.device) if joints is not None else None
+            loss, (presence_out, pose_out, _) = batch_loss(trainer, features, presence, pose, joints)
+            total_loss += loss.item() * len(features)
+            presence_correct += ((presence_out.reshape(-1) > 0.5).float() == presence).sum().item()
+            pose_correct += (pose_out.argmax(dim=1) == pose).sum().item()
+            rows += len(features)
+    rows = max(rows, 1)
+    return {'loss': total_loss / rows, 'presence_accuracy': presence_correct / rows,
+            'pose_accuracy': pose_correct / rows}
+
+
+def _with_joints(joints, like, rows):
+    # Batches without joint columns get NaN targets next to replayed ones that have them
+    if joints is not None:
+        return joints
+    return torch.full((rows,) + tuple(like.shape[1:]), float('nan'))
+
+
+def finetune(new_data, model_path, valid=None, out_path=None, seed_data=(), replay_capacity=10000, replay_ratio=1.0,
+             epochs=3, batch_size=32, learning_rate=1e-4, input_size=256, full_retrain=None, full_epochs=50):
+    """
+    Fine-tune the model at model_path on the captures under new_data and save it to out_path.
+
+    out_path defaults to model_path, so a running server hot-swaps to the
+    new version. Each batch of new samples is trained with replay_ratio times
+    as many samples from the replay buffer. Returns the record appended to the log.
+    """
+    out_path = out_path or model_path
+    model_dir = os.path.dirname(os.path.abspath(out_path))
+    replay_path = os.path.join(model_dir, REPLAY_FILE)
+    started = time.perf_counter()
+
+    trainer = ModelTrainer(input_size)
+    trainer.load_model(model_path)
+    base_version = file_version(model_path)
+    # Smaller steps than a fresh run, so the loaded weights are adjusted rather than relearned
+    optimizer = optim.Adam(trainer.model.parameters(), lr=learning_rate)
+
+    if os.path.exists(replay_path):
+        replay = ReplayBuffer.load(replay_path, capacity=replay_capacity)
+    else:
+        replay = ReplayBuffer(replay_capacity, with_joints=trainer.has_joints)
+        for path in find_training_data(seed_data):
+            for features, presence, pose, joints in labelled_batches(path, trainer, 4096):
+                replay.add(features.numpy(), presence.numpy(), pose.numpy(),
+                           joints.numpy() if joints is not None else None)
+        if seed_data:
+            print(f'Replay buffer seeded with {len(replay)} of {replay.seen} samples')
+    sample_shape = (trainer.window_size, trainer.input_size) if trainer.window_size > 1 else (trainer.input_size,)
+    if replay.features is not None and replay.features.shape[1:] != sample_shape:
+        raise SystemExit(f'{replay_path} holds samples of shape {replay.features.shape[1:]}, the model takes '
+                         f'{sample_shape}; delete it and pass --seed-data to rebuild it')
+    if not len(replay):
+        print('Warning: replay buffer is empty (pass --seed-data); poses missing from the new captures may be forgotten')
+
+    paths = find_training_data(new_data)
+    if not paths:
+        raise SystemExit(f'No CSV files or stores found in {new_data}')
+    before = evaluate(trainer, valid) if valid else None
+
+    new_samples = 0
+    for epoch in range(epochs):
+        trainer.model.train()
+        epoch_loss, batches, epoch_started = 0.0, 0, time.perf_counter()
+        for path in random.sample(paths, len(paths)):
+            for features, presence, pose, joints in labelled_batches(path, trainer, batch_size, shuffle=True):
+                if epoch == 0:
+                    new_samples += len(features)
+                num_replayed = int(len(features) * replay_ratio) if len(replay) else 0
+                if num_replayed:
+                    old = replay.sample(num_replayed)
+                    if trainer.has_joints and (joints is not None or old[3] is not None):
+                        like = joints if joints is not None else old[3]
+                        joints = torch.cat([_with_joints(joints, like, len(features)),
+                                            _with_joints(old[3], like, num_replayed)])
+                    features = torch.cat([features, old[0]])
+                    presence = torch.cat([presence, old[1]])
+                    pose = torch.cat([pose, old[2]])
+
+                optimizer.zero_grad()
+                loss, _ = batch_loss(trainer, features.to(trainer.device), presence.to(trainer.device),
+                                  pose.to(trainer.device), joints.to(trainer.device) if joints is not None else None)
+                loss.backward()
+                optimizer.step()
+                epoch_loss += loss.item()
+                batches += 1
+        print(f'Epoch {epoch + 1}/{epochs}: training loss {epoch_loss / max(batches, 1):.4f} '
+              f'({time.perf_counter() - epoch_started:.1f}s)')
+
+    after = evaluate(trainer, valid) if valid else None
+    trainer.save_model(out_path)
+    finetune_seconds = time.perf_counter() - started
+
+    # The new samples are part of what the next round must not forget
+    for path in paths:
+        for features, presence, pose, joints in labelled_batches(path, trainer, 4096):
+            replay.add(features.numpy(), presence.numpy(), pose.numpy(), joints.numpy() if joints is not None else None)
+    replay.save(replay_path)
+
+    record = {
+        'timestamp': time.time(),
+        'base_version': base_version,
+        'version': file_version(out_path),
+        'files': len(paths),
+        'new_samples': new_samples,
+        'replay_samples': len(replay),
+        'epochs': epochs,
+        'seconds': finetune_seconds,
+        'before': before,
+        'after': after,
+    }
+    print(f'Fine-tuned {base_version} -> {record["version"]} on {new_samples} new samples in {finetune_seconds:.1f}s')
+    if before is not None:
+        for name in ('loss', 'presence_accuracy', 'pose_accuracy'):
+            print(f'{name}: {before[name]:.4f} -> {after[name]:.4f}')
+
+    if full_retrain:
+        # A model trained from scratch with the same config, for the time and accuracy comparison
+        retrainer = ModelTrainer(**trainer.config())
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            retrain_path = os.path.join(tmp_dir, 'best_model.safetensors')
+            retrain_started = time.perf_counter()
+            retrainer.train(full_retrain, valid, num_epochs=full_epochs, batch_size=batch_size,
+                            model_path=retrain_path)
+            retrain_seconds = time.perf_counter() - retrain_started
+            retrainer.load_model(retrain_path)
+            record['full_retrain'] = {'seconds': retrain_seconds, 'epochs': len(retrainer.history),
+                                      **evaluate(retrainer, valid)}
+        full = record['full_retrain']
+        print(f'Full retrain: {retrain_seconds:.1f}s ({retrain_seconds / finetune_seconds:.1f}x the fine-tune), '
+              f'loss {full["loss"]:.4f}, presence {full["presence_accuracy"]:.4f}, pose {full["pose_accuracy"]:.4f}')
+
+    with open(os.path.join(model_dir, LOG_FILE), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fine-tune the current model on new labelled captures')
+    parser.add_argument('new_data', nargs='+', help='new capture CSVs or stores, or directories of them')
+    parser.add_argument('--model-path', default='backend/model/saved_models/best_model.safetensors')
+    parser.add_argument('--out-path', help='where to save the new version (defaults to --model-path)')
+    parser.add_argument('--valid', help='validation CSV or store for the before/after comparison')
+    parser.add_argument('--seed-data', nargs='*', default=[],
+                        help='original training data to build the replay buffer from on the first run')
+    parser.add_argument('--replay-capacity', type=int, default=10000)
+    parser.add_argument('--replay-ratio', type=float, default=1.0, help='replayed samples per new sample')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=1e-4)
+    parser.add_argument('--input-size', type=int, default=256)
+    parser.add_argument('--full-retrain', help='also train from scratch on this CSV or store and compare')
+    parser.add_argument('--full-epochs', type=int, default=50)
+    args = parser.parse_args()
+
+    finetune(args.new_data, args.model_path, valid=args.valid, out_path=args.out_path, seed_data=args.seed_data,
+             replay_capacity=args.replay_capacity, replay_ratio=args.replay_ratio, epochs=args.epochs,
+             batch_size=args.batch_size, learning_rate=args.learning_rate, input_size=args.input_size,
+             full_retrain=args.full_retrain, full_epochs=args.full_epochs)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import torch
+
+from model.artifact import ARTIFACT_SUFFIX, read_artifact
+from model.network import WiFiPoseModel
+from model.windows import frame_windows
+
+# Weights files ending in this suffix are TorchScript modules rather than state dicts
+SCRIPTED_SUFFIX = '.int8.pt'
+
+# Fitted by model.calibration and stored next to the weights, named after them
+CALIBRATION_SUFFIX = '.calibration.json'
+DEFAULT_CALIBRATION = {'presence_temperature': 1.0, 'pose_temperature': 1.0, 'presence_threshold': 0.5}
+
+# State dict entries that weights saved before the keypoint head don't have
+JOINT_HEAD_KEYS = ('fc_joints.', 'joints_trained')
+
+# Pose class names and model config, embedded in exported TorchScript files
+CLASSES_FILE = 'classes.json'
+CONFIG_FILE = 'config.json'
+
+# Written next to the weights by older versions instead of storing the classes inside
+LEGACY_ENCODER_FILE = 'label_encoder.pkl'
+
+
+def calibration_path(model_path):
+    """Where the calibration for a given weights file lives."""
+    return model_path + CALIBRATION_SUFFIX
+
+
+def optimized_path(model_path):
+    """Where the optimized artifact for a given weights file lives."""
+    return os.path.splitext(model_path)[0] + SCRIPTED_SUFFIX
+
+
+def prediction_confidence(presence_prob, pose_probs, presence_pred):
+    """
+    Probability of the reported outcome for each row.
+
+    P(present) * P(pose) when a person is reported, otherwise P(absent).
+    """
+    return np.where(presence_pred > 0, presence_prob * pose_probs.max(axis=1), 1.0 - presence_prob)
+
+
+def read_legacy_classes(model_path):
+    """Class names from the pickled LabelEncoder that older checkpoints were saved with."""
+    # Unpickling imports sklearn; only checkpoints from before the classes
+    # were stored in the weights file pay for that
+    with open(os.path.join(os.path.dirname(model_path), LEGACY_ENCODER_FILE), 'rb') as f:
+        return pickle.load(f).classes_.tolist()
+
+
+class Predictor:
+    """
+    Inference-only wrapper around WiFiPoseModel.
+
+    Loads a model artifact saved by ModelTrainer.save_model (or a .pth
+    checkpoint, or an int8 export from model.export) and scores CSI features. It imports neither sklearn nor
+    pandas and builds no optimizer or loss modules, so serving processes start
+    quickly. ModelTrainer extends it with training.
+
+    A model with window_size > 1 scores each row from the window of
+    window_size consecutive rows ending at it, so rows passed to predict are
+    taken to be consecutive frames of one capture. A model with preprocessing
+    standardizes and clips raw frames itself, keeping every decimation-th
+    subcarrier (see model.preprocessing); input_size is always the number of
+    raw subcarriers.
+    """
+
+    def __init__(self, input_size, hidden_size=128, num_layers=2, num_classes=5, window_size=1,
+                 preprocessing=False, decimation=1, fc_size=128):
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self._build_model(input_size, hidden_size, num_layers, num_classes, window_size, preprocessing, decimation,
+                          fc_size)
+        self.classes = None
+        self._class_names = None
+        self.calibration = dict(DEFAULT_CALIBRATION)
+        # Whether the loaded weights have a trained keypoint head
+        self.has_joints = False
+
+    def _build_model(self, input_size, hidden_size, num_layers, num_classes, window_size=1, preprocessing=False,
+                     decimation=1, fc_size=128):
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.num_classes = num_classes
+        # Frames per input sequence; 1 scores every frame on its own
+        self.window_size = window_size
+        self.preprocessing = preprocessing
+        self.decimation = decimation
+        # Width of the shared layer in front of the output heads
+        self.fc_size = fc_size
+        self.model = WiFiPoseModel(input_size, hidden_size, num_layers, num_classes, preprocessing=preprocessing,
+                                   decimation=decimation, fc_size=fc_size).to(self.device)
+
+    def config(self):
+        """Constructor arguments of the model, stored in saved checkpoints."""
+        return {
+            'input_size': self.input_size,
+            'hidden_size': self.hidden_size,
+            'num_layers': self.num_layers,
+            'num_classes': self.num_classes,
+            'window_size': self.window_size,
+            'preprocessing': self.preprocessing,
+            'decimation': self.decimation,
+            'fc_size': self.fc_size,
+        }
+
+    def set_classes(self, classes):
+        self.classes = [str(c) for c in classes]
+        # Object array so decoded labels index out as plain Python strings
+        self._class_names = np.array(self.classes, dtype=object)
+
+    def load_model(self, path):
+        classes = None
+        state_dict = None
+        # Parameters can share the artifact's memory mapping only on the CPU
+        assign = False
+        if path.endswith(SCRIPTED_SUFFIX):
+            # Quantized TorchScript module exported by model.export
+            extra_files = {CLASSES_FILE: '', CONFIG_FILE: ''}
+            self.model = torch.jit.load(path, map_location=self.device, _extra_files=extra_files)
+            if extra_files[CLASSES_FILE]:
+                classes = json.loads(extra_files[CLASSES_FILE])
+            # Exports from before windowed models carry no config
+            config = json.loads(extra_files[CONFIG_FILE]) if extra_files[CONFIG_FILE] else {}
+            # The module is already built; these describe it, and hidden_size and
+            # num_layers shape the LSTM state passed to its step()
+            self.input_size = config.get('input_size', self.input_size)
+            self.hidden_size = config.get('hidden_size', self.hidden_size)
+            self.num_layers = config.get('num_layers', self.num_layers)
+            self.num_classes = config.get('num_classes', self.num_classes)
+            self.fc_size = config.get('fc_size', self.fc_size)
+            self.window_size = config.get('window_size', 1)
+            # Preprocessing is traced into the module; these only describe it
+            self.preprocessing = config.get('preprocessing', False)
+            self.decimation = config.get('decimation', 1)
+        elif path.endswith(ARTIFACT_SUFFIX):
+            # Single-file artifact, memory-mapped rather than read and unpickled
+            state_dict, classes, config = read_artifact(path)
+            if config != self.config():
+                self._build_model(**config)
+            assign = self.device.type == 'cpu'
+        else:
+            checkpoint = torch.load(path, map_location=self.device)
+            if 'model_state_dict' in checkpoint:
+                state_dict = checkpoint['model_state_dict']
+                classes = checkpoint['classes']
+                if checkpoint['config'] != self.config():
+                    self._build_model(**checkpoint['config'])
+            else:
+                # A bare state dict, saved before classes and config were stored with it
+                state_dict = checkpoint
+
+        if state_dict is not None:
+            # Weights saved before the keypoint head was added lack it; they
+            # load with the head marked untrained
+            self.model.joints_trained.fill_(False)
+            missing, unexpected = self.model.load_state_dict(state_dict, strict=False, assign=assign)
+            missing = [key for key in missing if not key.startswith(JOINT_HEAD_KEYS)]
+            if missing or unexpected:
+                raise RuntimeError(f'Error loading state dict from {path}: '
+                                   f'missing keys {missing}, unexpected keys {unexpected}')
+        # Exported modules from before the keypoint head have no joints_trained
+        self.has_joints = bool(getattr(self.model, 'joints_trained', False))
+
+        self.set_classes(classes if classes is not None else read_legacy_classes(path))
+
+        # Load calibration if one was fitted for these weights
+        self.calibration = dict(DEFAULT_CALIBRATION)
+        if os.path.exists(calibration_path(path)):
+            with open(calibration_path(path)) as f:
+                self.calibration.update(json.load(f))
+        
+        self.model.eval()
+
+    def initial_state(self, batch_size=1):
+        """Zero (h, c) LSTM state for the start of a sequence, as accepted by model.step."""
+        shape = (self.num_layers, batch_size, self.hidden_size)
+        return torch.zeros(shape, device=self.device), torch.zeros(shape, device=self.device)
+
+    def frame_windows(self, frames, context=None):
+        """
+        Windows [rows, window_size, features] ending at each of frames, and the context for the next call.
+
+        Pass the returned context back in with the next frames of the same
+        capture so windows continue across calls; see model.windows.frame_windows.
+        """
+        return frame_windows(frames, self.window_size, context)
+
+    def calibrate(self, presence_out, pose_logits):
+        """
+        Turn raw model outputs into calibrated probabilities.
+
+        presence_out is the model's sigmoid output; its logit and the pose
+        logits are divided by the fitted temperatures before the sigmoid and
+        softmax, so this is the identity/softmax until a calibration is loaded.
+        """
+        presence_temperature = self.calibration['presence_temperature']
+        if presence_temperature != 1.0:
+            presence_logit = torch.logit(presence_out, eps=1e-6)
+            presence_out = torch.sigmoid(presence_logit / presence_temperature)
+        pose_probs = torch.softmax(pose_logits / self.calibration['pose_temperature'], dim=-1)
+        return presence_out, pose_probs
+
+    def predict_proba(self, features, timings=None):
+        """
+        Presence probability [rows], pose distribution [rows, classes] and
+        joints [rows, joints, 2], all from one forward pass. joints is None
+        when the model's keypoint head was never trained.
+
+        features is [rows, features], or already-built windows
+        [rows, window_size, features]. For a windowed model, [rows, features]
+        is windowed as one capture.
+
+        If a timings dict is passed, the seconds spent in tensor conversion and
+        the model forward are added to it under 'tensor' and 'forward'.
+        """
+        self.model.eval()
+        with torch.no_grad():
+            started = time.perf_counter()
+            # Add batch dimension if not present
+            if len(features.shape) == 1:
+                features = features.reshape(1, -1)
+            
+            if self.window_size > 1 and len(features.shape) == 2:
+                features, _ = self.frame_windows(features)
+            if len(features.shape) == 3 and not (features.flags.c_contiguous and features.flags.writeable):
+                # Windows are overlapping read-only views of the frames; gather them once
+                features = np.array(features, dtype=np.float32)
+
+            # Shares memory with float32 arrays instead of copying them
+            features = torch.as_tensor(np.asarray(features, dtype=np.float32)).to(self.device)
+            converted = time.perf_counter()
+            outputs = self.model(features)
+            presence_prob, pose_probs = self.calibrate(outputs[0].reshape(-1), outputs[1])
+            presence_prob = presence_prob.cpu().numpy()
+            pose_probs = pose_probs.cpu().numpy()
+            joints = outputs[2].cpu().numpy() if self.has_joints else None
+            if timings is not None:
+                timings['tensor'] = timings.get('tensor', 0.0) + converted - started
+                timings['forward'] = timings.get('forward', 0.0) + time.perf_counter() - converted
+            return presence_prob, pose_probs, joints
+
+    def decode(self, presence_prob, pose_probs, timings=None):
+        """Threshold presence and map the most likely pose index to its class name."""
+        started = time.perf_counter()
+        presence_pred = (presence_prob > self.calibration['presence_threshold']).astype(np.float32)
+        pose_class = self._class_names[pose_probs.argmax(axis=1)]
+        if timings is not None:
+            timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - started
+        return presence_pred, pose_class
+
+    def predict(self, features, timings=None):
+        """
+        Predict presence (0/1) and pose class for each row of features.
+
+        See predict_proba for the timings dict; label decoding is added under 'decode'.
+        """
+        presence_prob, pose_probs, _ = self.predict_proba(features, timings=timings)
+        return self.decode(presence_prob, pose_probs, timings=timings)
+
+    def predict_batches(self, features, batch_size=1024):
+        """
+        Score features in fixed-size batches, yielding (presence_pred, pose_class, joints) per batch.
+
+        features can be one [rows, features] array or an iterable of such
+        arrays (e.g. CSV chunks), so memory stays bounded by batch_size
+        regardless of how many rows are scored. joints is None unless the
+        keypoint head is trained (see predict_proba). For a windowed model,
+        windows continue across batches and chunks.
+        """
+        chunks = (features,) if isinstance(features, np.ndarray) else features
+        context = None
+        for chunk in chunks:
+            for start in range(0, len(chunk), batch_size):
+                batch = chunk[start:start + batch_size]
+                if self.window_size > 1:
+                    batch, context = self.frame_windows(batch, context)
+                presence_prob, pose_probs, joints = self.predict_proba(batch)
+                presence_pred, pose_class = self.decode(presence_prob, pose_probs)
+                yield presence_pred, pose_class, joints
@@ -1,199 +1,338 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-import numpy as np
-import pandas as pd
 import os
-from sklearn.preprocessing import LabelEncoder
-from torch.utils.data import Dataset, DataLoader
-import pickle
+import time
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
+from model.csi_store import CAPTURE_COLUMN, JOINT_COLUMNS, MmapCSIDataset, has_joint_columns, is_store
+from model.checkpoint import CheckpointManager, check_resumable, set_rng_state
+from model.artifact import ARTIFACT_SUFFIX, save_artifact
+from model.windows import WindowedCSIDataset, capture_starts
+from model.preprocessing import compute_stats
+# The model and inference code live in model.network and model.inference;
+# these names are re-exported for code that imports them from here
+from model.network import NUM_JOINTS, WiFiPoseModel
+from model.inference import (DEFAULT_CALIBRATION, SCRIPTED_SUFFIX, Predictor, calibration_path,
+                             prediction_confidence)
+
+__all__ = [
+    'WiFiCSIDataset', 'open_dataset', 'make_loader', 'ModelTrainer',
+    # Re-exported from model.network and model.inference
+    'NUM_JOINTS', 'WiFiPoseModel', 'SCRIPTED_SUFFIX', 'Predictor', 'prediction_confidence',
+]
 
 class WiFiCSIDataset(Dataset):
     def __init__(self, csv_file):
+        # Training-only dependencies, kept out of the serving import path
+        import pandas as pd
+        from sklearn.preprocessing import LabelEncoder
+
         self.data = pd.read_csv(csv_file)
         self.label_encoder = LabelEncoder()
         self.data['pose_class_encoded'] = self.label_encoder.fit_transform(self.data['pose_class'])
+        self.classes = self.label_encoder.classes_.tolist()
         
         # Extract features and labels
         self.csi_columns = [col for col in self.data.columns if col.startswith('csi_')]
         self.features = torch.FloatTensor(self.data[self.csi_columns].values)
         self.presence_labels = torch.FloatTensor(self.data['human_presence'].values)
         self.pose_labels = torch.LongTensor(self.data['pose_class_encoded'].values)
+        # Keypoint targets [rows, joints, 2], when the capture has them
+        self.joints = None
+        if has_joint_columns(self.data.columns):
+            self.joints = torch.FloatTensor(self.data[JOINT_COLUMNS].values).reshape(-1, NUM_JOINTS, 2)
+        # Row offsets where each capture begins; without capture ids the file is one capture
+        self.capture_starts = None
+        if CAPTURE_COLUMN in self.data.columns:
+            self.capture_starts = capture_starts(self.data[CAPTURE_COLUMN].values)
 
     def __len__(self):
         return len(self.data)
 
     def __getitem__(self, idx):
+        # idx may be a list of indices, in which case a whole batch is
+        # gathered with one indexing op per tensor
+        if isinstance(idx, list):
+            idx = torch.as_tensor(idx)
         return (
             self.features[idx],
             self.presence_labels[idx],
-            self.pose_labels[idx]
+            self.pose_labels[idx],
+            self.joints[idx] if self.joints is not None else None
         )
 
     def get_label_encoder(self):
         return self.label_encoder
 
-class WiFiPoseModel(nn.Module):
-    def __init__(self, input_size, hidden_size, num_layers, num_classes):
-        super(WiFiPoseModel, self).__init__()
-        
-        self.hidden_size = hidden_size
-        self.num_layers = num_layers
-        
-        # LSTM layer
-        self.lstm = nn.LSTM(
-            input_size=input_size,
-            hidden_size=hidden_size,
-            num_layers=num_layers,
-            batch_first=True
-        )
-        
-        # Fully connected layers
-        self.fc1 = nn.Linear(hidden_size, 128)
-        self.dropout = nn.Dropout(0.3)
-        self.relu = nn.ReLU()
-        
-        # Output layers
-        self.fc_presence = nn.Linear(128, 1)
-        self.fc_pose = nn.Linear(128, num_classes)
-        
-        self.sigmoid = nn.Sigmoid()
+def open_dataset(path):
+    """Open a converted memory-mapped store directory, or parse a CSV file."""
+    if is_store(path):
+        return MmapCSIDataset(path)
+    return WiFiCSIDataset(path)
 
-    def forward(self, x):
-        # Reshape input for LSTM [batch, 1, features]
-        x = x.unsqueeze(1)
-        
-        # Initialize hidden state
-        h0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size).to(x.device)
-        c0 = torch.zeros(self.num_layers, x.size(0), self.hidden_size).to(x.device)
-        
-        # Forward propagate LSTM
-        lstm_out, _ = self.lstm(x, (h0, c0))
-        
-        # Extract the output of the last time step
-        out = lstm_out[:, -1, :]
-        
-        # Common layers
-        out = self.fc1(out)
-        out = self.dropout(out)
-        out = self.relu(out)
-        
-        # Separate outputs for presence and pose
-        presence_out = self.sigmoid(self.fc_presence(out))
-        pose_out = self.fc_pose(out)
-        
-        return presence_out.squeeze(), pose_out
+def make_loader(dataset, batch_size, shuffle=False, num_workers=0, prefetch_factor=2, pin_memory=False):
+    """
+    DataLoader that hands whole index batches to the dataset.
 
-class ModelTrainer:
-    def __init__(self, input_size, hidden_size=128, num_layers=2, num_classes=5):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = WiFiPoseModel(input_size, hidden_size, num_layers, num_classes).to(self.device)
+    The BatchSampler is used as the sampler with automatic batching disabled,
+    so each step slices the feature tensor once instead of fetching and
+    collating batch_size separate samples in Python.
+    """
+    base_sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+    options = {}
+    if num_workers > 0:
+        options = {'prefetch_factor': prefetch_factor, 'persistent_workers': True}
+    return DataLoader(
+        dataset,
+        sampler=BatchSampler(base_sampler, batch_size=batch_size, drop_last=False),
+        batch_size=None,
+        num_workers=num_workers,
+        pin_memory=pin_memory,
+        **options
+    )
+
+class ModelTrainer(Predictor):
+    def __init__(self, input_size, hidden_size=128, num_layers=2, num_classes=5, window_size=1,
+                 preprocessing=False, decimation=1, fc_size=128):
+        super().__init__(input_size, hidden_size, num_layers, num_classes, window_size, preprocessing, decimation,
+                         fc_size)
         self.criterion_presence = nn.BCELoss()
         self.criterion_pose = nn.CrossEntropyLoss()
-        self.optimizer = optim.Adam(self.model.parameters())
-        self.label_encoder = None
+        self.criterion_joints = nn.MSELoss()
+        self.history = []
+
+    def _build_model(self, *args, **kwargs):
+        super()._build_model(*args, **kwargs)
+        self._optimizer = None
+
+    def load_model(self, path):
+        super().load_model(path)
+        # Artifacts are loaded with assign=True, which replaces the Parameter
+        # objects; an optimizer built before would keep stepping the old ones
+        self._optimizer = None
 
-    def train(self, train_csv, valid_csv, num_epochs=50, batch_size=32):
-        # Create datasets
-        train_dataset = WiFiCSIDataset(train_csv)
-        valid_dataset = WiFiCSIDataset(valid_csv)
-        self.label_encoder = train_dataset.get_label_encoder()
+    @property
+    def optimizer(self):
+        # Built on first use, so loading a trainer just to predict skips it
+        if self._optimizer is None:
+            self._optimizer = optim.Adam(self.model.parameters())
+        return self._optimizer
+
+    def train(self, train_csv, valid_csv, num_epochs=50, batch_size=32, num_workers=0, prefetch_factor=2,
+              model_path='backend/model/saved_models/best_model.safetensors', checkpoint_dir=None,
+              checkpoint_interval=1, keep_top_k=3, resume=False, early_stopping_patience=None, window_stride=1,
+              epoch_callback=None):
+        """
+        Train on train_csv and keep the weights with the lowest loss on valid_csv at model_path.
+
+        The keypoint head is trained alongside presence and pose when the
+        training data has joint_* columns. With window_size > 1 the model is
+        trained on windows of consecutive frames (see model.windows), taken
+        every window_stride frames; validation scores a window at every frame.
+        With preprocessing, its statistics are computed from the training data
+        in one streaming pass before the first epoch, unless already fitted
+        (e.g. when training on from loaded weights).
+        With checkpoint_dir set, model/optimizer/RNG state is checkpointed every
+        checkpoint_interval epochs in the background and resume=True continues
+        from the latest checkpoint there; a checkpoint saved with a different
+        model config, data, batch size or window stride is refused with
+        ValueError. Without resume, earlier checkpoints there are deleted, so
+        the kept top-k only ever holds one run. Training stops early once the
+        validation loss has not improved for early_stopping_patience epochs.
+        epoch_callback, if given, is called with each epoch's history entry
+        after the epoch; returning True stops training (e.g. to prune a trial).
+        """
+        # Create datasets (either CSV files or stores built by model.csi_store)
+        train_dataset = open_dataset(train_csv)
+        valid_dataset = open_dataset(valid_csv)
+        preprocess = self.model.preprocess
+        if preprocess is not None and not preprocess.fitted:
+            started = time.perf_counter()
+            # Raw frames, chunk by chunk; a store's memory map is never loaded whole
+            preprocess.fit(compute_stats(train_dataset.features))
+            print(f'Preprocessing statistics from {len(train_dataset)} frames in {time.perf_counter() - started:.2f}s')
+        if self.window_size > 1:
+            train_dataset = WindowedCSIDataset(train_dataset, self.window_size, window_stride)
+            valid_dataset = WindowedCSIDataset(valid_dataset, self.window_size)
+        self.set_classes(train_dataset.classes)
+        self.has_joints = train_dataset.joints is not None
+        self.model.joints_trained.fill_(self.has_joints)
 
         # Create data loaders
-        train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True)
-        valid_loader = DataLoader(valid_dataset, batch_size=batch_size)
+        pin_memory = self.device.type == 'cuda'
+        train_loader = make_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers,
+                                   prefetch_factor=prefetch_factor, pin_memory=pin_memory)
+        valid_loader = make_loader(valid_dataset, batch_size, num_workers=num_workers,
+                                   prefetch_factor=prefetch_factor, pin_memory=pin_memory)
 
         best_valid_loss = float('inf')
+        epochs_without_improvement = 0
+        start_epoch = 0
+
+        checkpoints = None
+        # What a checkpoint must have been saved with to be resumed by this call
+        run = {
+            'train': os.path.abspath(train_csv),
+            'valid': os.path.abspath(valid_csv),
+            'batch_size': batch_size,
+            'window_stride': window_stride,
+        }
+        if checkpoint_dir is not None:
+            checkpoints = CheckpointManager(checkpoint_dir, keep_top_k=keep_top_k, interval=checkpoint_interval)
+            latest = checkpoints.latest() if resume else None
+            if not resume:
+                checkpoints.clear()
+            if latest is not None:
+                checkpoint = checkpoints.load(latest, map_location=self.device)
+                check_resumable(checkpoint, latest, config=self.config(), run=run)
+                self.model.load_state_dict(checkpoint['model_state_dict'])
+                self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+                set_rng_state(checkpoint['rng_state'])
+                start_epoch = checkpoint['epoch']
+                best_valid_loss = checkpoint['best_valid_loss']
+                epochs_without_improvement = checkpoint['epochs_without_improvement']
+                print(f'Resumed from {latest} at epoch {start_epoch}')
         
-        for epoch in range(num_epochs):
+        for epoch in range(start_epoch, num_epochs):
             # Training
             self.model.train()
             train_loss = 0
-            for features, presence_labels, pose_labels in train_loader:
-                features = features.to(self.device)
-                presence_labels = presence_labels.to(self.device)
-                pose_labels = pose_labels.to(self.device)
+            data_seconds = 0.0
+            compute_seconds = 0.0
+            epoch_start = time.perf_counter()
+            batch_start = epoch_start
+            for features, presence_labels, pose_labels, joints in train_loader:
+                # Time spent blocked on the loader vs. in the training step tells
+                # whether an epoch is I/O-bound or compute-bound
+                step_start = time.perf_counter()
+                data_seconds += step_start - batch_start
+
+                features = features.to(self.device, non_blocking=pin_memory)
+                presence_labels = presence_labels.to(self.device, non_blocking=pin_memory)
+                pose_labels = pose_labels.to(self.device, non_blocking=pin_memory)
 
                 self.optimizer.zero_grad()
-                presence_out, pose_out = self.model(features)
+                presence_out, pose_out, joints_out = self.model(features)
                 
                 loss_presence = self.criterion_presence(presence_out, presence_labels)
                 loss_pose = self.criterion_pose(pose_out, pose_labels)
                 loss = loss_presence + loss_pose
+                if joints is not None:
+                    joints = joints.to(self.device, non_blocking=pin_memory)
+                    loss = loss + self.criterion_joints(joints_out, joints)
                 
                 loss.backward()
                 self.optimizer.step()
                 train_loss += loss.item()
 
+                batch_start = time.perf_counter()
+                compute_seconds += batch_start - step_start
+            train_seconds = time.perf_counter() - epoch_start
+
             # Validation
             self.model.eval()
             valid_loss = 0
             with torch.no_grad():
-                for features, presence_labels, pose_labels in valid_loader:
+                for features, presence_labels, pose_labels, joints in valid_loader:
                     features = features.to(self.device)
                     presence_labels = presence_labels.to(self.device)
                     pose_labels = pose_labels.to(self.device)
 
-                    presence_out, pose_out = self.model(features)
+                    presence_out, pose_out, joints_out = self.model(features)
                     
                     loss_presence = self.criterion_presence(presence_out, presence_labels)
                     loss_pose = self.criterion_pose(pose_out, pose_labels)
                     loss = loss_presence + loss_pose
+                    if joints is not None and self.has_joints:
+                        loss = loss + self.criterion_joints(joints_out, joints.to(self.device))
                     valid_loss += loss.item()
 
+            train_loss /= len(train_loader)
+            valid_loss /= len(valid_loader)
+
             print(f'Epoch {epoch+1}/{num_epochs}:')
-            print(f'Training Loss: {train_loss/len(train_loader):.4f}')
-            print(f'Validation Loss: {valid_loss/len(valid_loader):.4f}')
+            print(f'Training Loss: {train_loss:.4f}')
+            print(f'Validation Loss: {valid_loss:.4f}')
+            print(f'Throughput: {len(train_dataset)/train_seconds:.0f} samples/s '
+                  f'(data wait {data_seconds:.2f}s, compute {compute_seconds:.2f}s)')
+            self.history.append({
+                'epoch': epoch + 1,
+                'train_loss': train_loss,
+                'valid_loss': valid_loss,
+                'samples_per_sec': len(train_dataset) / train_seconds,
+                'data_seconds': data_seconds,
+                'compute_seconds': compute_seconds,
+            })
 
             # Save best model
-            #if valid_loss < best_valid_loss:
-            #    best_valid_loss = valid_loss
-            self.save_model('backend/model/saved_models/best_model.pth')
+            if valid_loss < best_valid_loss:
+                best_valid_loss = valid_loss
+                epochs_without_improvement = 0
+                self.save_model(model_path)
+            else:
+                epochs_without_improvement += 1
+
+            if checkpoints is not None and checkpoints.should_save(epoch + 1):
+                checkpoints.save(epoch + 1, self.model, self.optimizer, valid_loss,
+                                 best_valid_loss=best_valid_loss,
+                                 epochs_without_improvement=epochs_without_improvement,
+                                 config=self.config(), run=run)
+
+            if early_stopping_patience is not None and epochs_without_improvement >= early_stopping_patience:
+                print(f'Early stopping: no improvement for {epochs_without_improvement} epochs')
+                break
+
+            if epoch_callback is not None and epoch_callback(self.history[-1]):
+                print(f'Stopped by epoch_callback after epoch {epoch + 1}')
+                break
+
+        if checkpoints is not None:
+            checkpoints.close()
 
     def save_model(self, path):
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(path), exist_ok=True)
         
-        # Save model state dict
-        torch.save(self.model.state_dict(), path)
-        
-        # Save label encoder separately
-        encoder_path = os.path.join(os.path.dirname(path), 'label_encoder.pkl')
-        with open(encoder_path, 'wb') as f:
-            pickle.dump(self.label_encoder, f)
+        # A calibration fitted on the previous weights at this path no longer applies
+        if os.path.exists(calibration_path(path)):
+            os.remove(calibration_path(path))
+        self.calibration = dict(DEFAULT_CALIBRATION)
 
-    def load_model(self, path):
-        # Load model state dict
-        self.model.load_state_dict(torch.load(path, map_location=self.device))
-        
-        # Load label encoder separately
-        encoder_path = os.path.join(os.path.dirname(path), 'label_encoder.pkl')
-        with open(encoder_path, 'rb') as f:
-            self.label_encoder = pickle.load(f)
-        
-        self.model.eval()
-
-    def predict(self, features):
-        self.model.eval()
-        with torch.no_grad():
-            # Add batch dimension if not present
-            if len(features.shape) == 1:
-                features = features.reshape(1, -1)
-            
-            features = torch.FloatTensor(features).to(self.device)
-            presence_out, pose_out = self.model(features)
-            presence_pred = (presence_out > 0.5).float()
-            pose_pred = torch.argmax(pose_out, dim=1)
-            pose_class = self.label_encoder.inverse_transform(pose_pred.cpu().numpy())
-            return presence_pred.cpu().numpy(), pose_class
+        if path.endswith(ARTIFACT_SUFFIX):
+            # One memory-mappable file with the weights, classes and config
+            save_artifact(self, path)
+            return
+
+        # Save the state dict with the class names and model shape, so loading
+        # needs no pickled LabelEncoder. Written via a temp file so readers
+        # never see a partial write
+        checkpoint = {
+            'model_state_dict': self.model.state_dict(),
+            'classes': self.classes,
+            'config': self.config(),
+        }
+        torch.save(checkpoint, path + '.tmp')
+        os.replace(path + '.tmp', path)
 
 if __name__ == "__main__":
-    # Example usage
-    input_size = 256  # Number of CSI subcarriers
-    trainer = ModelTrainer(input_size)
-    
-    # Train the model
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train the WiFi pose model')
+    parser.add_argument('--train-csv', default='data/train_data/wifi_csi_train.csv')
+    parser.add_argument('--valid-csv', default='data/test_data/wifi_csi_test.csv')
+    parser.add_argument('--checkpoint-dir', default='backend/model/checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the interrupted run in --checkpoint-dir instead of starting a fresh one')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--input-size', type=int, default=256, help='number of CSI subcarriers')
+    args = parser.parse_args()
+
+    trainer = ModelTrainer(args.input_size)
     trainer.train(
-        train_csv='data/train_data/wifi_csi_train.csv',
-        valid_csv='data/test_data/wifi_csi_test.csv'
+        train_csv=args.train_csv,
+        valid_csv=args.valid_csv,
+        num_epochs=args.epochs,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        early_stopping_patience=10
     )
\ No newline at end of file
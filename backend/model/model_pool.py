@@ -0,0 +1,219 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import torch
+
+
+def model_memory_bytes(model):
+    """Bytes held by a model's parameters and buffers."""
+    total = 0
+    for tensor in model.state_dict().values():
+        if isinstance(tensor, torch.Tensor):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class UnknownModel(KeyError):
+    """Raised for a model id that is not configured."""
+
+
+class ServedModel:
+    """
+    One model's registry plus the per-model serving state around it.
+
+    Requests for different models must not be coalesced into one forward pass
+    or share cached results and stream states, so each model gets its own
+    BatchScheduler, StreamSessionManager and PredictionCache. Latencies of
+    the last ``latency_window`` requests are kept for status().
+    """
+
+    def __init__(self, model_id, registry, scheduler, streams, cache, latency_window=1024):
+        self.model_id = model_id
+        self.registry = registry
+        self.scheduler = scheduler
+        self.streams = streams
+        self.cache = cache
+        self.requests = 0
+        self.last_used = time.time()
+        self._latencies = deque(maxlen=latency_window)
+
+    def start(self):
+        self.registry.start()
+        self.scheduler.start()
+        return self
+
+    def stop(self):
+        self.registry.stop()
+        self.scheduler.stop()
+
+    def after_fork(self):
+        self.registry.after_fork()
+        self.scheduler.after_fork()
+        self.streams.after_fork()
+        self.cache.after_fork()
+        self._latencies.clear()
+        self.requests = 0
+        # A served model always runs its threads, even if the parent stopped them before forking
+        self.start()
+
+    @property
+    def loaded(self):
+        return self.registry.get() is not None
+
+    def memory_bytes(self):
+        loaded = self.registry.get()
+        return model_memory_bytes(loaded.trainer.model) if loaded is not None else 0
+
+    def record(self, seconds):
+        """Count a served request and its latency."""
+        self.requests += 1
+        self._latencies.append(seconds)
+
+    def status(self):
+        latencies = np.asarray(self._latencies) * 1000
+        return {
+            'loaded': self.loaded,
+            'model': self.registry.status()['model'],
+            'memoryBytes': self.memory_bytes(),
+            'requests': self.requests,
+            'lastUsed': self.last_used,
+            'latencyMs': {
+                'p50': float(np.percentile(latencies, 50)) if len(latencies) else None,
+                'p99': float(np.percentile(latencies, 99)) if len(latencies) else None,
+                'mean': float(latencies.mean()) if len(latencies) else None,
+            },
+        }
+
+
+class ModelPool:
+    """
+    Serves several models from one process, keyed by model id.
+
+    ``model_paths`` maps each model id (e.g. a building or radio
+    configuration) to its weights file. ``factory(model_id, path)`` builds a
+    ServedModel for it. A model is loaded the first time it is asked for.
+    While the loaded models' weights add up to more than
+    ``memory_budget_bytes``, the least recently used ones are stopped and
+    dropped, reloading on their next request. The ``pinned`` models (the
+    default model) are loaded up front and never evicted. 0 disables the
+    budget.
+    """
+
+    def __init__(self, model_paths, factory, memory_budget_bytes=0, pinned=()):
+        self.model_paths = dict(model_paths)
+        self.factory = factory
+        self.memory_budget_bytes = memory_budget_bytes
+        self.pinned = set(pinned)
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def start(self):
+        for model_id in self.pinned:
+            self.get(model_id)
+        return self
+
+    def stop(self):
+        with self._lock:
+            served = list(self._loaded.values())
+            self._loaded.clear()
+        for entry in served:
+            entry.stop()
+
+    def before_fork(self):
+        """
+        Stop each loaded model's threads but keep the model in memory.
+
+        Forking while a watcher or scheduler thread holds a lock would leave
+        that lock held forever in the child. The weights stay loaded so forked
+        children share them copy-on-write; after_fork restarts the threads.
+        """
+        with self._lock:
+            served = list(self._loaded.values())
+        for entry in served:
+            entry.stop()
+
+    def after_fork(self):
+        """Give a forked child its own locks and restart each loaded model's threads."""
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        for entry in self._loaded.values():
+            entry.after_fork()
+
+    def __contains__(self, model_id):
+        return model_id in self.model_paths
+
+    def loaded(self):
+        """{model_id: ServedModel} of the models in memory, least recently used first; never loads one."""
+        return dict(self._loaded)
+
+    def get(self, model_id):
+        """
+        Return the ServedModel for model_id, loading it on first use.
+
+        Raises UnknownModel for an id that isn't configured. The returned
+        model may not be loaded (ServedModel.loaded) if its weights are
+        missing or failed to load; the registry keeps retrying those.
+        """
+        with self._lock:
+            served = self._loaded.get(model_id)
+            if served is not None:
+                self._loaded.move_to_end(model_id)
+                served.last_used = time.time()
+                return served
+            if model_id not in self.model_paths:
+                raise UnknownModel(model_id)
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+
+        # Loading happens outside the pool lock, so requests for models that
+        # are already loaded never wait behind it
+        with load_lock:
+            with self._lock:
+                served = self._loaded.get(model_id)
+            if served is not None:
+                return served
+            served = self.factory(model_id, self.model_paths[model_id]).start()
+            with self._lock:
+                self._loaded[model_id] = served
+                self.loads += 1
+                evicted = self._evict()
+
+        for entry in evicted:
+            print(f"Evicting model {entry.model_id} ({entry.memory_bytes()} bytes) to stay within the memory budget")
+            entry.stop()
+        return served
+
+    def _evict(self):
+        # Caller holds the pool lock. The most recently used model (the one
+        # just asked for) always stays, even if it alone is over the budget
+        evicted = []
+        if not self.memory_budget_bytes:
+            return evicted
+        total = sum(entry.memory_bytes() for entry in self._loaded.values())
+        for model_id in list(self._loaded)[:-1]:
+            if total <= self.memory_budget_bytes:
+                break
+            if model_id in self.pinned:
+                continue
+            entry = self._loaded.pop(model_id)
+            total -= entry.memory_bytes()
+            evicted.append(entry)
+            self.evictions += 1
+        return evicted
+
+    def status(self):
+        loaded = dict(self._loaded)
+        return {
+            'memoryBytes': sum(entry.memory_bytes() for entry in loaded.values()),
+            'memoryBudgetBytes': self.memory_budget_bytes,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'models': {
+                model_id: loaded[model_id].status() if model_id in loaded else {'loaded': False, 'path': path}
+                for model_id, path in self.model_paths.items()
+            },
+        }
@@ -0,0 +1,91 @@
+import torch
+import torch.nn as nn
+
+from model.preprocessing import CSIPreprocessor
+
+# Keypoints regressed by the joint head, (x, y) each
+NUM_JOINTS = 17
+
+class WiFiPoseModel(nn.Module):
+    def __init__(self, input_size, hidden_size, num_layers, num_classes, num_joints=NUM_JOINTS,
+                 preprocessing=False, decimation=1, fc_size=128):
+        super(WiFiPoseModel, self).__init__()
+        
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.num_joints = num_joints
+
+        # Standardization, clipping and decimation of the raw frames (see
+        # model.preprocessing); models saved without it take raw frames
+        self.preprocess = None
+        if preprocessing or decimation > 1:
+            self.preprocess = CSIPreprocessor(input_size, decimation)
+            input_size = self.preprocess.output_size
+        
+        # LSTM layer
+        self.lstm = nn.LSTM(
+            input_size=input_size,
+            hidden_size=hidden_size,
+            num_layers=num_layers,
+            batch_first=True
+        )
+        
+        # Fully connected layers
+        self.fc1 = nn.Linear(hidden_size, fc_size)
+        self.dropout = nn.Dropout(0.3)
+        self.relu = nn.ReLU()
+        
+        # Output layers
+        self.fc_presence = nn.Linear(fc_size, 1)
+        self.fc_pose = nn.Linear(fc_size, num_classes)
+        # Keypoint regression, (x, y) per joint
+        self.fc_joints = nn.Linear(fc_size, num_joints * 2)
+        
+        self.sigmoid = nn.Sigmoid()
+
+        # Saved with the weights: whether fc_joints was trained on joint targets
+        self.register_buffer('joints_trained', torch.zeros((), dtype=torch.bool))
+
+    def forward(self, x):
+        # Single frames [batch, features] run as sequences of length 1;
+        # windows [batch, steps, features] are scored at their last frame
+        if x.dim() == 2:
+            x = x.unsqueeze(1)
+        if self.preprocess is not None:
+            x = self.preprocess(x)
+        
+        # Forward propagate LSTM; without an explicit state it starts from
+        # zeros internally, saving two allocations and copies per call
+        lstm_out, _ = self.lstm(x)
+        
+        # Extract the output of the last time step
+        out = lstm_out[:, -1, :]
+        
+        presence_out, pose_out, joints_out = self._heads(out)
+        return presence_out.squeeze(), pose_out, joints_out
+
+    def step(self, x, state=None):
+        """
+        Advance the LSTM over x [batch, steps, features] starting from state.
+
+        Returns per-step presence [batch, steps], pose logits [batch, steps, classes],
+        joints [batch, steps, joints, 2] and the new (h, c) state, so a caller
+        can carry context across calls.
+        """
+        if self.preprocess is not None:
+            x = self.preprocess(x)
+        lstm_out, state = self.lstm(x, state)
+        presence_out, pose_out, joints_out = self._heads(lstm_out)
+        return presence_out.squeeze(-1), pose_out, joints_out, state
+
+    def _heads(self, out):
+        # Common layers
+        out = self.fc1(out)
+        out = self.dropout(out)
+        out = self.relu(out)
+        
+        # Separate outputs for presence and pose
+        presence_out = self.sigmoid(self.fc_presence(out))
+        pose_out = self.fc_pose(out)
+        joints_out = self.fc_joints(out).unflatten(-1, (self.num_joints, 2))
+        return presence_out, pose_out, joints_out
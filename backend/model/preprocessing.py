@@ -0,0 +1,107 @@
+"""
+CSI preprocessing that runs inside the model, identically in training and serving.
+
+Raw csi_ values differ in scale from subcarrier to subcarrier and carry
+occasional outliers (and, from some radios, NaN/inf readings), which slows
+convergence. CSIPreprocessor is the model's first layer:
+
+    x[..., ::decimation]                       keep every decimation-th subcarrier
+    clamp(x * scale + shift, -clip, clip)      standardize and clip, one fused op
+    nan -> 0                                   missing readings become the mean
+
+scale and shift are 1/std and -mean/std per subcarrier, computed by
+FeatureStats in one streaming pass over the training data. They are buffers
+of the model, so they are saved in the artifact with the weights, traced into
+the int8 export, and applied to uploads, batches and streamed frames alike.
+Clients send raw CSI.
+"""
+import numpy as np
+import torch
+import torch.nn as nn
+
+# Standardized values beyond this many standard deviations are clipped
+DEFAULT_CLIP = 5.0
+
+
+class FeatureStats:
+    """
+    Per-subcarrier mean and standard deviation, accumulated chunk by chunk.
+
+    Chunks are merged with Chan's parallel update in float64, so the result
+    matches a single pass over all rows however the data is split, and memory
+    stays bounded by one chunk. Non-finite readings are left out.
+    """
+
+    def __init__(self, num_features):
+        self.count = np.zeros(num_features)
+        self.mean = np.zeros(num_features)
+        self.m2 = np.zeros(num_features)
+
+    def update(self, chunk):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        finite = np.isfinite(chunk)
+        count = finite.sum(axis=0)
+        values = np.where(finite, chunk, 0.0)
+        mean = values.sum(axis=0) / np.maximum(count, 1)
+        m2 = (np.where(finite, values - mean, 0.0) ** 2).sum(axis=0)
+
+        total = self.count + count
+        delta = mean - self.mean
+        weight = np.divide(count, total, out=np.zeros_like(total), where=total > 0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+        return self
+
+    @property
+    def std(self):
+        variance = np.divide(self.m2, self.count, out=np.zeros_like(self.m2), where=self.count > 0)
+        return np.sqrt(variance)
+
+
+def compute_stats(features, chunk_rows=65536):
+    """FeatureStats over a [rows, features] tensor or array (e.g. a store's memory map), chunk_rows at a time."""
+    stats = FeatureStats(features.shape[1])
+    for start in range(0, len(features), chunk_rows):
+        chunk = features[start:start + chunk_rows]
+        stats.update(chunk.numpy() if isinstance(chunk, torch.Tensor) else chunk)
+    return stats
+
+
+class CSIPreprocessor(nn.Module):
+    """
+    Decimation, standardization and clipping of raw CSI frames.
+
+    Works on [batch, features] and [batch, steps, features] alike. Until fit
+    is called it only decimates and replaces NaN; fitted marks whether the
+    statistics were computed, so training fits them once and fine-tuning
+    keeps them.
+    """
+
+    def __init__(self, input_size, decimation=1):
+        super().__init__()
+        self.decimation = decimation
+        self.output_size = len(range(0, input_size, decimation))
+        self.register_buffer('scale', torch.ones(self.output_size))
+        self.register_buffer('shift', torch.zeros(self.output_size))
+        self.register_buffer('clip', torch.tensor(float('inf')))
+        self.register_buffer('fitted', torch.zeros((), dtype=torch.bool))
+
+    def fit(self, stats, clip=DEFAULT_CLIP):
+        """Set scale and shift from FeatureStats over the full (undecimated) subcarriers."""
+        mean = stats.mean[::self.decimation]
+        std = stats.std[::self.decimation]
+        # Constant subcarriers are centred but not scaled
+        scale = np.where(std > 1e-6, 1.0 / np.maximum(std, 1e-6), 1.0)
+        self.scale.copy_(torch.from_numpy(scale.astype(np.float32)))
+        self.shift.copy_(torch.from_numpy((-mean * scale).astype(np.float32)))
+        self.clip.fill_(clip)
+        self.fitted.fill_(True)
+
+    def forward(self, x):
+        if self.decimation > 1:
+            x = x[..., ::self.decimation]
+        # One fused multiply-add produces a new tensor, so the clamp and NaN
+        # replacement run in place on it and never touch the caller's frames
+        x = torch.addcmul(self.shift, x, self.scale)
+        return torch.nan_to_num_(x.clamp_(-self.clip, self.clip), nan=0.0)
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+
+from model.inference import Predictor, calibration_path
+
+
+def file_fingerprint(path):
+    """Return (mtime, size) for a file, used as a cheap change check."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def model_fingerprint(path):
+    """file_fingerprint of the weights and of their calibration (None if there is none)."""
+    calibration = calibration_path(path)
+    return file_fingerprint(path), file_fingerprint(calibration) if os.path.exists(calibration) else None
+
+
+def file_version(path, chunk_size=1 << 20):
+    """
+    Short content hash of a weights file and its calibration, used as the model version.
+
+    Predictions depend on both, so fitting a new calibration makes a new version.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    calibration = calibration_path(path)
+    if os.path.exists(calibration):
+        with open(calibration, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class LoadedModel:
+    """An immutable snapshot of a loaded trainer and where it came from."""
+
+    def __init__(self, trainer, version, path, loaded_at, load_seconds):
+        self.trainer = trainer
+        self.version = version
+        self.path = path
+        self.loaded_at = loaded_at
+        self.load_seconds = load_seconds
+
+    def info(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'loadedAt': self.loaded_at,
+            'loadSeconds': round(self.load_seconds, 4),
+        }
+
+
+class ModelRegistry:
+    """
+    Loads the model once per process and hot-swaps it when the weights or their calibration change.
+
+    Readers call ``get()`` and keep the returned snapshot for the whole request,
+    so a swap never affects an in-flight prediction. A background thread polls
+    the mtime/size of the weights and calibration files and only rehashes and
+    reloads when those move.
+    """
+
+    def __init__(self, model_path, input_size=256, poll_interval=5.0, trainer_factory=None):
+        self.model_path = model_path
+        self.input_size = input_size
+        self.poll_interval = poll_interval
+        self.trainer_factory = trainer_factory or (lambda: Predictor(self.input_size))
+
+        self._current = None
+        self._fingerprint = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.load_count = 0
+        self.last_error = None
+
+    def start(self):
+        """Load the model (if present) and start watching it for changes."""
+        self.reload_if_changed()
+        if self.poll_interval and self._watcher is None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.poll_interval + 1)
+            self._watcher = None
+
+    def after_fork(self):
+        """Recreate locks and restart the watcher in a forked child; threads don't survive fork."""
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        was_watching = self._watcher is not None
+        self._watcher = None
+        if was_watching:
+            self.start()
+
+    def get(self):
+        """Return the current LoadedModel snapshot, or None if nothing is loaded."""
+        return self._current
+
+    def reload_if_changed(self):
+        """Reload the weights if the file changed since the last load. Returns True on swap."""
+        if not os.path.exists(self.model_path):
+            if self._current is None:
+                print(f"Warning: Model not found at {self.model_path}. Please train the model first.")
+            return False
+
+        with self._load_lock:
+            try:
+                fingerprint = model_fingerprint(self.model_path)
+                if fingerprint == self._fingerprint:
+                    return False
+
+                version = file_version(self.model_path)
+                if self._current is not None and version == self._current.version:
+                    # Touched but not modified
+                    self._fingerprint = fingerprint
+                    return False
+
+                started = time.perf_counter()
+                trainer = self.trainer_factory()
+                trainer.load_model(self.model_path)
+                load_seconds = time.perf_counter() - started
+            except Exception as e:
+                # Keep serving the previous model; retry on the next poll
+                self.last_error = str(e)
+                print(f"Error loading model from {self.model_path}: {str(e)}")
+                return False
+
+            # Single reference assignment, so readers see either the old or the new model
+            self._current = LoadedModel(trainer, version, self.model_path, time.time(), load_seconds)
+            self._fingerprint = fingerprint
+            self.load_count += 1
+            self.last_error = None
+            print(f"Model {version} loaded from {self.model_path} in {load_seconds:.3f}s")
+            return True
+
+    def status(self):
+        current = self._current
+        return {
+            'loaded': current is not None,
+            'model': current.info() if current is not None else None,
+            'loadCount': self.load_count,
+            'lastError': self.last_error,
+        }
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload_if_changed()
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+class StreamSession:
+    """LSTM (h, c) state, or the last frames of a window, carried between frames for one sensor."""
+
+    def __init__(self, sensor_id, model_version):
+        self.sensor_id = sensor_id
+        self.model_version = model_version
+        self.state = None
+        # For windowed models: the frames preceding the next one
+        self.context = None
+        self.frames = 0
+        self.last_seen = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reset(self, model_version):
+        self.model_version = model_version
+        self.state = None
+        self.context = None
+
+
+class StreamSessionManager:
+    """
+    Keeps per-sensor LSTM state so streamed CSI frames are scored in O(1) each.
+
+    Every frame advances the session's (h, c) by one step instead of re-running
+    a window, so the only per-session memory is the fixed-size hidden state.
+    Sessions idle for longer than ``ttl`` seconds are evicted, and at most
+    ``max_sessions`` are kept, dropping the least recently used first. When the
+    registry swaps in a new model, existing states are reset since they were
+    produced by different weights.
+
+    A model trained on windows (window_size > 1) only ever saw window_size
+    frames from a zero state, so for it a session keeps the last
+    window_size - 1 frames instead and each frame is scored from its window,
+    costing window_size LSTM steps.
+    """
+
+    def __init__(self, registry, ttl=60.0, max_sessions=1024):
+        self.registry = registry
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def after_fork(self):
+        """Sessions are per process, so a forked child starts with none."""
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _session(self, sensor_id, model_version):
+        now = time.monotonic()
+        with self._lock:
+            # Sessions are kept in last-access order, so expired ones are at the front
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                expired = now - oldest.last_seen > self.ttl
+                full = len(self._sessions) >= self.max_sessions and sensor_id not in self._sessions
+                if not (expired or full):
+                    break
+                del self._sessions[oldest.sensor_id]
+                self.evicted += 1
+
+            session = self._sessions.get(sensor_id)
+            if session is None:
+                session = StreamSession(sensor_id, model_version)
+                self._sessions[sensor_id] = session
+            else:
+                self._sessions.move_to_end(sensor_id)
+            session.last_seen = now
+            return session
+
+    def close(self, sensor_id):
+        with self._lock:
+            return self._sessions.pop(sensor_id, None) is not None
+
+    def advance(self, sensor_id, frames):
+        """
+        Feed consecutive frames [steps, features] for a sensor.
+
+        Returns (presence_prob, pose_probs, presence_pred, pose_class, joints)
+        arrays with one entry per frame, calibrated like Predictor.predict_proba.
+        joints is None unless the model's keypoint head is trained.
+        """
+        loaded = self.registry.get()
+        if loaded is None:
+            raise RuntimeError('Model not loaded')
+        trainer = loaded.trainer
+
+        frames = np.asarray(frames, dtype=np.float32)
+        if frames.ndim == 1:
+            frames = frames.reshape(1, -1)
+
+        session = self._session(sensor_id, loaded.version)
+        with session.lock:
+            if session.model_version != loaded.version:
+                session.reset(loaded.version)
+            if trainer.window_size > 1:
+                windows, session.context = trainer.frame_windows(frames, session.context)
+            else:
+                if session.state is None:
+                    session.state = trainer.initial_state()
+                with torch.no_grad():
+                    x = torch.from_numpy(frames).unsqueeze(0).to(trainer.device)
+                    outputs = trainer.model.step(x, session.state)
+                    presence_out, pose_out, session.state = outputs[0], outputs[1], outputs[-1]
+
+            session.frames += len(frames)
+            session.last_seen = time.monotonic()
+
+        if trainer.window_size > 1:
+            # Only the frame context is per session, so windows are scored outside the lock
+            presence_prob, pose_probs, joints = trainer.predict_proba(windows)
+            presence_pred, pose_class = trainer.decode(presence_prob, pose_probs)
+            return presence_prob, pose_probs, presence_pred, pose_class, joints
+
+        presence_prob, pose_probs = trainer.calibrate(presence_out.reshape(-1), pose_out.reshape(len(frames), -1))
+        presence_prob = presence_prob.cpu().numpy()
+        pose_probs = pose_probs.cpu().numpy()
+        presence_pred, pose_class = trainer.decode(presence_prob, pose_probs)
+        joints = outputs[2].reshape(len(frames), -1, 2).cpu().numpy() if trainer.has_joints else None
+        return presence_prob, pose_probs, presence_pred, pose_class, joints
+
+    def status(self):
+        return {'sessions': len(self._sessions), 'evicted': self.evicted, 'ttlSeconds': self.ttl}
@@ -0,0 +1,255 @@
+"""
+Parallel hyperparameter sweep over WiFiPoseModel configurations.
+
+Every combination of the given values (or --random N of them) is one trial:
+a ModelTrainer built with that hidden size, layer count, fc1 width and
+window size, trained with that batch size. Trials run --workers at a time,
+each in its own process limited to --threads torch threads, so workers x
+threads should not exceed the machine's cores. Training and validation data
+are memory-mapped stores (model.csi_store); CSVs are converted once up front,
+so all trials read the same page-cached copy.
+
+Trials report their validation loss after every epoch. After --prune-after
+epochs, a trial whose best loss so far is worse than the median loss of the
+other trials at the same epoch is stopped (median pruning), once at least
+--prune-min-trials others have got that far.
+
+Each finished trial's best weights are scored on the validation data for
+presence/pose accuracy, timed for a single-frame request and a --rows
+request, and its parameters counted. The leaderboard lists trials meeting
+--min-accuracy (pose accuracy) fastest first, then the rest by accuracy,
+and is written to leaderboard.json in --out-dir along with each trial's
+model.
+
+Usage:
+    python -m model.sweep --train ../data/train_store --valid ../data/test_store --out-dir ../sweeps/run1 \
+        --hidden-size 32 64 128 --num-layers 1 2 --fc-size 32 128 --batch-size 32 128 --workers 4
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import torch
+
+from model.csi_store import MmapCSIDataset, convert_csv, is_store, read_meta
+from model.finetune import evaluate
+from model.lstm_model import ModelTrainer
+
+# Searched hyperparameters: ModelTrainer arguments, plus the batch size passed to train()
+SEARCH_SPACE = ('hidden_size', 'num_layers', 'fc_size', 'window_size', 'batch_size')
+
+
+def trial_configs(space, num_random=None, seed=0):
+    """Every combination of the values in space ({name: [values]}), or num_random of them picked at random."""
+    names = list(space)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+    if num_random is not None and num_random < len(configs):
+        configs = random.Random(seed).sample(configs, num_random)
+    return configs
+
+
+def prepare_store(path, out_dir, name, classes=None):
+    """A store for path: path itself if it is one, otherwise a store converted from the CSV into out_dir."""
+    if is_store(path):
+        return path
+    store_dir = os.path.join(out_dir, name)
+    if not is_store(store_dir):
+        print(f'Converting {path} to a memory-mapped store at {store_dir}')
+        convert_csv(path, store_dir, classes=classes)
+    return store_dir
+
+
+class MedianPruner:
+    """
+    Median stopping rule over the validation losses trials report each epoch.
+
+    losses is a dict shared between processes (a multiprocessing.Manager
+    dict): trial id -> list of per-epoch validation losses.
+    """
+
+    def __init__(self, losses, warmup_epochs=2, min_trials=3):
+        self.losses = losses
+        self.warmup_epochs = warmup_epochs
+        self.min_trials = min_trials
+
+    def report(self, trial_id, valid_loss):
+        """Record a trial's latest epoch and return True if it should stop."""
+        history = list(self.losses.get(trial_id, [])) + [valid_loss]
+        self.losses[trial_id] = history
+        epoch = len(history)
+        if epoch <= self.warmup_epochs:
+            return False
+        others = [losses[epoch - 1] for other, losses in self.losses.items()
+                  if other != trial_id and len(losses) >= epoch]
+        if len(others) < self.min_trials:
+            return False
+        return min(history) > float(np.median(others))
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+
+
+def _latency_ms(predictor, features, repeat):
+    predictor.predict_proba(features)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        predictor.predict_proba(features)
+        times.append(time.perf_counter() - started)
+    return 1000 * float(np.median(times))
+
+
+def run_trial(trial_id, config, train_store, valid_store, out_dir, num_epochs, input_size, pruner, rows, repeat):
+    """Train, score and time one configuration in a worker process."""
+    config = dict(config)
+    batch_size = config.pop('batch_size')
+    trial_dir = os.path.join(out_dir, f'trial-{trial_id:03d}')
+    model_path = os.path.join(trial_dir, 'best_model.safetensors')
+    trainer = ModelTrainer(input_size, **config)
+
+    pruned = []
+
+    def on_epoch(entry):
+        # Every epoch is reported, so the median of the others covers finished trials too
+        if pruner is not None and pruner.report(trial_id, entry['valid_loss']) and entry['epoch'] < num_epochs:
+            pruned.append(entry['epoch'])
+            return True
+        return False
+
+    started = time.perf_counter()
+    trainer.train(train_store, valid_store, num_epochs=num_epochs, batch_size=batch_size, model_path=model_path,
+                  epoch_callback=on_epoch)
+    train_seconds = time.perf_counter() - started
+
+    # Scored and timed with the best epoch's weights, as they would be served
+    trainer.load_model(model_path)
+    result = {
+        'trial': trial_id,
+        'config': {**config, 'batch_size': batch_size},
+        'status': 'pruned' if pruned else 'complete',
+        'epochs': len(trainer.history),
+        'best_valid_loss': min(entry['valid_loss'] for entry in trainer.history),
+        'train_seconds': train_seconds,
+        'parameters': sum(p.numel() for p in trainer.model.parameters()),
+        'model_path': model_path,
+    }
+    scores = evaluate(trainer, valid_store)
+    result['presence_accuracy'] = scores['presence_accuracy']
+    result['pose_accuracy'] = scores['pose_accuracy']
+
+    # Consecutive validation frames, so windowed models are timed on real windows
+    features = np.resize(np.array(MmapCSIDataset(valid_store).features[:rows]), (rows, input_size))
+    result['latency_ms_1'] = _latency_ms(trainer, features[:1], repeat)
+    result[f'latency_ms_{rows}'] = _latency_ms(trainer, features, repeat)
+    return result
+
+
+def leaderboard(results, min_accuracy=None):
+    """Trials meeting min_accuracy (pose accuracy), fastest single-frame latency first, then the rest by accuracy."""
+    if min_accuracy is None:
+        return sorted(results, key=lambda r: (-r['pose_accuracy'], r['latency_ms_1']))
+    passing = sorted((r for r in results if r['pose_accuracy'] >= min_accuracy), key=lambda r: r['latency_ms_1'])
+    failing = sorted((r for r in results if r['pose_accuracy'] < min_accuracy), key=lambda r: -r['pose_accuracy'])
+    return passing + failing
+
+
+def sweep(train, valid, out_dir, space, num_random=None, num_epochs=20, workers=None, threads=None, input_size=256,
+          prune_after=2, prune_min_trials=3, min_accuracy=None, rows=256, repeat=20, seed=0):
+    """Run the sweep and return the leaderboard; see the module docstring."""
+    os.makedirs(out_dir, exist_ok=True)
+    train_store = prepare_store(train, out_dir, 'train_store')
+    valid_store = prepare_store(valid, out_dir, 'valid_store', classes=read_meta(train_store)['classes'])
+
+    configs = trial_configs(space, num_random, seed)
+    workers = workers or os.cpu_count()
+    # Keep workers * threads within the machine's cores
+    threads = threads or max(1, os.cpu_count() // workers)
+    print(f'{len(configs)} trials, {workers} at a time with {threads} torch threads each')
+
+    started = time.perf_counter()
+    results = []
+    with multiprocessing.Manager() as manager, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        pruner = MedianPruner(manager.dict(), warmup_epochs=prune_after, min_trials=prune_min_trials) \
+            if prune_after is not None else None
+        futures = {
+            pool.submit(run_trial, i, config, train_store, valid_store, out_dir, num_epochs, input_size, pruner,
+                        rows, repeat): i
+            for i, config in enumerate(configs)
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f'Trial {futures[future]} failed: {e}')
+                continue
+            results.append(result)
+            print(f"Trial {result['trial']} {result['status']} after {result['epochs']} epochs: "
+                  f"pose accuracy {result['pose_accuracy']:.4f}, {result['latency_ms_1']:.2f} ms, "
+                  f"{result['parameters']} parameters ({len(results)}/{len(configs)} done)")
+
+    board = leaderboard(results, min_accuracy)
+    with open(os.path.join(out_dir, 'leaderboard.json'), 'w') as f:
+        json.dump({'min_accuracy': min_accuracy, 'seconds': time.perf_counter() - started, 'trials': board}, f,
+                  indent=2)
+    return board
+
+
+def print_leaderboard(board, rows, min_accuracy=None):
+    print(f"{'trial':>5} {'status':>8} {'hidden':>6} {'layers':>6} {'fc':>4} {'window':>6} {'batch':>5} "
+          f"{'params':>9} {'presence acc':>12} {'pose acc':>9} {'ms/1':>7} {f'ms/{rows}':>8} {'epochs':>6}")
+    for r in board:
+        c = r['config']
+        print(f"{r['trial']:>5} {r['status']:>8} {c['hidden_size']:>6} {c['num_layers']:>6} {c['fc_size']:>4} "
+              f"{c['window_size']:>6} {c['batch_size']:>5} {r['parameters']:>9} {r['presence_accuracy']:>12.4f} "
+              f"{r['pose_accuracy']:>9.4f} {r['latency_ms_1']:>7.2f} {r[f'latency_ms_{rows}']:>8.2f} "
+              f"{r['epochs']:>6}")
+    if min_accuracy is not None:
+        if board and board[0]['pose_accuracy'] >= min_accuracy:
+            print(f"Fastest trial with pose accuracy >= {min_accuracy}: {board[0]['trial']} ({board[0]['model_path']})")
+        else:
+            print(f'No trial reached pose accuracy {min_accuracy}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--train', required=True, help='training store or CSV')
+    parser.add_argument('--valid', required=True, help='validation store or CSV')
+    parser.add_argument('--out-dir', required=True)
+    parser.add_argument('--hidden-size', type=int, nargs='+', default=[64, 128])
+    parser.add_argument('--num-layers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--fc-size', type=int, nargs='+', default=[64, 128])
+    parser.add_argument('--window-size', type=int, nargs='+', default=[1])
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[32])
+    parser.add_argument('--random', type=int, help='run this many randomly chosen combinations instead of all')
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--workers', type=int, help='concurrent trials (default: one per CPU)')
+    parser.add_argument('--threads', type=int, help='torch threads per trial (default: CPUs / workers)')
+    parser.add_argument('--prune-after', type=int, default=2, help='epochs before a trial can be pruned')
+    parser.add_argument('--prune-min-trials', type=int, default=3,
+                        help='other trials that must have reached an epoch before pruning on it')
+    parser.add_argument('--no-prune', action='store_true')
+    parser.add_argument('--min-accuracy', type=float, help='pose accuracy a trial must reach to rank by speed')
+    parser.add_argument('--rows', type=int, default=256, help='frames in the larger timed request')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--input-size', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    space = {name: getattr(args, name) for name in SEARCH_SPACE}
+    board = sweep(args.train, args.valid, args.out_dir, space, num_random=args.random, num_epochs=args.epochs,
+                  workers=args.workers, threads=args.threads, input_size=args.input_size,
+                  prune_after=None if args.no_prune else args.prune_after, prune_min_trials=args.prune_min_trials,
+                  min_accuracy=args.min_accuracy, rows=args.rows, repeat=args.repeat, seed=args.seed)
+    print_leaderboard(board, args.rows, args.min_accuracy)
+
+
+if __name__ == '__main__':
+    main()
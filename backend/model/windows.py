@@ -0,0 +1,100 @@
+"""
+Sliding windows of consecutive CSI frames, for models trained on sequences.
+
+A model built with window_size > 1 scores each frame from the window of
+window_size frames ending at it, so the LSTM sees how the channel changes
+instead of one frame at a time. Windows are strided views over the frame
+array (torch.unfold / numpy sliding_window_view): building them copies
+nothing, and only the windows a batch actually uses are gathered.
+"""
+import numpy as np
+import torch
+from torch.utils.data import Dataset
+
+
+def sliding_windows(features, window):
+    """
+    View of every window of consecutive rows, [rows - window + 1, window, features].
+
+    features may be a torch tensor or a numpy array (including a read-only
+    memory map); the result is the same kind and shares its memory.
+    """
+    if isinstance(features, torch.Tensor):
+        return features.unfold(0, window, 1).transpose(1, 2)
+    return np.lib.stride_tricks.sliding_window_view(features, window, axis=0).transpose(0, 2, 1)
+
+
+def frame_windows(frames, window, context=None):
+    """
+    Windows [rows, window, features] ending at each row of frames, plus the context for the next call.
+
+    context holds frames that came before these ones (e.g. the previous
+    batch of the same capture); without it the first frame is repeated to
+    fill the first windows. The returned context is the last window - 1
+    frames seen, so a capture can be windowed in consecutive pieces.
+    """
+    frames = np.asarray(frames, dtype=np.float32)
+    pad = window - 1
+    if context is None or len(context) == 0:
+        context = np.repeat(frames[:1], pad, axis=0)
+    elif len(context) < pad:
+        context = np.concatenate([np.repeat(context[:1], pad - len(context), axis=0), context])
+    padded = np.concatenate([context[len(context) - pad:], frames])
+    return sliding_windows(padded, window), padded[len(padded) - pad:]
+
+
+def capture_starts(capture_ids):
+    """Row offsets where a new capture begins in a column of capture ids."""
+    capture_ids = np.asarray(capture_ids)
+    if len(capture_ids) == 0:
+        return [0]
+    return [0] + (np.flatnonzero(capture_ids[1:] != capture_ids[:-1]) + 1).tolist()
+
+
+def _take(array, idx):
+    if isinstance(array, torch.Tensor):
+        return array[torch.as_tensor(idx)]
+    # np.array copies the touched rows out of a read-only mapping
+    return torch.from_numpy(np.ascontiguousarray(array[idx]))
+
+
+class WindowedCSIDataset(Dataset):
+    """
+    Windows of window_size consecutive frames over a frame dataset.
+
+    Wraps a WiFiCSIDataset or MmapCSIDataset. Windows never span two captures
+    (see capture_starts on the base dataset) and start every stride frames
+    within a capture. Each window is labelled with its last frame's presence,
+    pose and joints, the frame a served window is scored for.
+    """
+
+    def __init__(self, base, window_size, stride=1):
+        self.base = base
+        self.window_size = window_size
+        self.stride = stride
+        self.classes = base.classes
+        self.joints = base.joints
+
+        bounds = list(getattr(base, 'capture_starts', None) or [0]) + [len(base)]
+        self.starts = np.concatenate([
+            np.arange(begin, end - window_size + 1, stride, dtype=np.int64)
+            for begin, end in zip(bounds[:-1], bounds[1:])
+        ])
+        self._windows = sliding_windows(base.features, window_size) if len(base) >= window_size else None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, list):
+            # Sorted, so windows over a memory map are read in one forward sweep
+            starts = np.sort(self.starts[idx])
+        else:
+            starts = self.starts[idx]
+        ends = starts + self.window_size - 1
+        return (
+            _take(self._windows, starts),
+            _take(self.base.presence_labels, ends),
+            _take(self.base.pose_labels, ends),
+            _take(self.base.joints, ends) if self.base.joints is not None else None
+        )
@@ -0,0 +1,153 @@
+"""
+Production entry point: a pre-fork multi-process server for app.py.
+
+The parent process imports the app (loading the model weights once), binds the
+listening socket, stops the app's background threads and forks the workers. Workers inherit the weights
+copy-on-write, so N workers share one copy of the parameters in memory until a
+worker hot-swaps to a new version. Each worker runs a threaded WSGI server on
+the shared socket, with its own micro-batching thread and its own
+torch.set_num_threads so workers do not oversubscribe the cores.
+
+Metrics are per worker: each worker is given a fixed slot number, kept by its
+replacement if it dies, and /metrics labels every sample with worker="<slot>".
+A scrape is answered by whichever worker accepts it, so aggregate with
+`sum without (worker)` over the scraped series rather than reading one response.
+
+SIGTERM or SIGINT to the parent stops every worker gracefully: they stop
+accepting connections, finish in-flight requests and exit.
+
+Usage (from the repository root):
+    python backend/serve.py --workers 4 --threads 2 --port 5000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+import torch
+from werkzeug.serving import make_server
+
+
+def default_threads(workers):
+    """Split the cores evenly between workers, at least one intra-op thread each."""
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def run_worker(server_app, sock, host, port, threads, slot):
+    torch.set_num_threads(threads)
+    server_app.after_fork(worker=slot)
+    server = make_server(host, port, server_app.app, threaded=True, fd=sock.fileno())
+
+    def shutdown(signum, frame):
+        # shutdown() waits for serve_forever to return, so it can't run on its thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    # Ctrl-C reaches the whole process group; let the parent coordinate shutdown
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    print(f"Worker {slot} ({os.getpid()}) serving with {threads} torch threads")
+    server.serve_forever()
+    # Joins request threads, so in-flight requests finish before exit
+    server.server_close()
+    server_app.pool.stop()
+
+
+def spawn(server_app, sock, args, threads, slot):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(server_app, sock, args.host, args.port, threads, slot)
+        except Exception as e:
+            print(f"Worker {os.getpid()} failed: {str(e)}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(code)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-fork production server for the WiFi pose backend')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, help='torch intra-op threads per worker (default: cores / workers)')
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help='seconds to wait for workers to finish before killing them')
+    args = parser.parse_args()
+    threads = args.threads or default_threads(args.workers)
+
+    # Keep the parent single-threaded in torch so no OpenMP pool exists at fork time
+    torch.set_num_threads(1)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as server_app
+
+    if server_app.registry.get() is None:
+        print("Warning: starting workers without a loaded model")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+
+    # Threads don't survive fork, and one holding a lock at fork time would
+    # leave it held in every worker; the parent only supervises, so the model
+    # watchers, batch schedulers and parse threads run in the workers alone
+    server_app.before_fork()
+
+    # Move everything allocated so far out of the GC's reach, so collections
+    # in the workers don't write to (and un-share) the parent's pages
+    gc.freeze()
+
+    print(f"Listening on {args.host}:{args.port} with {args.workers} workers x {threads} threads")
+    # pid -> worker slot; a respawned worker takes over its predecessor's slot,
+    # so the worker label on /metrics has a fixed set of values
+    workers = {spawn(server_app, sock, args, threads, slot): slot for slot in range(args.workers)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # Supervise: respawn workers that die unexpectedly until asked to stop
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.5)
+            continue
+        slot = workers.pop(pid, None)
+        if not stopping and slot is not None:
+            print(f"Worker {slot} ({pid}) exited with status {status}, restarting")
+            workers[spawn(server_app, sock, args, threads, slot)] = slot
+
+    print("Shutting down workers")
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    deadline = time.monotonic() + args.graceful_timeout
+    while workers and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            workers.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in workers:
+        print(f"Worker {pid} did not stop in time, killing it")
+        os.kill(pid, signal.SIGKILL)
+    sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -11,7 +11,7 @@ def test_model():
     trainer = ModelTrainer(input_size)
     
     # Load model
-    model_path = 'backend/model/saved_models/best_model.pth'
+    model_path = 'backend/model/saved_models/best_model.safetensors'
     if not os.path.exists(model_path):
         print(f"Error: No trained model found at {model_path}. Please run the training script first.")
         return
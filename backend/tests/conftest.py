@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+# Backend modules import each other as top-level packages (model, csi_io, ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.common import DEFAULT_MODEL_PATH, POSE_CLASSES  # noqa: E402
+
+# Extra model served next to the default one, as /api/models/windowed/...
+WINDOWED_MODEL_ID = 'windowed'
+WINDOW_SIZE = 4
+
+
+@pytest.fixture(scope='session')
+def windowed_model_id():
+    return WINDOWED_MODEL_ID
+
+
+@pytest.fixture(scope='session')
+def windowed_model_path(tmp_path_factory):
+    from model.lstm_model import ModelTrainer
+
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16, window_size=WINDOW_SIZE)
+    trainer.set_classes(POSE_CLASSES)
+    path = str(tmp_path_factory.mktemp('models') / 'windowed.safetensors')
+    trainer.save_model(path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def server(windowed_model_path):
+    """The app module, serving the committed model and a windowed one; configured before its first import."""
+    os.environ['MODEL_PATH'] = os.path.abspath(DEFAULT_MODEL_PATH)
+    os.environ['MODELS'] = f'{WINDOWED_MODEL_ID}={windowed_model_path}'
+    os.environ['MODEL_POLL_INTERVAL'] = '0'
+    os.environ['PREDICT_CACHE_SIZE'] = '0'
+    import app
+    if app.registry.get() is None:
+        pytest.skip('no trained model to serve')
+    yield app
+    app.pool.stop()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
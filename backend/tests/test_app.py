@@ -0,0 +1,95 @@
+"""
+HTTP behaviour of app.py through Flask's test client (see the server fixture in conftest).
+"""
+import io
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.common import make_csi, make_csv_bytes
+from model.inference import Predictor
+
+
+def post_batch_csv(client, body):
+    return client.post('/api/predict/batch', data={'file': (io.BytesIO(body), 'capture.csv')})
+
+
+def test_batch_csv_scores_every_row(client):
+    response = post_batch_csv(client, make_csv_bytes(5))
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['row'] for row in rows] == list(range(5))
+    assert all('error' not in row for row in rows)
+
+
+@pytest.mark.parametrize('body', [
+    b'',
+    b'a,b\n1,2\n',
+    ','.join(f'csi_{i}' for i in range(256)).encode() + b'\n',
+    ','.join(f'csi_{i}' for i in range(256)).encode() + b'\n' + b','.join([b'x'] * 256) + b'\n',
+    make_csv_bytes(3, input_size=100),
+], ids=['empty', 'no-csi-columns', 'header-only', 'non-numeric', 'wrong-width'])
+def test_batch_csv_rejects_malformed_upload(client, body):
+    response = post_batch_csv(client, body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_batch_binary_rejects_wrong_width(client):
+    buf = io.BytesIO()
+    np.save(buf, make_csi(3, input_size=300))
+    response = client.post('/api/predict/batch', data=buf.getvalue(), content_type='application/x-npy')
+    assert response.status_code == 400
+
+
+def post_npy(client, url, frames):
+    buf = io.BytesIO()
+    np.save(buf, frames)
+    return client.post(url, data=buf.getvalue(), content_type='application/x-npy')
+
+
+def test_windowed_predict_reports_last_row(client, windowed_model_id, windowed_model_path):
+    predictor = Predictor(256)
+    predictor.load_model(windowed_model_path)
+    frames = make_csi(6)
+    presence_prob, pose_probs, _ = predictor.predict_proba(frames)
+    # Otherwise the test couldn't tell the rows apart
+    assert not np.isclose(presence_prob[0], presence_prob[-1])
+
+    response = post_npy(client, f'/api/models/{windowed_model_id}/predict', frames)
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['presenceProbability'] == pytest.approx(float(presence_prob[-1]), abs=1e-5)
+    assert result['poseProbabilities'] == pytest.approx(dict(zip(predictor.classes, pose_probs[-1].tolist())),
+                                                        abs=1e-5)
+
+
+def test_single_frame_predict_reports_first_row(client, server):
+    predictor = server.registry.get().trainer
+    frames = make_csi(3)
+    presence_prob, _, _ = predictor.predict_proba(frames)
+    response = post_npy(client, '/api/predict', frames)
+    assert response.status_code == 200
+    assert response.get_json()['presenceProbability'] == pytest.approx(float(presence_prob[0]), abs=1e-5)
+
+
+def test_stream_error_reports_frame_and_closes_session(client, server, monkeypatch):
+    advance = server.streams.advance
+    calls = []
+
+    def failing_advance(sensor_id, frames):
+        calls.append(sensor_id)
+        if len(calls) == 2:
+            raise RuntimeError('model failed')
+        return advance(sensor_id, frames)
+
+    monkeypatch.setattr(server.streams, 'advance', failing_advance)
+    response = client.post('/api/stream/sensor-err', data=make_csi(3).astype('<f4').tobytes())
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]['frame'] == 0 and 'error' not in lines[0]
+    assert lines[1] == {'error': 'model failed', 'frame': 1}
+    assert len(lines) == 2
+    # The half-advanced session was dropped
+    assert client.delete('/api/stream/sensor-err').status_code == 404
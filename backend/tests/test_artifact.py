@@ -0,0 +1,75 @@
+"""
+Single-file safetensors model artifacts (model.artifact) and their reload.
+"""
+import json
+import struct
+
+import numpy as np
+import pytest
+import torch
+
+from benchmarks.common import POSE_CLASSES, make_csi
+from model.artifact import ARTIFACT_VERSION, read_artifact, read_safetensors, write_safetensors
+from model.inference import Predictor
+from model.lstm_model import ModelTrainer
+
+
+def test_safetensors_round_trip_aligns_mixed_dtypes(tmp_path):
+    path = str(tmp_path / 'tensors.safetensors')
+    tensors = {
+        'flag': np.array([True, False]),
+        'weight': torch.arange(6, dtype=torch.float32).reshape(2, 3),
+        'index': np.array([1, 2, 3], dtype=np.int64),
+        'half': np.array([0.5], dtype=np.float16),
+    }
+    write_safetensors(path, tensors, {'note': 1})
+    for mmap in (True, False):
+        loaded, metadata = read_safetensors(path, mmap=mmap)
+        assert metadata == {'note': '1'}
+        for name, value in tensors.items():
+            expected = value.numpy() if isinstance(value, torch.Tensor) else value
+            np.testing.assert_array_equal(loaded[name].numpy(), expected)
+            assert loaded[name].numpy().ctypes.data % loaded[name].element_size() == 0
+
+
+def test_model_artifact_round_trip(tmp_path):
+    torch.manual_seed(0)
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16)
+    trainer.set_classes(POSE_CLASSES)
+    path = str(tmp_path / 'model.safetensors')
+    trainer.save_model(path)
+
+    predictor = Predictor(256)
+    predictor.load_model(path)
+    assert predictor.classes == POSE_CLASSES
+    assert predictor.config() == trainer.config()
+    frames = make_csi(4)
+    trainer.model.eval()
+    for expected, actual in zip(trainer.predict_proba(frames)[:2], predictor.predict_proba(frames)[:2]):
+        np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def rewrite_metadata(path, **changes):
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_len))
+        data = f.read()
+    header['__metadata__'].update(changes)
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b' ' * (-len(header_bytes) % 8)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)) + header_bytes + data)
+
+
+@pytest.mark.parametrize('changes', [
+    {'format': 'something-else'},
+    {'format_version': str(ARTIFACT_VERSION + 1)},
+], ids=['foreign', 'newer'])
+def test_read_artifact_rejects_unknown_files(tmp_path, changes):
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16)
+    trainer.set_classes(POSE_CLASSES)
+    path = str(tmp_path / 'model.safetensors')
+    trainer.save_model(path)
+    rewrite_metadata(path, **changes)
+    with pytest.raises(ValueError):
+        read_artifact(path)
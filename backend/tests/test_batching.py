@@ -0,0 +1,83 @@
+import concurrent.futures
+
+import numpy as np
+import pytest
+
+from benchmarks.common import POSE_CLASSES, StaticRegistry, make_csi
+from model.batching import BatchScheduler
+from model.lstm_model import ModelTrainer
+
+
+@pytest.fixture
+def trainer():
+    """A small model whose predict_proba records the rows of every batch it scores."""
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16)
+    trainer.set_classes(POSE_CLASSES)
+    trainer.scored_rows = []
+    predict_proba = trainer.predict_proba
+
+    def recording_predict_proba(features, **kwargs):
+        trainer.scored_rows.append(len(features))
+        return predict_proba(features, **kwargs)
+
+    trainer.predict_proba = recording_predict_proba
+    return trainer
+
+
+def test_timed_out_request_is_not_scored(trainer):
+    # Not started, so nothing is scored before the timeout
+    scheduler = BatchScheduler(StaticRegistry(trainer), max_wait_ms=50)
+    with pytest.raises(concurrent.futures.TimeoutError):
+        scheduler.predict(make_csi(3), timeout=0.01)
+    waiting = scheduler.submit(make_csi(2))
+    scheduler.start()
+    try:
+        assert len(waiting.result(timeout=5).presence_prob) == 2
+    finally:
+        scheduler.stop()
+    assert trainer.scored_rows == [2]
+    assert scheduler.stats.requests == 1
+
+
+def test_cancelled_requests_do_not_break_stop(trainer):
+    scheduler = BatchScheduler(StaticRegistry(trainer))
+    cancelled = scheduler.submit(make_csi(1))
+    assert cancelled.cancel()
+    scheduler.stop()
+    assert cancelled.cancelled()
+
+
+def test_batch_results_are_scattered_back_per_request(trainer):
+    trainer.model.eval()
+    scheduler = BatchScheduler(StaticRegistry(trainer), max_wait_ms=200)
+    requests = [make_csi(rows, seed=rows) for rows in (1, 3, 2)]
+    futures = [scheduler.submit(frames) for frames in requests]
+    scheduler.start()
+    try:
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+    # Coalesced into one forward pass
+    assert trainer.scored_rows == [6]
+    for frames, result in zip(requests, results):
+        presence_prob, pose_probs, _ = trainer.predict_proba(frames)
+        np.testing.assert_allclose(result.presence_prob, presence_prob, atol=1e-5)
+        np.testing.assert_allclose(result.pose_probs, pose_probs, atol=1e-5)
+        assert result.batch_rows == 6
+        assert result.timings['queue_wait'] >= 0
+
+
+def test_windows_do_not_run_across_requests():
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16, window_size=4)
+    trainer.set_classes(POSE_CLASSES)
+    trainer.model.eval()
+    scheduler = BatchScheduler(StaticRegistry(trainer), max_wait_ms=200)
+    requests = [make_csi(5, seed=1), make_csi(3, seed=2)]
+    futures = [scheduler.submit(frames) for frames in requests]
+    scheduler.start()
+    try:
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        scheduler.stop()
+    for frames, result in zip(requests, results):
+        np.testing.assert_allclose(result.presence_prob, trainer.predict_proba(frames)[0], atol=1e-5)
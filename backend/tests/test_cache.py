@@ -0,0 +1,54 @@
+"""
+Prediction cache keying, versioning and eviction (model.cache).
+"""
+import numpy as np
+
+from benchmarks.common import make_csi
+from model.cache import PredictionCache
+
+
+def test_key_depends_on_content_and_shape_only():
+    cache = PredictionCache()
+    frames = make_csi(2, input_size=8)
+    assert cache.key(frames) == cache.key(frames.astype(np.float64))
+    assert cache.key(frames) == cache.key(np.asfortranarray(frames))
+    assert cache.key(frames) != cache.key(frames.reshape(4, 4))
+    changed = frames.copy()
+    changed[0, 0] += 1e-3
+    assert cache.key(frames) != cache.key(changed)
+
+
+def test_quantum_shares_keys_between_near_identical_frames():
+    cache = PredictionCache(quantum=0.1)
+    frames = np.full((1, 8), 1.0, dtype=np.float32)
+    assert cache.key(frames) == cache.key(frames + 0.01)
+    assert cache.key(frames) != cache.key(frames + 0.5)
+
+
+def test_new_model_version_drops_entries():
+    cache = PredictionCache()
+    cache.put(b'k', 'v1', 'result')
+    assert cache.get(b'k', 'v1') == 'result'
+    assert cache.get(b'k', 'v2') is None
+    assert cache.get(b'k', 'v1') is None
+    assert cache.invalidations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put(b'a', 'v', 1)
+    cache.put(b'b', 'v', 2)
+    cache.get(b'a', 'v')
+    cache.put(b'c', 'v', 3)
+    assert cache.get(b'b', 'v') is None
+    assert cache.get(b'a', 'v') == 1
+    assert cache.get(b'c', 'v') == 3
+    assert cache.evicted == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = PredictionCache(ttl=-1)
+    cache.put(b'k', 'v', 'result')
+    assert cache.get(b'k', 'v') is None
+    assert len(cache) == 0
+    assert cache.status()['hits'] == 0
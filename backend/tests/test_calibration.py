@@ -0,0 +1,79 @@
+"""
+Calibration sidecars (model.calibration) and how Predictor applies them.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from benchmarks.common import POSE_CLASSES, make_csi
+from model.calibration import fit_calibration, save_calibration
+from model.inference import DEFAULT_CALIBRATION, Predictor, calibration_path
+from model.lstm_model import ModelTrainer
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    torch.manual_seed(0)
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16)
+    trainer.set_classes(POSE_CLASSES)
+    path = str(tmp_path / 'model.safetensors')
+    trainer.save_model(path)
+    return path
+
+
+def load(path):
+    predictor = Predictor(256)
+    predictor.load_model(path)
+    return predictor
+
+
+def test_saved_calibration_is_applied_on_load(model_path):
+    frames = make_csi(8)
+    raw_presence, raw_pose, _ = load(model_path).predict_proba(frames)
+
+    calibration = {'presence_temperature': 2.0, 'pose_temperature': 3.0, 'presence_threshold': 0.9}
+    assert save_calibration(calibration, model_path) == calibration_path(model_path)
+    predictor = load(model_path)
+    presence, pose, _ = predictor.predict_proba(frames)
+
+    def logit(p):
+        return np.log(p / (1 - p))
+
+    np.testing.assert_allclose(logit(presence), logit(raw_presence) / 2.0, atol=1e-4)
+    np.testing.assert_allclose(pose.sum(axis=1), 1.0, atol=1e-5)
+    # Flatter distributions, but the same ranking
+    assert (pose.max(axis=1) < raw_pose.max(axis=1)).all()
+    np.testing.assert_array_equal(pose.argmax(axis=1), raw_pose.argmax(axis=1))
+    presence_pred, _ = predictor.decode(presence, pose)
+    np.testing.assert_array_equal(presence_pred, (presence > 0.9).astype(np.float32))
+
+
+def test_saving_new_weights_removes_stale_calibration(model_path):
+    save_calibration(dict(DEFAULT_CALIBRATION, presence_temperature=2.0), model_path)
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16)
+    trainer.set_classes(POSE_CLASSES)
+    trainer.save_model(model_path)
+    assert not os.path.exists(calibration_path(model_path))
+    assert load(model_path).calibration == DEFAULT_CALIBRATION
+
+
+def test_fit_calibration_on_a_validation_csv(model_path, tmp_path):
+    rng = np.random.default_rng(0)
+    frames = make_csi(64)
+    csv_path = tmp_path / 'valid.csv'
+    with open(csv_path, 'w') as f:
+        f.write(','.join([f'csi_{i}' for i in range(256)] + ['human_presence', 'pose_class']) + '\n')
+        for row in frames:
+            f.write(','.join([f'{v:.4f}' for v in row] + [str(rng.integers(2)), str(rng.choice(POSE_CLASSES))]) + '\n')
+
+    calibration, report = fit_calibration(load(model_path), str(csv_path))
+    assert calibration['rows'] == 64
+    assert calibration['presence_temperature'] > 0 and calibration['pose_temperature'] > 0
+    assert 0.0 < calibration['presence_threshold'] < 1.0
+    assert set(report) == {'before', 'after'}
+    # What save_calibration writes is what load_model reads back
+    save_calibration(calibration, model_path)
+    assert load(model_path).calibration == {**DEFAULT_CALIBRATION, **json.loads(json.dumps(calibration))}
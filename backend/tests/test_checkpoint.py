@@ -0,0 +1,67 @@
+"""
+Resumable training checkpoints (ModelTrainer.train with checkpoint_dir).
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks.common import POSE_CLASSES
+from model.checkpoint import INDEX_FILE
+from model.lstm_model import ModelTrainer
+
+INPUT_SIZE = 8
+
+
+def write_capture(path, rows=64, seed=0):
+    rng = np.random.default_rng(seed)
+    header = [f'csi_{i}' for i in range(INPUT_SIZE)] + ['human_presence', 'pose_class']
+    with open(path, 'w') as f:
+        f.write(','.join(header) + '\n')
+        for _ in range(rows):
+            values = [f'{v:.4f}' for v in rng.normal(size=INPUT_SIZE)]
+            f.write(','.join(values + [str(rng.integers(2)), str(rng.choice(POSE_CLASSES))]) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def data(tmp_path):
+    return write_capture(tmp_path / 'train.csv'), write_capture(tmp_path / 'valid.csv', seed=1)
+
+
+def train(trainer, data, tmp_path, num_epochs, resume=False):
+    trainer.train(*data, num_epochs=num_epochs, batch_size=16, model_path=str(tmp_path / 'best.safetensors'),
+                  checkpoint_dir=str(tmp_path / 'checkpoints'), resume=resume)
+
+
+def checkpoint_epochs(tmp_path):
+    with open(tmp_path / 'checkpoints' / INDEX_FILE) as f:
+        return sorted(entry['epoch'] for entry in json.load(f))
+
+
+def test_resume_continues_from_latest_checkpoint(data, tmp_path):
+    train(ModelTrainer(INPUT_SIZE, hidden_size=8), data, tmp_path, num_epochs=2)
+    trainer = ModelTrainer(INPUT_SIZE, hidden_size=8)
+    train(trainer, data, tmp_path, num_epochs=3, resume=True)
+    assert [entry['epoch'] for entry in trainer.history] == [3]
+
+
+def test_resume_refuses_a_different_model_config(data, tmp_path):
+    train(ModelTrainer(INPUT_SIZE, hidden_size=8), data, tmp_path, num_epochs=1)
+    with pytest.raises(ValueError, match='hidden_size'):
+        train(ModelTrainer(INPUT_SIZE, hidden_size=16), data, tmp_path, num_epochs=2, resume=True)
+
+
+def test_resume_refuses_a_different_run(data, tmp_path):
+    train(ModelTrainer(INPUT_SIZE, hidden_size=8), data, tmp_path, num_epochs=1)
+    other = (write_capture(tmp_path / 'other.csv', seed=2), data[1])
+    with pytest.raises(ValueError, match='run'):
+        train(ModelTrainer(INPUT_SIZE, hidden_size=8), other, tmp_path, num_epochs=2, resume=True)
+
+
+def test_fresh_run_clears_earlier_checkpoints(data, tmp_path):
+    train(ModelTrainer(INPUT_SIZE, hidden_size=16), data, tmp_path, num_epochs=3)
+    train(ModelTrainer(INPUT_SIZE, hidden_size=8), data, tmp_path, num_epochs=1)
+    assert checkpoint_epochs(tmp_path) == [1]
+    assert sorted(os.listdir(tmp_path / 'checkpoints')) == ['checkpoints.json', 'epoch_0001.pt']
@@ -0,0 +1,91 @@
+"""
+Binary CSI payloads (csi_io): the x-csi and npy decoders and frame checks.
+"""
+import io
+
+import numpy as np
+import pytest
+
+from benchmarks.common import make_csi
+from csi_io import (CSI_HEADER, NPY_CONTENT_TYPE, PayloadError, check_frames, decode_binary, decode_csi, decode_npy,
+                    encode_csi, read_body)
+
+
+def npy_bytes(array):
+    buf = io.BytesIO()
+    np.save(buf, array)
+    return bytearray(buf.getvalue())
+
+
+def test_csi_round_trip_is_a_view_of_the_buffer():
+    frames = make_csi(3, input_size=8)
+    buf = bytearray(encode_csi(frames))
+    decoded = decode_csi(buf)
+    np.testing.assert_array_equal(decoded, frames)
+    assert np.shares_memory(decoded, np.frombuffer(buf, dtype=np.uint8))
+
+
+@pytest.mark.parametrize('buf', [
+    b'CSI1',
+    b'XXXX' + encode_csi(make_csi(1, input_size=4))[4:],
+    encode_csi(make_csi(2, input_size=4))[:-4],
+    encode_csi(make_csi(2, input_size=4)) + b'\0\0\0\0',
+], ids=['short-header', 'bad-magic', 'truncated', 'trailing'])
+def test_csi_rejects_malformed_buffer(buf):
+    with pytest.raises(PayloadError):
+        decode_csi(bytearray(buf))
+
+
+def test_npy_float32_is_viewed_in_place():
+    buf = npy_bytes(make_csi(2, input_size=8))
+    decoded = decode_npy(buf)
+    assert decoded.dtype == np.float32
+    assert np.shares_memory(decoded, np.frombuffer(buf, dtype=np.uint8))
+
+
+def test_npy_other_dtypes_and_fortran_order_are_converted():
+    frames = make_csi(3, input_size=8).astype(np.float64)
+    decoded = decode_npy(npy_bytes(np.asfortranarray(frames)))
+    assert decoded.dtype == np.float32
+    np.testing.assert_allclose(decoded, frames, rtol=1e-6)
+
+
+@pytest.mark.parametrize('array', [
+    np.array([{'a': 1}], dtype=object),
+    np.zeros((2, 2, 2), dtype=np.float32),
+], ids=['object', '3d'])
+def test_npy_rejects_unsupported_arrays(array):
+    with pytest.raises(PayloadError):
+        decode_npy(npy_bytes(array))
+
+
+def test_npy_rejects_size_mismatch_and_garbage():
+    with pytest.raises(PayloadError):
+        decode_npy(npy_bytes(make_csi(2, input_size=8))[:-4])
+    with pytest.raises(PayloadError):
+        decode_npy(bytearray(b'not an npy file'))
+
+
+def test_check_frames():
+    assert check_frames(np.zeros(8, dtype=np.float32)).shape == (1, 8)
+    assert check_frames(np.zeros((2, 8), dtype=np.float32), input_size=8).shape == (2, 8)
+    with pytest.raises(PayloadError):
+        check_frames(np.zeros((0, 8), dtype=np.float32))
+    with pytest.raises(PayloadError):
+        check_frames(np.zeros((2, 8), dtype=np.float32), input_size=16)
+
+
+def test_decode_binary_dispatches_on_content_type():
+    frames = make_csi(2, input_size=8)
+    np.testing.assert_array_equal(decode_binary(NPY_CONTENT_TYPE, npy_bytes(frames), 8), frames)
+    np.testing.assert_array_equal(decode_binary('application/x-csi', bytearray(encode_csi(frames)), 8), frames)
+    with pytest.raises(PayloadError):
+        decode_binary('application/x-csi', bytearray(encode_csi(frames)), 16)
+
+
+def test_read_body():
+    body = encode_csi(make_csi(2, input_size=8))
+    assert read_body(io.BytesIO(body), len(body)) == body
+    assert read_body(io.BytesIO(body), None) == body
+    with pytest.raises(PayloadError):
+        read_body(io.BytesIO(body[:CSI_HEADER.size]), len(body))
@@ -0,0 +1,49 @@
+"""
+Int8 TorchScript export (model.export) reloaded with Predictor.
+"""
+import numpy as np
+import torch
+
+from benchmarks.common import POSE_CLASSES, StaticRegistry, make_csi
+from model.export import export_optimized
+from model.inference import Predictor
+from model.streaming import StreamSessionManager
+
+
+def make_predictor(**config):
+    torch.manual_seed(0)
+    predictor = Predictor(256, **config)
+    predictor.set_classes(POSE_CLASSES)
+    predictor.model.eval()
+    return predictor
+
+
+def test_export_reload_keeps_non_default_config(tmp_path):
+    predictor = make_predictor(hidden_size=32, num_layers=1, fc_size=32)
+    path = export_optimized(predictor, str(tmp_path / 'model.int8.pt'))
+
+    exported = Predictor(256)
+    exported.load_model(path)
+    assert exported.config() == predictor.config()
+    assert exported.classes == POSE_CLASSES
+
+
+def test_stream_through_non_default_export(tmp_path):
+    predictor = make_predictor(hidden_size=32, num_layers=1, fc_size=32)
+    path = export_optimized(predictor, str(tmp_path / 'model.int8.pt'))
+    exported = Predictor(256)
+    exported.load_model(path)
+
+    streams = StreamSessionManager(StaticRegistry(exported))
+    frames = make_csi(5)
+    for i in range(len(frames)):
+        presence_prob, pose_probs, _, pose_class, _ = streams.advance('sensor', frames[i:i + 1])
+        assert presence_prob.shape == (1,)
+        assert pose_probs.shape == (1, len(POSE_CLASSES))
+        assert pose_class[0] in POSE_CLASSES
+
+    # The first streamed frame starts from zero state, like a one-frame request
+    first, _, _ = exported.predict_proba(frames[:1])
+    streams.close('sensor')
+    streamed, _, _, _, _ = streams.advance('sensor', frames[:1])
+    np.testing.assert_allclose(streamed, first, atol=1e-5)
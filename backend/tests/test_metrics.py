@@ -0,0 +1,24 @@
+from metrics import Counter, Gauge, Histogram, MetricsRegistry
+
+
+def test_const_labels_are_added_to_every_sample():
+    registry = MetricsRegistry()
+    requests = Counter(registry, 'requests_total', 'Requests.', ('status',))
+    latency = Histogram(registry, 'latency_seconds', 'Latency.', buckets=(0.1,))
+    Gauge(registry, 'depth', 'Queue depth.', lambda: 3)
+    requests.inc(status='200')
+    latency.observe(0.05)
+
+    registry.const_labels['worker'] = '1'
+    samples = [line for line in registry.render().splitlines() if not line.startswith('#')]
+    assert samples
+    assert all('worker="1"' in line for line in samples)
+    assert 'requests_total{status="200",worker="1"} 1' in samples
+    assert 'latency_seconds_bucket{worker="1",le="0.1"} 1' in samples
+    assert 'depth{worker="1"} 3' in samples
+
+
+def test_no_labels_without_const_labels():
+    registry = MetricsRegistry()
+    Gauge(registry, 'depth', 'Queue depth.', lambda: 3)
+    assert 'depth 3' in registry.render().splitlines()
@@ -0,0 +1,20 @@
+"""
+Cold start of a serving process, run in a fresh interpreter (see benchmarks.bench_startup).
+"""
+from benchmarks.bench_startup import APP_BUDGET_SECONDS, IMPORT_BUDGET_SECONDS, measure_startup
+
+
+def test_serving_imports_no_training_modules():
+    run = measure_startup()
+    assert run['inference_modules'] == []
+    assert run['load_modules'] == []
+    assert run['app_modules'] == []
+
+
+def test_startup_within_budget():
+    # Best of a few runs, so one slow interpreter start on a busy machine doesn't fail it
+    runs = [measure_startup() for _ in range(3)]
+    import_inference = min(run['import_inference'] for run in runs)
+    total = min(run['import_inference'] + run['load_model'] + run['import_app'] for run in runs)
+    assert import_inference <= IMPORT_BUDGET_SECONDS
+    assert total <= APP_BUDGET_SECONDS
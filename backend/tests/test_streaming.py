@@ -0,0 +1,66 @@
+"""
+Per-sensor stream state (model.streaming).
+"""
+import numpy as np
+
+from benchmarks.common import POSE_CLASSES, StaticRegistry, make_csi
+from model.lstm_model import ModelTrainer
+from model.registry import LoadedModel
+from model.streaming import StreamSessionManager
+
+
+def make_trainer(**config):
+    trainer = ModelTrainer(256, hidden_size=16, num_layers=1, fc_size=16, **config)
+    trainer.set_classes(POSE_CLASSES)
+    trainer.model.eval()
+    return trainer
+
+
+def stream(streams, sensor_id, frames):
+    return np.concatenate([streams.advance(sensor_id, frames[i:i + 1])[0] for i in range(len(frames))])
+
+
+def test_state_is_carried_between_requests():
+    streams = StreamSessionManager(StaticRegistry(make_trainer()))
+    frames = make_csi(5)
+    one_by_one = stream(streams, 'a', frames)
+    at_once = streams.advance('b', frames)[0]
+    np.testing.assert_allclose(one_by_one, at_once, atol=1e-5)
+    # Later frames depend on the earlier ones
+    assert not np.isclose(one_by_one[-1], streams.advance('c', frames[-1:])[0][0])
+
+
+def test_sensors_and_model_versions_do_not_share_state():
+    registry = StaticRegistry(make_trainer())
+    streams = StreamSessionManager(registry)
+    frames = make_csi(3)
+    first = streams.advance('a', frames[:1])[0]
+    streams.advance('a', frames[1:])
+    np.testing.assert_allclose(streams.advance('b', frames[:1])[0], first, atol=1e-6)
+
+    # A hot-swapped model starts every session over
+    loaded = registry.get()
+    registry._loaded = LoadedModel(loaded.trainer, 'next', None, loaded.loaded_at, 0.0)
+    np.testing.assert_allclose(streams.advance('a', frames[:1])[0], first, atol=1e-6)
+
+
+def test_windowed_stream_matches_windowed_predict():
+    trainer = make_trainer(window_size=4)
+    streams = StreamSessionManager(StaticRegistry(trainer))
+    frames = make_csi(6)
+    np.testing.assert_allclose(stream(streams, 'a', frames), trainer.predict_proba(frames)[0], atol=1e-5)
+
+
+def test_idle_and_excess_sessions_are_evicted():
+    frames = make_csi(1)
+    streams = StreamSessionManager(StaticRegistry(make_trainer()), max_sessions=2)
+    for sensor_id in ('a', 'b', 'c'):
+        streams.advance(sensor_id, frames)
+    assert len(streams) == 2 and not streams.close('a')
+    assert streams.evicted == 1
+
+    streams = StreamSessionManager(StaticRegistry(make_trainer()), ttl=-1)
+    streams.advance('a', frames)
+    streams.advance('b', frames)
+    assert not streams.close('a')
+    assert streams.close('b')